@@ -0,0 +1,53 @@
+"""
+    Module which holds the AIs choosing moves for every game of a batch at once
+"""
+import numpy as np
+from services.batch_service import BatchGameServices
+
+
+class BatchRandomAI:
+    """
+        Batch version of the random AI: picks one of the available columns of every game at random
+    """
+    def __init__(self, seed: int = None):
+        self.__generator = np.random.default_rng(seed)
+
+    def make_moves(self, service: BatchGameServices):
+        """
+        Randomly picks one of the available columns of every game
+        :param service: The batch game service
+        :return: Array holding the index of the column of every game, -1 for the games which are over
+        """
+        return self.pick(self.__generator.random((service.games, service.columns)), service.available_columns())
+
+    @staticmethod
+    def pick(scores, available):
+        """
+        Picks the available column with the highest score of every game
+        :param scores: Array of shape (games, columns) holding the score of every column
+        :param available: Boolean array of shape (games, columns) telling which columns can be played
+        :return: Array holding the index of the picked column of every game, -1 where no column is available
+        """
+        scores = np.where(available, scores, -np.inf)
+        return np.where(available.any(axis=1), scores.argmax(axis=1), -1)
+
+
+class BatchBasicAI:
+    """
+        Batch version of the basic AI: wins if it can, otherwise blocks if it must, otherwise plays randomly,
+        picking at random between columns of the same kind
+    """
+    def __init__(self, seed: int = None):
+        self.__generator = np.random.default_rng(seed)
+
+    def make_moves(self, service: BatchGameServices):
+        """
+        Picks one of the available columns of every game, preferring wins over blocks over random moves
+        :param service: The batch game service
+        :return: Array holding the index of the column of every game, -1 for the games which are over
+        """
+        wins = service.winning_moves(service.to_move)
+        blocks = service.winning_moves(3 - service.to_move)
+        # random scores lie in [0, 1), so a win always outranks a block which always outranks any other column
+        scores = self.__generator.random((service.games, service.columns)) + 4 * wins + 2 * blocks
+        return BatchRandomAI.pick(scores, service.available_columns())
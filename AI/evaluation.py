@@ -0,0 +1,143 @@
+"""
+    Module containing the static evaluation of non-terminal positions used by depth-limited searches
+"""
+import numpy as np
+from AI.position import Position
+from repos.board import BoardType
+from repos.bitboard import BitBoardLayout
+from repos.win_lines import WinLineTable
+
+
+class WindowEvaluator:
+    """
+        Class which scores a position by looking at every window of 4 cells of the board: horizontal, vertical and
+        both diagonals
+        A window holding pieces of a single player is worth the weight of its number of pieces to that player, and
+        a window holding pieces of both players is worth nothing to either of them
+        The windows are precomputed once per board size as an array of bit indexes of the position bitmasks, and
+        turned into a matrix mapping the bits of both players to the windows holding them, the pieces of the player
+        the score is for counting 1 and the other pieces counting OTHER
+        Scoring unpacks the bitmasks of any number of positions into one array and multiplies it with the matrix,
+        giving the code of every window of every position, which indexes the table of window scores
+    """
+    __evaluators = {}
+    WEIGHTS = (0, 1, 4, 32, 1024)
+    OTHER = 5
+
+    def __init__(self, rows: int, columns: int):
+        """
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        """
+        layout = BitBoardLayout.for_size(rows, columns)
+        self.__layout = layout
+        self.__bytes = (columns * layout.height + 7) // 8
+        windows = [[layout.bit(row, column).bit_length() - 1 for row, column in line]
+                   for line in WinLineTable.for_geometry(rows, columns, 4).lines]
+        self.__windows = np.array(windows, dtype=np.intp)
+        # the bits of the other player follow those of the player the score is for
+        self.__shift = self.__bytes * 8
+        incidence = np.zeros((2 * self.__shift, len(windows)), dtype=np.float32)
+        window_indexes = np.arange(len(windows))[:, None]
+        incidence[self.__windows, window_indexes] = 1
+        incidence[self.__windows + self.__shift, window_indexes] = self.OTHER
+        self.__incidence = incidence
+
+        scores = np.zeros(self.OTHER * 5, dtype=np.int64)
+        for count in range(1, 5):
+            scores[count] = self.WEIGHTS[count]
+            scores[count * self.OTHER] = -self.WEIGHTS[count]
+        self.__scores = scores
+
+    @classmethod
+    def for_size(cls, rows: int, columns: int):
+        """
+        Returns the evaluator of a board size, computing its windows only the first time it is requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The evaluator
+        """
+        if (rows, columns) not in cls.__evaluators:
+            cls.__evaluators[(rows, columns)] = cls(rows, columns)
+        return cls.__evaluators[(rows, columns)]
+
+    @classmethod
+    def for_type(cls, board_type: BoardType):
+        """
+        Returns the evaluator of the given board type
+        :param board_type: The type of the board
+        :return: The evaluator
+        :raises: BoardTypeException if the board type is invalid
+        """
+        layout = BitBoardLayout.for_type(board_type)
+        return cls.for_size(layout.rows, layout.columns)
+
+    @property
+    def windows(self):
+        """
+        Array of shape (windows, 4) holding the bit indexes of the cells of every window
+        """
+        return self.__windows
+
+    @property
+    def scores(self):
+        """
+        Array holding the score of a window for every code: own pieces + OTHER * other pieces
+        """
+        return self.__scores
+
+    def unpack(self, bitmasks):
+        """
+        Spreads bitmasks over arrays holding one bit per element
+        :param bitmasks: A sequence of bitmasks holding the pieces of both players, as built by score_masks
+        :return: Array of shape (bitmasks, 2 * bits) of uint8
+        """
+        size = 2 * self.__bytes
+        packed = np.frombuffer(b''.join(bits.to_bytes(size, 'little') for bits in bitmasks), dtype=np.uint8)
+        return np.unpackbits(packed.reshape(len(bitmasks), size), axis=1, bitorder='little')
+
+    def score_masks(self, own, other):
+        """
+        Scores many pairs of bitmasks at once
+        :param own: A sequence holding the bitmask of the pieces of the player the scores are for
+        :param other: A sequence holding the bitmask of the pieces of the other player, of the same length
+        :return: Array holding the score of every pair
+        """
+        shift = self.__shift
+        cells = self.unpack([own_bits | other_bits << shift for own_bits, other_bits in zip(own, other)])
+        # the codes are small integers, exact in float32
+        codes = (cells @ self.__incidence).astype(np.intp)
+        return self.__scores[codes].sum(axis=1)
+
+    def evaluate(self, position: Position):
+        """
+        Scores a position
+        :param position: The position
+        :return: The score for the player to move, positive if the position favours it
+        """
+        return int(self.score_masks((position.current,), (position.mask ^ position.current,))[0])
+
+    def evaluate_many(self, positions):
+        """
+        Scores many positions in a single pass
+        :param positions: A sequence of positions of the board size of the evaluator
+        :return: Array holding the score of every position for its player to move
+        """
+        return self.score_masks([position.current for position in positions],
+                                [position.mask ^ position.current for position in positions])
+
+    def evaluate_children(self, position: Position):
+        """
+        Scores the positions reached by every move of the player to move in a single pass, without playing them
+        :param position: The position
+        :return: A tuple containing the list of the playable columns and the array of the scores of the positions
+                 they lead to, for the player making the move
+        """
+        stride = position.stride
+        columns = [column for column in range(self.__layout.columns) if position.can_play(column)]
+        if len(columns) == 0:
+            return columns, np.zeros(0, dtype=np.int64)
+        other = position.mask ^ position.current
+        return columns, self.score_masks(
+            [position.current | 1 << (column * stride + position.heights[column]) for column in columns],
+            [other] * len(columns))
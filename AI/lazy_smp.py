@@ -0,0 +1,295 @@
+"""
+    Module which holds the parallel version of the negamax searching AI
+"""
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from AI.negamax import NegamaxAI
+from AI.position import Position
+from AI.transposition import SharedTranspositionTable
+from repos.bitboard import BitBoardLayout
+from services.game_service import GameServices
+
+
+class SearchControl:
+    """
+        Class which holds the id of the running parallel search in shared memory, 0 once it is over, so that the
+        helper processes know when to stop
+        Pickling the control passes its name only, the control being attached to again in the receiving process
+    """
+    __attached = {}
+
+    def __init__(self, name: str = None):
+        """
+        :param name: The name of the shared memory block of an existing control to attach to, None to create one
+        """
+        self.__owner = name is None
+        self.__memory = shared_memory.SharedMemory(name=name, create=self.__owner, size=8)
+        self.__value = self.__memory.buf[:8].cast('Q')
+        self.__attached[self.__memory.name] = self
+
+    @classmethod
+    def attach(cls, name: str):
+        """
+        Returns the control of a shared memory block, attaching to it only if the process does not hold it yet
+        :param name: The name of the shared memory block
+        :return: The control
+        """
+        if name not in cls.__attached:
+            cls(name)
+        return cls.__attached[name]
+
+    def __reduce__(self):
+        return SearchControl.attach, (self.__memory.name,)
+
+    @property
+    def search_id(self):
+        """
+        The id of the running search, 0 if there is none
+        """
+        return self.__value[0]
+
+    @search_id.setter
+    def search_id(self, value):
+        self.__value[0] = value
+
+    def close(self):
+        """
+        Detaches the control from the shared memory, removing the block if this control created it
+        :return: -
+        """
+        self.__value.release()
+        self.__attached.pop(self.__memory.name, None)
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+
+
+def helper_search(table: SharedTranspositionTable, control: SearchControl, search_id: int, rows: int, columns: int,
+                  connect: int, current: int, mask: int, heights, player: int, position_hash: int, mirror_hash: int,
+                  time_limit, max_nodes, max_depth, symmetry: bool, start_depth: int, root_rotation: int):
+    """
+    Searches a position until the parallel search it helps is over, run in the worker processes
+    :param table: The shared transposition table
+    :param control: The control of the parallel search
+    :param search_id: The id of the parallel search
+    :param rows: The number of rows of the board
+    :param columns: The number of columns of the board
+    :param connect: The number of pieces of a winning line
+    :param current: The pieces of the player to move
+    :param mask: All the pieces
+    :param heights: The heights of the columns
+    :param player: The index of the player to move
+    :param position_hash: The Zobrist hash of the position
+    :param mirror_hash: The Zobrist hash of the mirror of the position
+    :param time_limit: The budget in seconds, None for no limit
+    :param max_nodes: The maximum number of nodes, None for no limit
+    :param max_depth: The maximum depth, None to search until the end of the game
+    :param symmetry: True to merge mirrored positions, as the other searches sharing the table do
+    :param start_depth: The depth of the first iteration
+    :param root_rotation: The shift of the order of the root moves
+    :return: A tuple containing the deepest completed depth, its score, its best move and the number of nodes
+    """
+    if control.search_id != search_id:
+        return 0, 0, -1, 0
+    position = Position(BitBoardLayout.for_size(rows, columns), connect)
+    position.current = current
+    position.mask = mask
+    position.heights = list(heights)
+    position.moves = sum(heights)
+    position.player = player
+    position.hash = position_hash
+    position.mirror_hash = mirror_hash
+    ai = NegamaxAI(time_limit, max_nodes, max_depth, transposition_table=table, symmetry=symmetry,
+                   start_depth=start_depth, root_rotation=root_rotation)
+
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(LazySMPAI.POLL_INTERVAL):
+            if control.search_id != search_id:
+                ai.stop()
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        move = ai.search(position)
+    finally:
+        finished.set()
+        watcher.join()
+    return ai.last_depth, ai.last_score, move, ai.nodes
+
+
+class LazySMPAI:
+    """
+        AI which runs the negamax search on several processes sharing one transposition table (Lazy SMP)
+        The AI searches the position itself while helper processes search the same position with no other
+        coordination than the shared table: every helper starts with a different root move and every other helper
+        one iteration deeper, so they fill the table with entries the others reuse instead of searching again
+        The move played is the one of the deepest completed iteration of all the searches, the AI's own search
+        winning ties; the helpers are stopped as soon as the AI's own search is over
+    """
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, time_limit: float = 1.0, max_nodes: int = None, max_depth: int = None, workers: int = 2,
+                 table_size: int = 1 << 16, symmetry: bool = True):
+        """
+        :param time_limit: The wall-clock budget of a move in seconds, None for no limit
+        :param max_nodes: The maximum number of nodes of every search for a move, None for no limit
+        :param max_depth: The maximum depth of the search, None to search until the end of the game
+        :param workers: The number of searches for a move, all but one in helper processes
+        :param table_size: The number of buckets of the shared transposition table
+        :param symmetry: True to merge mirrored positions in the search, False to search them separately
+        :raises: ValueError if there is no worker
+        """
+        if workers < 1:
+            raise ValueError('The search needs at least one worker')
+        self.__time_limit = time_limit
+        self.__max_nodes = max_nodes
+        self.__max_depth = max_depth
+        self.__workers = workers
+        self.__symmetry = symmetry
+        self.__table = SharedTranspositionTable(table_size)
+        self.__control = SearchControl()
+        # the shared memory is freed even if close is never called, once the AI is collected or at exit
+        self.__release = weakref.finalize(self, LazySMPAI.release, self.__table, self.__control)
+        self.__search = NegamaxAI(time_limit, max_nodes, max_depth, transposition_table=self.__table,
+                                  symmetry=symmetry)
+        self.__executor = None
+        self.__search_id = 0
+        self.__nodes = 0
+        self.__last_depth = 0
+        self.__last_score = 0
+        self.__depths = []
+
+    @property
+    def transposition_table(self):
+        return self.__table
+
+    @property
+    def workers(self):
+        return self.__workers
+
+    @property
+    def nodes(self):
+        """
+        The number of nodes searched for the last move by all the searches
+        """
+        return self.__nodes
+
+    @property
+    def last_depth(self):
+        """
+        The depth of the deepest completed iteration of the last move
+        """
+        return self.__last_depth
+
+    @property
+    def last_score(self):
+        """
+        The score of the last move, from the point of view of the AI
+        """
+        return self.__last_score
+
+    @property
+    def stats(self):
+        return {'nodes': self.__nodes, 'depth': self.__last_depth, 'worker_depths': list(self.__depths),
+                'hit_rate': self.__table.hit_rate}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def make_move(self, service: GameServices):
+        """
+        Searches the position of the game for the best move of the second player(AI)
+        :param service: The game service
+        :return: The index of the column, -1 if the board is full
+        """
+        return self.search(Position.from_board(service.board))
+
+    def search(self, position: Position):
+        """
+        Runs the parallel search on the given position
+        :param position: The position, which is left unchanged
+        :return: The best column for the player to move, -1 if the board is full
+        """
+        moves = [column for column in range(position.layout.columns) if position.can_play(column)]
+        if self.__workers == 1 or len(moves) == 0 or any(position.is_winning_move(column) for column in moves):
+            move = self.__search.search(position)
+            self.__record([(self.__search.last_depth, self.__search.last_score, move, self.__search.nodes)])
+            return move
+
+        self.__search_id += 1
+        self.__control.search_id = self.__search_id
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(self.__workers - 1)
+        futures = [self.__executor.submit(helper_search, self.__table, self.__control, self.__search_id,
+                                          position.layout.rows, position.layout.columns, position.connect,
+                                          position.current, position.mask, position.heights, position.player,
+                                          position.hash, position.mirror_hash, self.__time_limit,
+                                          self.__max_nodes, self.__max_depth, self.__symmetry, 1 + helper % 2,
+                                          helper)
+                   for helper in range(1, self.__workers)]
+        try:
+            move = self.__search.search(position)
+        finally:
+            self.__control.search_id = 0
+        results = [(self.__search.last_depth, self.__search.last_score, move, self.__search.nodes)]
+        results.extend(future.result() for future in futures)
+        return self.__record(results)
+
+    def __record(self, results):
+        """
+        Keeps the statistics of the searches of a move and picks the result of the deepest one
+        :param results: The (depth, score, move, nodes) of every search, the AI's own search first
+        :return: The move of the deepest search
+        """
+        depth, score, move, nodes = max(results, key=lambda result: result[0])
+        self.__nodes = sum(result[3] for result in results)
+        self.__depths = [result[0] for result in results]
+        self.__last_depth = depth
+        self.__last_score = score
+        return move
+
+    def stop(self):
+        """
+        Asks the running search to stop, it then returns the move of the deepest completed iteration
+        It can be called from another thread; a search starting after the call stops right away, until resume is
+        called
+        :return: -
+        """
+        self.__search.stop()
+        self.__control.search_id = 0
+
+    def resume(self):
+        """
+        Lets the next searches run again after stop was called
+        :return: -
+        """
+        self.__search.resume()
+
+    @staticmethod
+    def release(table: SharedTranspositionTable, control: SearchControl):
+        """
+        Frees the shared memory of an AI
+        :param table: The shared transposition table of the AI
+        :param control: The search control of the AI
+        :return: -
+        """
+        table.close()
+        control.close()
+
+    def close(self):
+        """
+        Shuts down the helper processes and frees the shared memory
+        :return: -
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+        self.__release()
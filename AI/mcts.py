@@ -0,0 +1,393 @@
+"""
+    Module which holds the implementation of the Monte Carlo tree search AI
+"""
+import random
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from math import log, sqrt
+from time import perf_counter
+from AI.lazy_smp import SearchControl
+from AI.position import Position
+from repos.bitboard import BitBoardLayout
+from services.game_service import GameServices
+
+
+class MCTSNode:
+    """
+        Class which describes a node of the search tree, reached by playing its move from its parent
+        The wins are counted for the player who played the move, a draw counting as half a win
+    """
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins', 'key', 'result')
+
+    def __init__(self, move, parent, untried, key, result=None):
+        """
+        :param move: The column played from the parent, None for the root
+        :param parent: The parent node, None for the root
+        :param untried: The playable columns which have no child yet
+        :param key: The key of the position of the node
+        :param result: 1 if the move won the game, 0 if it filled the board, None if the game goes on
+        """
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.key = key
+        self.result = result
+
+    def size(self):
+        """
+        Returns the number of nodes of the subtree of the node
+        :return: The number of nodes
+        """
+        size = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children)
+        return size
+
+
+def playable_columns(position: Position):
+    """
+    Returns the columns of a position which are not full
+    :param position: The position
+    :return: The list of columns
+    """
+    return [column for column in range(position.layout.columns) if position.can_play(column)]
+
+
+def rollout(position: Position, generator: random.Random):
+    """
+    Plays random moves from a position until the game ends, on plain integers rather than on the position itself
+    A move wins when it completes a line of the connect length of the position
+    :param position: The position, left unchanged
+    :param generator: The random generator choosing the moves
+    :return: 1 if the player to move in the position wins, -1 if it loses, 0 for a draw
+    """
+    rows = position.layout.rows
+    stride = position.stride
+    layout = position.layout
+    # the connect 4 test is unrolled, other lengths go through the shift chain of the layout
+    directions = layout.directions if position.connect == 4 else ()
+    connect = position.connect
+    current = position.current
+    mask = position.mask
+    heights = list(position.heights)
+    columns = [column for column in range(len(heights)) if heights[column] < rows]
+    sign = 1
+    while columns:
+        column = columns[generator.randrange(len(columns))]
+        height = heights[column]
+        pieces = current | 1 << (column * stride + height)
+        for direction in directions:
+            pairs = pieces & (pieces >> direction)
+            if pairs & (pairs >> 2 * direction):
+                return sign
+        if connect != 4 and layout.has_alignment(pieces, connect):
+            return sign
+        current ^= mask
+        mask |= 1 << (column * stride + height)
+        heights[column] = height + 1
+        if height + 1 == rows:
+            columns.remove(column)
+        sign = -sign
+    return 0
+
+
+def grow_tree(root: MCTSNode, position: Position, generator: random.Random, deadline, max_playouts, stopped):
+    """
+    Runs playouts from the root of a tree until the budget runs out
+    :param root: The root node
+    :param position: The position of the root, restored before returning
+    :param generator: The random generator of the playouts
+    :param deadline: The perf_counter value at which the search ends, None for no limit
+    :param max_playouts: The number of playouts to run, None for no limit
+    :param stopped: Function returning True once the search has to end early
+    :return: A tuple containing the number of playouts run and of nodes added
+    """
+    exploration = MCTSAI.EXPLORATION
+    playouts = 0
+    added = 0
+    path = []
+    while max_playouts is None or playouts < max_playouts:
+        if playouts % MCTSAI.CHECK_INTERVAL == 0 and playouts > 0:
+            if (deadline is not None and perf_counter() >= deadline) or stopped():
+                break
+        node = root
+        # selection
+        while not node.untried and node.children and node.result is None:
+            scale = exploration * sqrt(log(node.visits))
+            best_score = -1.0
+            for child in node.children:
+                score = child.wins / child.visits + scale / sqrt(child.visits)
+                if score > best_score:
+                    best_score = score
+                    node = child
+            position.play(node.move)
+            path.append(node.move)
+        # expansion
+        if node.untried and node.result is None:
+            move = node.untried.pop(generator.randrange(len(node.untried)))
+            if position.is_winning_move(move):
+                result = 1
+            elif position.moves + 1 == position.layout.rows * position.layout.columns:
+                result = 0
+            else:
+                result = None
+            position.play(move)
+            path.append(move)
+            child = MCTSNode(move, node, playable_columns(position) if result is None else [], position.key(),
+                             result)
+            node.children.append(child)
+            node = child
+            added += 1
+        # simulation, scored for the player who moved into the node
+        if node.result is not None:
+            score = node.result
+        else:
+            score = -rollout(position, generator)
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            node.wins += (score + 1) / 2
+            score = -score
+            node = node.parent
+        while path:
+            position.undo(path.pop())
+        playouts += 1
+    return playouts, added
+
+
+def root_statistics(control: SearchControl, search_id: int, rows: int, columns: int, connect: int, current: int,
+                    mask: int, heights, player: int, time_limit, max_playouts, seed: int):
+    """
+    Grows a tree from scratch and returns the statistics of the moves of its root, run in the worker processes
+    The tree stops growing early once the search it belongs to is stopped
+    :param control: The control of the search
+    :param search_id: The id of the search
+    :param rows: The number of rows of the board
+    :param columns: The number of columns of the board
+    :param connect: The number of pieces of a winning line
+    :param current: The pieces of the player to move
+    :param mask: All the pieces
+    :param heights: The heights of the columns
+    :param player: The index of the player to move
+    :param time_limit: The budget in seconds, None for no limit
+    :param max_playouts: The number of playouts, None for no limit
+    :param seed: The seed of the playouts
+    :return: A tuple containing a dictionary mapping the moves to their (visits, wins) and the number of playouts
+    """
+    position = Position(BitBoardLayout.for_size(rows, columns), connect)
+    position.current = current
+    position.mask = mask
+    position.heights = list(heights)
+    position.moves = sum(heights)
+    position.player = player
+    root = MCTSNode(None, None, playable_columns(position), position.key())
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    playouts, added = grow_tree(root, position, random.Random(seed), deadline, max_playouts,
+                                lambda: control.search_id != search_id)
+    return {child.move: (child.visits, child.wins) for child in root.children}, playouts
+
+
+class MCTSAI:
+    """
+        AI which chooses its moves with Monte Carlo tree search and the UCT selection rule
+        Every playout walks down the tree, adds one node and finishes the game with random moves played on bitmasks,
+        so the search needs no evaluation and works on boards of any size and lines of any length
+        The subtree of the position reached after the opponent's reply is kept for the next move
+        With several workers, independent trees are grown in worker processes from the same position while the AI
+        grows its own one; the visits of the root moves of all the trees are added up once the AI's tree reaches its
+        deadline, which stops the worker trees too, and a stop request reaches them through a control in shared memory
+    """
+    EXPLORATION = sqrt(2)
+    CHECK_INTERVAL = 16
+
+    def __init__(self, time_limit: float = 1.0, max_playouts: int = None, workers: int = 1, seed: int = None):
+        """
+        :param time_limit: The wall-clock budget of a move in seconds, None for no limit
+        :param max_playouts: The number of playouts of every tree for a move, None for no limit
+        :param workers: The number of trees grown for a move, all but one in worker processes
+        :param seed: The seed of the playouts, drawn from the random module if None
+        :raises: ValueError if there is no budget or no worker
+        """
+        if time_limit is None and max_playouts is None:
+            raise ValueError('The search needs a time limit or a number of playouts')
+        if workers < 1:
+            raise ValueError('The search needs at least one worker')
+        self.__time_limit = time_limit
+        self.__max_playouts = max_playouts
+        self.__workers = workers
+        self.__generator = random.Random(random.getrandbits(64) if seed is None else seed)
+        self.__executor = None
+        self.__control = None
+        self.__search_id = 0
+        self.__root = None
+        self.__stopped = False
+        self.__playouts = 0
+        self.__seconds = 0.0
+        self.__reused = 0
+        self.__tree_size = 0
+
+    @property
+    def playouts(self):
+        """
+        The number of playouts of the last move, those of the worker trees included
+        """
+        return self.__playouts
+
+    @property
+    def playouts_per_second(self):
+        return self.__playouts / self.__seconds if self.__seconds > 0 else 0.0
+
+    @property
+    def tree_size(self):
+        """
+        The number of nodes of the tree kept by the AI after the last move
+        """
+        return self.__tree_size
+
+    @property
+    def reused_playouts(self):
+        """
+        The number of playouts of the last move which were inherited from the tree of the previous move
+        """
+        return self.__reused
+
+    @property
+    def stats(self):
+        return {'playouts': self.__playouts, 'playouts_per_second': self.playouts_per_second,
+                'tree_size': self.__tree_size, 'reused_playouts': self.__reused}
+
+    def make_move(self, service: GameServices):
+        """
+        Searches the position of the game for the best move of the second player(AI)
+        :param service: The game service
+        :return: The index of the column, -1 if the board is full
+        """
+        return self.search(Position.from_board(service.board))
+
+    def search(self, position: Position):
+        """
+        Runs the search on the given position
+        :param position: The position, which is left unchanged
+        :return: The best column for the player to move, -1 if the board is full
+        """
+        position = position.copy()
+        started = perf_counter()
+        deadline = None if self.__time_limit is None else started + self.__time_limit
+        self.__playouts = 0
+        self.__reused = 0
+
+        moves = playable_columns(position)
+        if len(moves) == 0:
+            return -1
+        for column in moves:
+            if position.is_winning_move(column):
+                return column
+
+        root = self.reuse_tree(position)
+        self.__reused = root.visits
+        futures = []
+        if self.__workers > 1:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(self.__workers - 1)
+                self.__control = SearchControl()
+                # the shared memory is freed even if close is never called, once the AI is collected or at exit
+                self.__release = weakref.finalize(self, SearchControl.close, self.__control)
+            self.__search_id += 1
+            self.__control.search_id = self.__search_id
+            if self.__stopped:
+                # stop was called before the id was set
+                self.__control.search_id = 0
+            futures = [self.__executor.submit(root_statistics, self.__control, self.__search_id,
+                                              position.layout.rows, position.layout.columns, position.connect,
+                                              position.current, position.mask, position.heights, position.player,
+                                              self.__time_limit, self.__max_playouts,
+                                              self.__generator.getrandbits(64))
+                       for worker in range(self.__workers - 1)]
+        try:
+            playouts, added = grow_tree(root, position, self.__generator, deadline, self.__max_playouts,
+                                        lambda: self.__stopped)
+        finally:
+            # the worker trees started later than this one and would outlive the budget of the move, while with a
+            # budget of playouts only every tree runs all of its playouts
+            if self.__control is not None and deadline is not None:
+                self.__control.search_id = 0
+        self.__playouts = playouts
+        self.__tree_size += added
+
+        visits = {child.move: child.visits for child in root.children}
+        for future in futures:
+            statistics, worker_playouts = future.result()
+            self.__playouts += worker_playouts
+            for move, (move_visits, move_wins) in statistics.items():
+                visits[move] = visits.get(move, 0) + move_visits
+        self.__seconds = perf_counter() - started
+        if len(visits) == 0:
+            return moves[0]
+        best_move = max(visits, key=lambda move: (visits[move], -abs(2 * move - position.layout.columns + 1)))
+        return best_move
+
+    def reuse_tree(self, position: Position):
+        """
+        Finds the node of the position in the tree of the previous move, which becomes the root of the new tree
+        Only the position of the previous move and the positions reached by one move of each player are looked for
+        :param position: The position
+        :return: The root of the tree, a new one if the position is not in the previous tree
+        """
+        key = position.key()
+        candidates = []
+        if self.__root is not None:
+            candidates = [self.__root]
+            for child in self.__root.children:
+                candidates.extend(child.children)
+        for node in candidates:
+            if node.key == key:
+                node.parent = None
+                self.__root = node
+                self.__tree_size = node.size()
+                return node
+        self.__root = MCTSNode(None, None, playable_columns(position), key)
+        self.__tree_size = 1
+        return self.__root
+
+    def stop(self):
+        """
+        Asks the running search to stop, the worker trees included, it then returns the most visited move found so far
+        It can be called from another thread; a search starting after the call stops right away, until resume is
+        called, so that a stop sent just before the search starts is not lost
+        :return: -
+        """
+        self.__stopped = True
+        if self.__control is not None:
+            self.__control.search_id = 0
+
+    def resume(self):
+        """
+        Lets the next searches run again after stop was called
+        :return: -
+        """
+        self.__stopped = False
+
+    def close(self):
+        """
+        Shuts down the worker processes and frees their control, both created again by the next move if needed
+        :return: -
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+            self.__release()
+            self.__control = None
+
+    def __getstate__(self):
+        # the worker processes stay with the original AI
+        state = self.__dict__.copy()
+        state['_MCTSAI__executor'] = None
+        state['_MCTSAI__control'] = None
+        state.pop('_MCTSAI__release', None)
+        return state
@@ -0,0 +1,346 @@
+"""
+    Module which holds the implementation of the negamax searching AI
+"""
+from AI.position import Position
+from AI.transposition import TranspositionTable
+from AI.opening_book import OpeningBook
+from AI.position_store import PositionStore
+from AI.symmetry import Symmetry
+from services.game_service import GameServices
+from time import perf_counter
+
+
+class SearchTimeout(Exception):
+    """
+        Exception used internally to abandon a search once its time or node budget is spent
+    """
+    pass
+
+
+class NegamaxAI:
+    """
+        AI which searches the game tree with negamax, alpha-beta pruning and iterative deepening, playing the move of
+        the deepest iteration completed within the time or node budget
+        Scores are positive when the player to move wins, higher for faster wins, and 0 for draws or unknown outcomes
+    """
+    CHECK_INTERVAL = 256
+    EVALUATION_SCALE = 512
+
+    def __init__(self, time_limit: float = 1.0, max_nodes: int = None, max_depth: int = None,
+                 transposition_table: TranspositionTable = None, opening_book: OpeningBook = None,
+                 position_store: PositionStore = None, symmetry: bool = True, start_depth: int = 1,
+                 root_rotation: int = 0, evaluator=None):
+        """
+        :param time_limit: The wall-clock budget of a move in seconds, None for no limit
+        :param max_nodes: The maximum number of nodes searched for a move, None for no limit
+        :param max_depth: The maximum depth of the search, None to search until the end of the game
+        :param transposition_table: The table caching search results, which can be shared between AIs;
+                                    a new table of the default size is used if none is given
+        :param opening_book: The opening book consulted before searching connect 4 games, None to always search
+        :param position_store: The persistent store of the root search results of connect 4 games, None to keep them
+                               in memory only
+        :param symmetry: True to merge mirrored positions in the search, False to search them separately
+        :param start_depth: The depth of the first iteration
+        :param root_rotation: The number of root moves moved from the front to the back of the search order, so that
+                              the helpers of a parallel search do not all follow the same path
+        :param evaluator: The static evaluation of the positions at the depth limit of connect 4 games, any object
+                          with an evaluate(position) method such as a WindowEvaluator; None to score them as unknown.
+                          A transposition table should not be shared with searches without an evaluator
+        """
+        self.__table = TranspositionTable() if transposition_table is None else transposition_table
+        self.__book = opening_book
+        self.__store = position_store
+        self.__symmetry = symmetry
+        self.__start_depth = start_depth
+        self.__root_rotation = root_rotation
+        self.__evaluator = evaluator
+        # with an evaluator, proven scores are scaled up inside the search so that they outrank any evaluation
+        self.__scale = 1 if evaluator is None else self.EVALUATION_SCALE
+        self.__time_limit = time_limit
+        self.__max_nodes = max_nodes
+        self.__max_depth = max_depth
+        self.__deadline = None
+        self.__stopped = False
+        self.__order = []
+        self.__nodes = 0
+        self.__last_depth = 0
+        self.__last_score = 0
+
+    @property
+    def transposition_table(self):
+        return self.__table
+
+    @property
+    def nodes(self):
+        """
+        The number of nodes searched for the last move
+        """
+        return self.__nodes
+
+    @property
+    def last_depth(self):
+        """
+        The depth of the deepest completed iteration of the last move
+        """
+        return self.__last_depth
+
+    @property
+    def last_score(self):
+        """
+        The score of the last move, from the point of view of the AI
+        """
+        return self.__last_score
+
+    def make_move(self, service: GameServices):
+        """
+        Searches the position of the game for the best move of the second player(AI)
+        :param service: The game service
+        :return: The index of the column, -1 if the board is full
+        """
+        return self.search(Position.from_board(service.board))
+
+    def search(self, position: Position):
+        """
+        Runs the iterative deepening search on the given position
+        :param position: The position, which is left unchanged
+        :return: The best column for the player to move, -1 if the board is full
+        """
+        position = position.copy()
+        self.__nodes = 0
+        self.__last_depth = 0
+        self.__last_score = 0
+        self.__deadline = None if self.__time_limit is None else perf_counter() + self.__time_limit
+
+        self.__order = self.column_order(position.layout.columns)
+        moves = [column for column in self.__order if position.can_play(column)]
+        if len(moves) == 0:
+            return -1
+        for column in moves:
+            if position.is_winning_move(column):
+                self.__last_score = self.win_score(position)
+                return column
+        if self.__stopped:
+            return moves[0]
+
+        book_move = self.lookup_book(position)
+        if book_move is not None:
+            return book_move
+
+        remaining = position.layout.rows * position.layout.columns - position.moves
+        max_depth = remaining if self.__max_depth is None else min(self.__max_depth, remaining)
+        if self.__symmetry:
+            moves = Symmetry.for_position(position).unique_moves(position, moves)
+        rotation = self.__root_rotation % len(moves)
+        moves = moves[rotation:] + moves[:rotation]
+        store = self.__store if position.connect == 4 else None
+        stored = None if store is None else store.lookup(position)
+        if stored is not None and position.can_play(stored[2]):
+            stored_depth, stored_score, stored_move = stored
+            if stored_move not in moves:
+                # the mirrored move of a symmetric position, which is as good
+                stored_move = position.layout.columns - 1 - stored_move
+            # a proven result or one as deep as this search would go needs no new search
+            if stored_score != 0 or stored_depth >= max_depth:
+                self.__last_depth = stored_depth
+                self.__last_score = stored_score
+                return stored_move
+            moves.remove(stored_move)
+            moves.insert(0, stored_move)
+        else:
+            stored = None
+
+        best_move = moves[0]
+        for depth in range(min(self.__start_depth, max_depth), max_depth + 1):
+            try:
+                best_move, score = self.search_root(position.copy(), moves, depth)
+            except SearchTimeout:
+                break
+            self.__last_depth = depth
+            # a proven win or loss cannot be changed by deeper iterations
+            proven = abs(score) >= self.__scale
+            self.__last_score = score // self.__scale if proven else 0
+            if proven:
+                break
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        if stored is not None and stored_depth > self.__last_depth:
+            self.__last_depth = stored_depth
+            self.__last_score = stored_score
+            return stored_move
+        if store is not None and self.__last_depth > 0:
+            store.store(position, self.__last_depth, self.__last_score, best_move)
+        return best_move
+
+    def lookup_book(self, position):
+        """
+        Looks up the position in the opening book
+        :param position: The position
+        :return: The column of the book, None if there is no book, it is for another board size or connect length or
+                 it does not hold the position
+        """
+        if self.__book is None or position.connect != 4 or (self.__book.rows, self.__book.columns) != \
+                (position.layout.rows, position.layout.columns):
+            return None
+        entry = self.__book.lookup(position.key())
+        if entry is None or not position.can_play(entry[0]):
+            return None
+        self.__last_score = entry[1]
+        return entry[0]
+
+    def search_root(self, position, moves, depth):
+        """
+        Searches every move of the root position to the given depth
+        :param position: The root position
+        :param moves: The playable columns, in the order they are searched
+        :param depth: The depth of the search
+        :return: A tuple containing the best column and its score
+        :raises: SearchTimeout if the budget runs out
+        """
+        alpha = -self.win_score(position) * self.__scale
+        beta = self.win_score(position) * self.__scale
+        best_move = moves[0]
+        for column in moves:
+            position.play(column)
+            score = -self.negamax(position, depth - 1, -beta, -alpha)
+            position.undo(column)
+            if score > alpha:
+                alpha = score
+                best_move = column
+        return best_move, alpha
+
+    def negamax(self, position, depth, alpha, beta):
+        """
+        Computes the score of the position with alpha-beta pruning
+        :param position: The position, restored before returning
+        :param depth: The remaining depth of the search
+        :param alpha: The lower bound of the search window
+        :param beta: The upper bound of the search window
+        :return: The score of the position for the player to move, clamped to the search window
+        :raises: SearchTimeout if the budget runs out
+        """
+        self.__nodes += 1
+        if self.__max_nodes is not None and self.__nodes > self.__max_nodes:
+            raise SearchTimeout()
+        if self.__nodes % self.CHECK_INTERVAL == 0:
+            self.check_deadline()
+
+        if position.is_full():
+            return 0
+        order = self.__order
+        for column in order:
+            if position.can_play(column) and position.is_winning_move(column):
+                return self.win_score(position) * self.__scale
+        if depth == 0:
+            return self.evaluate(position)
+
+        # the opponent cannot win faster than on its next move
+        upper = (self.win_score(position) - 1) * self.__scale
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        original_alpha = alpha
+        table_move = -1
+        key = position.hash
+        mirrored = False
+        if self.__symmetry and position.mirror_hash < key:
+            # the entry is shared with the mirror, its move being the one of the mirror
+            key = position.mirror_hash
+            mirrored = True
+        entry = self.__table.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, table_move = entry
+            if mirrored and table_move != -1:
+                table_move = position.layout.columns - 1 - table_move
+            if entry_depth >= depth:
+                if entry_flag == TranspositionTable.EXACT:
+                    return entry_score
+                if entry_flag == TranspositionTable.LOWER_BOUND and entry_score > alpha:
+                    alpha = entry_score
+                elif entry_flag == TranspositionTable.UPPER_BOUND and entry_score < beta:
+                    beta = entry_score
+                if alpha >= beta:
+                    return entry_score
+            if table_move != -1:
+                order = [table_move] + [column for column in order if column != table_move]
+
+        best_score = -upper - 1
+        best_move = -1
+        for column in order:
+            if position.can_play(column):
+                position.play(column)
+                score = -self.negamax(position, depth - 1, -beta, -alpha)
+                position.undo(column)
+                if score > best_score:
+                    best_score = score
+                    best_move = column
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            break
+
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER_BOUND
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        if mirrored and best_move != -1:
+            best_move = position.layout.columns - 1 - best_move
+        self.__table.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    def stop(self):
+        """
+        Asks the running search to stop, it then returns the move of its deepest completed iteration
+        It can be called from another thread; a search starting after the call stops right away, until resume is
+        called, so that a stop sent just before the search starts is not lost
+        :return: -
+        """
+        self.__stopped = True
+
+    def resume(self):
+        """
+        Lets the next searches run again after stop was called
+        :return: -
+        """
+        self.__stopped = False
+
+    def check_deadline(self):
+        """
+        Stops the search if its time budget is spent or it was asked to stop
+        :return: -
+        :raises: SearchTimeout if the deadline has passed or stop was called
+        """
+        if self.__stopped or (self.__deadline is not None and perf_counter() >= self.__deadline):
+            raise SearchTimeout()
+
+    def evaluate(self, position):
+        """
+        Scores a position left at the depth limit
+        :param position: The position, neither full nor having a winning move for the player to move
+        :return: The evaluation clamped below EVALUATION_SCALE, 0 without an evaluator or for other connect lengths
+        """
+        if self.__evaluator is None or position.connect != 4:
+            return 0
+        limit = self.__scale - 1
+        return max(-limit, min(limit, self.__evaluator.evaluate(position)))
+
+    @staticmethod
+    def win_score(position):
+        """
+        Returns the score of the player to move winning with its next piece
+        :param position: The position
+        :return: The score, higher the fewer pieces have been played
+        """
+        return (position.layout.rows * position.layout.columns + 1 - position.moves) // 2
+
+    @staticmethod
+    def column_order(columns):
+        """
+        Returns the columns ordered from the center towards the edges
+        :param columns: The number of columns of the board
+        :return: The list of column indexes
+        """
+        return sorted(range(columns), key=lambda column: (abs(2 * column - columns + 1), column))
@@ -0,0 +1,117 @@
+"""
+    Module containing the opening book read by the searching AIs
+"""
+import mmap
+import struct
+
+
+class OpeningBookException(Exception):
+    """
+        Custom exception class for invalid opening book files
+    """
+    def __init__(self, message):
+        self.__message = message
+
+    def __str__(self):
+        return self.__message
+
+
+class OpeningBook:
+    """
+        Class which looks up precomputed moves in an opening book file
+        The file holds a header followed by fixed size entries sorted by position key, the key being the one returned
+        by Position.key; every entry holds the best column and its score for the player to move
+        The file is memory-mapped and searched with a binary search, so opening a book costs almost nothing and
+        processes opening the same book share its pages
+    """
+    MAGIC = b'C4BK'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHBBI')
+    ENTRY = struct.Struct('<QBb')
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the book file
+        :raises: OpeningBookException if the file is not a valid opening book
+        """
+        self.__map = None
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.close()
+            raise OpeningBookException('The opening book is empty!')
+        if len(self.__map) < self.HEADER.size:
+            self.close()
+            raise OpeningBookException('The opening book is too short!')
+        magic, version, self.__rows, self.__columns, self.__count = self.HEADER.unpack_from(self.__map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise OpeningBookException('The file is not an opening book!')
+        if len(self.__map) != self.HEADER.size + self.__count * self.ENTRY.size:
+            self.close()
+            raise OpeningBookException('The opening book is truncated!')
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    def __len__(self):
+        return self.__count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps and closes the book file
+        :return: -
+        """
+        if self.__map is not None:
+            self.__map.close()
+        self.__file.close()
+
+    def lookup(self, key: int):
+        """
+        Looks up the best move of a position
+        :param key: The key of the position, as returned by Position.key
+        :return: A tuple (column, score) or None if the position is not in the book
+        """
+        low = 0
+        high = self.__count
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, column, score = self.ENTRY.unpack_from(self.__map, self.HEADER.size + middle * self.ENTRY.size)
+            if entry_key == key:
+                return column, score
+            if entry_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    @classmethod
+    def write(cls, path: str, rows: int, columns: int, entries):
+        """
+        Writes an opening book file
+        :param path: The path of the book file
+        :param rows: The number of rows of the board of the book
+        :param columns: The number of columns of the board of the book
+        :param entries: A dictionary mapping position keys to (column, score) tuples
+        :return: -
+        :raises: OpeningBookException if a key does not fit in an entry
+        """
+        with open(path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, rows, columns, len(entries)))
+            for key in sorted(entries):
+                if not 0 <= key < 1 << 64:
+                    raise OpeningBookException('Position key does not fit in an opening book entry!')
+                column, score = entries[key]
+                file.write(cls.ENTRY.pack(key, column, score))
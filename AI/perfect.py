@@ -0,0 +1,254 @@
+"""
+    Module which holds the implementation of the perfect AI, playing moves read from a solution table
+    A table only stores the positions reachable from the empty board, about 3.1 million out of the 28.6 million
+    slots of the SMALL board index, at about 20 bits each: 16 bits of the index and a 4 bit code, instead of a code
+    for every slot of the index (36 bits per reachable position); a lookup is a binary search within a bucket
+"""
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from AI.position import Position
+from AI.negamax import NegamaxAI
+from services.game_service import GameServices
+
+
+class SolutionTableException(Exception):
+    """
+        Custom exception class for invalid solution table files
+    """
+    def __init__(self, message):
+        self.__message = message
+
+    def __str__(self):
+        return self.__message
+
+
+class SolutionTable:
+    """
+        Class which reads the game-theoretic value and best move of every position of a solved board size
+        Every position has an index computed from its key: a column holding h pieces has a key part between 0 and
+        2 ** (h + 1) - 2, so the key parts of the columns are the digits of the index in base 2 ** (rows + 1) - 1
+        Every stored position has a code, 1 + value * columns + move, value being 0 for a loss, 1 for a draw and 2
+        for a win of the player to move; codes take 4 bits when they fit, a whole byte otherwise
+        Only the indexes of the stored positions are kept, sorted: the high bits of an index pick a bucket, whose
+        range of entries is read from an offset array, and the low LOW_BITS bits are searched within the bucket;
+        the code of the n-th stored index is the n-th code
+    """
+    MAGIC = b'C4SV'
+    VERSION = 2
+    # magic, version, rows, columns, bits of a code, padding keeping the arrays aligned, number of entries
+    HEADER = struct.Struct('<4sHBBB3xI')
+    LOW_BITS = 16
+    LOSS = 0
+    DRAW = 1
+    WIN = 2
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the table file
+        :raises: SolutionTableException if the file is not a valid solution table
+        """
+        self.__map = None
+        self.__views = ()
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.close()
+            raise SolutionTableException('The solution table is empty!')
+        if len(self.__map) < self.HEADER.size:
+            self.close()
+            raise SolutionTableException('The solution table is too short!')
+        magic, version, self.__rows, self.__columns, self.__bits, self.__count = \
+            self.HEADER.unpack_from(self.__map, 0)
+        if magic != self.MAGIC or version != self.VERSION or self.__bits not in (4, 8):
+            self.close()
+            raise SolutionTableException('The file is not a solution table!')
+        buckets = self.buckets(self.__rows, self.__columns)
+        if len(self.__map) != self.HEADER.size + self.data_size(buckets, self.__count, self.__bits):
+            self.close()
+            raise SolutionTableException('The solution table is truncated!')
+        data = memoryview(self.__map)
+        start = self.HEADER.size
+        self.__offsets = data[start:start + 4 * (buckets + 1)].cast('I')
+        start += 4 * (buckets + 1)
+        self.__lows = data[start:start + 2 * self.__count].cast('H')
+        start += 2 * self.__count
+        self.__codes = data[start:]
+        data.release()
+        self.__views = (self.__offsets, self.__lows, self.__codes)
+
+    @staticmethod
+    def entry_bits(columns):
+        """
+        Returns the number of bits of an entry of a table for the given number of columns
+        :param columns: The number of columns of the board
+        :return: 4 or 8
+        """
+        return 4 if 3 * columns + 1 <= 16 else 8
+
+    @staticmethod
+    def entries(rows, columns):
+        """
+        Returns the number of entries of a table for the given board size
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The number of entries
+        """
+        return ((1 << (rows + 1)) - 1) ** columns
+
+    @classmethod
+    def buckets(cls, rows, columns):
+        """
+        Returns the number of buckets of the index of a table for the given board size
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The number of buckets
+        """
+        return ((cls.entries(rows, columns) - 1) >> cls.LOW_BITS) + 1
+
+    @staticmethod
+    def data_size(buckets, count, bits):
+        """
+        Returns the size in bytes of the data of a table, following its header
+        :param buckets: The number of buckets of the index
+        :param count: The number of stored positions
+        :param bits: The number of bits of a code
+        :return: The size in bytes
+        """
+        return 4 * (buckets + 1) + 2 * count + (count * bits + 7) // 8
+
+    @staticmethod
+    def index(key, rows, columns):
+        """
+        Computes the index of a position in a table
+        :param key: The key of the position, as returned by Position.key
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The index
+        """
+        base = (1 << (rows + 1)) - 1
+        index = 0
+        for column in range(columns - 1, -1, -1):
+            index = index * base + ((key >> (column * (rows + 1))) & base)
+        return index
+
+    @classmethod
+    def write(cls, path: str, rows: int, columns: int, codes):
+        """
+        Writes a table file holding the positions which have a code
+        :param path: The path of the table file
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :param codes: A bytes-like object holding the code of every index, one byte each, 0 for the positions
+                      which are not stored
+        :return: -
+        """
+        bits = cls.entry_bits(columns)
+        indexes = [index for index, code in enumerate(codes) if code]
+        buckets = cls.buckets(rows, columns)
+        offsets = [0] * (buckets + 1)
+        for index in indexes:
+            offsets[(index >> cls.LOW_BITS) + 1] += 1
+        for bucket in range(buckets):
+            offsets[bucket + 1] += offsets[bucket]
+        low_mask = (1 << cls.LOW_BITS) - 1
+        lows = array('H', [index & low_mask for index in indexes])
+        codes = bytes(codes[index] for index in indexes)
+        if bits == 4:
+            # the code of an even entry takes the low half of a byte, the code of the odd entry after it the high half
+            low = bytes(codes[0::2])
+            high = bytes(codes[1::2]).ljust(len(low), b'\0')
+            high = high.translate(bytes((code << 4) & 0xFF for code in range(256)))
+            packed = (int.from_bytes(low, 'little') | int.from_bytes(high, 'little')).to_bytes(len(low), 'little')
+        else:
+            packed = bytes(codes)
+        with open(path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, rows, columns, bits, len(indexes)))
+            file.write(array('I', offsets).tobytes())
+            file.write(lows.tobytes())
+            file.write(packed)
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    def __len__(self):
+        """
+        Returns the number of positions stored in the table
+        :return: The number of positions
+        """
+        return self.__count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps and closes the table file
+        :return: -
+        """
+        if self.__map is not None:
+            for view in self.__views:
+                view.release()
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+    def lookup(self, key: int):
+        """
+        Looks up the value and best move of a position
+        :param key: The key of the position, as returned by Position.key
+        :return: A tuple (value, column), value being LOSS, DRAW or WIN for the player to move, or None if the
+                 position is not in the table
+        """
+        index = self.index(key, self.__rows, self.__columns)
+        bucket = index >> self.LOW_BITS
+        if bucket >= len(self.__offsets) - 1:
+            return None
+        low = index & ((1 << self.LOW_BITS) - 1)
+        end = self.__offsets[bucket + 1]
+        entry = bisect_left(self.__lows, low, self.__offsets[bucket], end)
+        if entry == end or self.__lows[entry] != low:
+            return None
+        if self.__bits == 4:
+            code = (self.__codes[entry // 2] >> (4 * (entry % 2))) & 15
+        else:
+            code = self.__codes[entry]
+        return (code - 1) // self.__columns, (code - 1) % self.__columns
+
+
+class PerfectAI:
+    """
+        AI which plays the best move of every position read from a solution table, with one binary search a move
+        Positions missing from the table, such as positions of another board size, are searched instead
+    """
+    def __init__(self, table: SolutionTable, fallback=None):
+        """
+        :param table: The solution table
+        :param fallback: The AI used for positions missing from the table, a NegamaxAI if None
+        """
+        self.__table = table
+        self.__fallback = NegamaxAI(time_limit=0.5) if fallback is None else fallback
+
+    def make_move(self, service: GameServices):
+        """
+        Picks the best move of the second player(AI)
+        :param service: The game service
+        :return: The index of the column
+        """
+        board = service.board
+        # the tables are solved for connect 4
+        if (board.rows, board.columns) == (self.__table.rows, self.__table.columns) and board.connect == 4:
+            entry = self.__table.lookup(Position.from_board(board).key())
+            if entry is not None and board.column_height[entry[1]] < board.rows:
+                return entry[1]
+        return self.__fallback.make_move(service)
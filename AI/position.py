@@ -0,0 +1,181 @@
+"""
+    Module containing the lightweight position representation used by the searching AIs
+"""
+from repos.bitboard import BitBoard, BitBoardLayout
+from repos.zobrist import ZobristKeys
+from domain.cell import CellStatus
+
+
+class Position:
+    """
+        Class which describes a game position as two bitmasks: the pieces of the player to move and all the pieces
+        Playing and undoing a move only changes a few integers, so a search can walk the game tree in place
+        The position also keeps the Zobrist hash of the board, mixed with the side key when the second player is to
+        move, so that searches can cache results per position, and the hash of its left-right mirror, so that they
+        can share the results of mirrored positions
+        A game is won with a line of connect pieces, 4 by default; the positions of a board are only told apart by
+        their size, so results of positions of the same size and another connect length must not be shared
+    """
+    __slots__ = ('layout', 'connect', 'stride', 'keys', 'drops', 'current', 'mask', 'heights', 'moves', 'player',
+                 'hash', 'mirror_hash')
+
+    def __init__(self, layout: BitBoardLayout, connect: int = 4):
+        self.layout = layout
+        self.connect = connect
+        # the number of bits of a column, read on every move
+        self.stride = layout.height
+        self.keys = ZobristKeys.for_size(layout.rows, layout.columns)
+        self.drops = (None, self.keys.drops(1), self.keys.drops(2))
+        self.current = 0
+        self.mask = 0
+        self.heights = [0 for index in range(layout.columns)]
+        self.moves = 0
+        self.player = 1
+        self.hash = 0
+        self.mirror_hash = 0
+
+    @classmethod
+    def from_board(cls, board, player_index: int = 2):
+        """
+        Creates the position found on a board, won with lines as long as the ones of the board
+        :param board: The board, either a Board or a BitBoard
+        :param player_index: The index of the player to move
+        :return: The position
+        """
+        position = cls(BitBoardLayout.for_size(board.rows, board.columns), board.connect)
+        if isinstance(board, BitBoard):
+            player1, player2 = board.player1_mask, board.player2_mask
+        else:
+            player1 = player2 = 0
+            for row in range(board.rows):
+                for column in range(board.columns):
+                    status = board[row][column].status
+                    if status == CellStatus.OCCUPIED_BY_PLAYER1:
+                        player1 |= position.layout.bit(row, column)
+                    elif status == CellStatus.OCCUPIED_BY_PLAYER2:
+                        player2 |= position.layout.bit(row, column)
+        position.current = player1 if player_index == 1 else player2
+        position.mask = player1 | player2
+        position.heights = list(board.column_height)
+        position.moves = sum(position.heights)
+        position.player = player_index
+        position.hash = position.keys.side if player_index == 2 else 0
+        position.mirror_hash = position.hash
+        for row in range(board.rows):
+            for column in range(board.columns):
+                bit = position.layout.bit(row, column)
+                if player1 & bit:
+                    position.hash ^= position.keys.key(row, column, 1)
+                    position.mirror_hash ^= position.keys.key(row, board.columns - 1 - column, 1)
+                elif player2 & bit:
+                    position.hash ^= position.keys.key(row, column, 2)
+                    position.mirror_hash ^= position.keys.key(row, board.columns - 1 - column, 2)
+        return position
+
+    def copy(self):
+        """
+        Returns an independent copy of the position
+        :return: The copy
+        """
+        position = Position(self.layout, self.connect)
+        position.current = self.current
+        position.mask = self.mask
+        position.heights = list(self.heights)
+        position.moves = self.moves
+        position.player = self.player
+        position.hash = self.hash
+        position.mirror_hash = self.mirror_hash
+        return position
+
+    def can_play(self, column):
+        """
+        Checks if a piece can still be dropped in the given column
+        :param column: The column
+        :return: True - the column is not full
+                 False - otherwise
+        """
+        return self.heights[column] < self.layout.rows
+
+    def play(self, column):
+        """
+        Drops a piece of the player to move in the given column, after which the other player is to move
+        :param column: The column, which must not be full
+        :return: -
+        """
+        height = self.heights[column]
+        drops = self.drops[self.player]
+        self.hash ^= drops[0][column][height]
+        self.mirror_hash ^= drops[1][column][height]
+        self.player = 3 - self.player
+        self.current ^= self.mask
+        self.mask |= 1 << (column * self.stride + height)
+        self.heights[column] = height + 1
+        self.moves += 1
+
+    def undo(self, column):
+        """
+        Takes back the last piece dropped in the given column
+        :param column: The column of the last move
+        :return: -
+        """
+        height = self.heights[column] - 1
+        self.heights[column] = height
+        self.moves -= 1
+        self.mask ^= 1 << (column * self.stride + height)
+        self.current ^= self.mask
+        self.player = 3 - self.player
+        drops = self.drops[self.player]
+        self.hash ^= drops[0][column][height]
+        self.mirror_hash ^= drops[1][column][height]
+
+    def is_winning_move(self, column):
+        """
+        Checks if the player to move would complete a line of connect pieces by playing the given column
+        :param column: The column, which must not be full
+        :return: True - the move wins the game
+                 False - otherwise
+        """
+        return self.has_alignment(self.current | 1 << (column * self.stride + self.heights[column]))
+
+    def has_alignment(self, pieces):
+        """
+        Checks if the given pieces contain connect cells in a row in any direction
+        :param pieces: The bitmask of the pieces
+        :return: True - there is an alignment
+                 False - otherwise
+        """
+        if self.connect != 4:
+            return self.layout.has_alignment(pieces, self.connect)
+        # the usual connect 4 test is unrolled, it runs for every node of the searches
+        for direction in self.layout.directions:
+            pairs = pieces & (pieces >> direction)
+            if pairs & (pairs >> 2 * direction):
+                return True
+        return False
+
+    def is_full(self):
+        """
+        Checks if the board of the position is full
+        :return: True - no more moves can be made
+                 False - otherwise
+        """
+        return self.moves == self.layout.rows * self.layout.columns
+
+    def key(self):
+        """
+        Returns an integer which uniquely identifies the position, regardless of the colour of the player to move
+        :return: The key of the position
+        """
+        return self.current + self.mask
+
+    def canonical_key(self):
+        """
+        Returns the smaller of the key of the position and the key of its left-right mirror, which is the same for
+        both positions
+        :return: A tuple containing the canonical key and True if it is the key of the mirror
+        """
+        key = self.current + self.mask
+        mirrored = self.layout.mirror(key)
+        if mirrored < key:
+            return mirrored, True
+        return key, False
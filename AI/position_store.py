@@ -0,0 +1,221 @@
+"""
+    Module containing the persistent store of position evaluations shared across runs and machines
+"""
+import sqlite3
+from collections import OrderedDict
+from AI.position import Position
+from AI.symmetry import Symmetry
+
+
+class PositionStoreException(Exception):
+    """
+        Custom exception class for invalid position store files
+    """
+    def __init__(self, message):
+        self.__message = message
+
+    def __str__(self):
+        return self.__message
+
+
+class PositionStore:
+    """
+        Class which keeps the score, depth and best move of searched positions in a SQLite file
+        Positions are keyed by their canonical key, so a position and its left-right mirror share one entry, the best
+        move being stored for the canonical orientation and mirrored back on lookup
+        Entries are written in batches, one transaction per batch, and a bounded cache in front of the file answers
+        repeated lookups, misses included, without touching it; the cache only learns of the entries it already holds
+        when they are stored, since the file may hold a deeper entry for the others
+        An entry is only replaced by a deeper search of the same position
+    """
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS positions (
+            rows INTEGER NOT NULL,
+            columns INTEGER NOT NULL,
+            key BLOB NOT NULL,
+            depth INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            move INTEGER NOT NULL,
+            PRIMARY KEY (rows, columns, key)
+        ) WITHOUT ROWID
+    '''
+    UPSERT = '''
+        INSERT INTO positions (rows, columns, key, depth, score, move) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (rows, columns, key) DO UPDATE SET depth = excluded.depth, score = excluded.score,
+                                                       move = excluded.move
+        WHERE excluded.depth > positions.depth
+    '''
+    MERGE = '''
+        INSERT INTO positions (rows, columns, key, depth, score, move)
+        SELECT rows, columns, key, depth, score, move FROM other.positions WHERE true
+        ON CONFLICT (rows, columns, key) DO UPDATE SET depth = excluded.depth, score = excluded.score,
+                                                       move = excluded.move
+        WHERE excluded.depth > positions.depth
+    '''
+
+    def __init__(self, path: str, cache_size: int = 1 << 16, batch_size: int = 1024):
+        """
+        :param path: The path of the store file, created if it does not exist
+        :param cache_size: The largest number of positions kept in the cache
+        :param batch_size: The number of pending entries which triggers a write
+        :raises: PositionStoreException if the file is not a position store
+        """
+        self.__connection = sqlite3.connect(path)
+        try:
+            self.__connection.execute(self.SCHEMA)
+            self.__connection.execute('SELECT rows, columns, key, depth, score, move FROM positions LIMIT 1')
+        except sqlite3.DatabaseError:
+            self.__connection.close()
+            raise PositionStoreException('The file is not a position store!')
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+        self.__pending = {}
+        self.__batch_size = batch_size
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hits(self):
+        """
+        The number of lookups answered by the cache
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """
+        The number of lookups which read the file
+        """
+        return self.__misses
+
+    def __len__(self):
+        """
+        Returns the number of positions stored, pending ones included
+        :return: The number of positions
+        """
+        self.flush()
+        return self.__connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    @staticmethod
+    def entry_key(position: Position):
+        """
+        Returns the key of the entry of a position
+        :param position: The position
+        :return: A tuple containing the rows, the columns and the canonical key as bytes, and True if the canonical
+                 key is the one of the mirror
+        """
+        key, mirrored = position.canonical_key()
+        layout = position.layout
+        size = (layout.columns * layout.height + 7) // 8
+        return (layout.rows, layout.columns, key.to_bytes(size, 'big')), mirrored
+
+    def __remember(self, key, entry):
+        """
+        Puts an entry in the cache, forgetting the least recently used one if the cache is full
+        :param key: The key of the entry
+        :param entry: The (depth, score, move) tuple, None for a position which is not stored
+        :return: -
+        """
+        self.__cache[key] = entry
+        self.__cache.move_to_end(key)
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+
+    def lookup(self, position: Position):
+        """
+        Looks up the entry of a position
+        :param position: The position
+        :return: A tuple containing the depth, the score for the player to move and the best column of the position,
+                 or None if it is not stored
+        """
+        key, mirrored = self.entry_key(position)
+        if key in self.__pending:
+            self.__hits += 1
+            entry = self.__pending[key]
+        elif key in self.__cache:
+            self.__hits += 1
+            self.__cache.move_to_end(key)
+            entry = self.__cache[key]
+        else:
+            self.__misses += 1
+            entry = self.__connection.execute(
+                'SELECT depth, score, move FROM positions WHERE rows = ? AND columns = ? AND key = ?', key).fetchone()
+            self.__remember(key, entry)
+        if entry is None:
+            return None
+        depth, score, move = entry
+        return depth, score, Symmetry.for_position(position).from_canonical(move, mirrored)
+
+    def store(self, position: Position, depth: int, score: int, move: int):
+        """
+        Stores the result of a search, written with the next batch
+        :param position: The position
+        :param depth: The depth the position was searched to
+        :param score: The score of the position for the player to move
+        :param move: The best column of the position
+        :return: -
+        """
+        key, mirrored = self.entry_key(position)
+        move = Symmetry.for_position(position).to_canonical(move, mirrored)
+        for known in (self.__pending.get(key), self.__cache.get(key)):
+            if known is not None and known[0] >= depth:
+                return
+        entry = (depth, score, move)
+        self.__pending[key] = entry
+        if key in self.__cache:
+            self.__cache[key] = entry
+        if len(self.__pending) >= self.__batch_size:
+            self.flush()
+
+    def store_many(self, entries):
+        """
+        Stores many results at once, written in batches
+        :param entries: An iterable of (position, depth, score, move) tuples
+        :return: -
+        """
+        for position, depth, score, move in entries:
+            self.store(position, depth, score, move)
+
+    def flush(self):
+        """
+        Writes the pending entries in a single transaction
+        :return: -
+        """
+        if len(self.__pending) == 0:
+            return
+        with self.__connection:
+            self.__connection.executemany(self.UPSERT, [key + entry for key, entry in self.__pending.items()])
+        self.__pending.clear()
+
+    def merge(self, path: str):
+        """
+        Adds the entries of another store, the deeper entry winning when both stores hold a position
+        :param path: The path of the other store file
+        :return: -
+        :raises: PositionStoreException if the file is not a position store
+        """
+        self.flush()
+        self.__connection.execute('ATTACH DATABASE ? AS other', (path,))
+        try:
+            with self.__connection:
+                self.__connection.execute(self.MERGE)
+        except sqlite3.DatabaseError:
+            raise PositionStoreException('The file is not a position store!')
+        finally:
+            self.__connection.execute('DETACH DATABASE other')
+        # cached entries, misses included, may have been replaced
+        self.__cache.clear()
+
+    def close(self):
+        """
+        Writes the pending entries and closes the file
+        :return: -
+        """
+        self.flush()
+        self.__connection.close()
@@ -0,0 +1,113 @@
+"""
+    Module containing the left-right mirror symmetry used by the searching AIs and the position caches
+"""
+from AI.position import Position
+
+
+class Symmetry:
+    """
+        Class which maps positions to their canonical form and moves between a position and its canonical form
+        Every board geometry is symmetric left to right, so a position and its mirror have the same value and mirrored
+        best moves; caches keyed by the canonical form hold one entry for both, and a symmetric position only needs
+        half of its moves searched
+        The canonical form of a position is the smaller of the position and its mirror, by key or by Zobrist hash
+    """
+    __symmetries = {}
+
+    def __init__(self, columns: int):
+        """
+        :param columns: The number of columns of the board
+        """
+        self.__columns = columns
+        self.__mirrored_columns = tuple(columns - 1 - column for column in range(columns))
+
+    @classmethod
+    def for_position(cls, position: Position):
+        """
+        Returns the symmetry of the board of a position, creating it only the first time it is requested
+        :param position: The position
+        :return: The symmetry
+        """
+        columns = position.layout.columns
+        if columns not in cls.__symmetries:
+            cls.__symmetries[columns] = cls(columns)
+        return cls.__symmetries[columns]
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    def mirror_column(self, column):
+        """
+        Returns the column a column is mirrored to
+        :param column: The column
+        :return: The mirrored column
+        """
+        return self.__mirrored_columns[column]
+
+    @staticmethod
+    def canonical_key(position: Position):
+        """
+        Returns the canonical key of a position
+        :param position: The position
+        :return: A tuple containing the smaller of the keys of the position and its mirror, and True if it is the key
+                 of the mirror
+        """
+        return position.canonical_key()
+
+    @staticmethod
+    def canonical_hash(position: Position):
+        """
+        Returns the canonical Zobrist hash of a position
+        :param position: The position
+        :return: A tuple containing the smaller of the hashes of the position and its mirror, and True if it is the
+                 hash of the mirror
+        """
+        if position.mirror_hash < position.hash:
+            return position.mirror_hash, True
+        return position.hash, False
+
+    def to_canonical(self, column, mirrored: bool):
+        """
+        Translates a move of a position into the move of its canonical form
+        :param column: The column of the move, -1 for no move
+        :param mirrored: True if the canonical form is the mirror of the position
+        :return: The column of the move in the canonical form
+        """
+        if mirrored and column != -1:
+            return self.__mirrored_columns[column]
+        return column
+
+    def from_canonical(self, column, mirrored: bool):
+        """
+        Translates a move of the canonical form of a position back into the move of the position
+        :param column: The column of the move in the canonical form, -1 for no move
+        :param mirrored: True if the canonical form is the mirror of the position
+        :return: The column of the move
+        """
+        # mirroring is its own inverse
+        return self.to_canonical(column, mirrored)
+
+    @staticmethod
+    def is_symmetric(position: Position):
+        """
+        Checks if a position is its own mirror, the empty position included
+        :param position: The position
+        :return: True - the position and its mirror are the same
+                 False - otherwise
+        """
+        key = position.key()
+        return position.layout.mirror(key) == key
+
+    def unique_moves(self, position: Position, moves):
+        """
+        Drops the moves of a symmetric position whose mirrored move is also in the list, since both lead to mirrored
+        positions of the same value
+        :param position: The position
+        :param moves: The playable columns, in the order they are searched
+        :return: The columns left to search, in the same order
+        """
+        if not self.is_symmetric(position):
+            return list(moves)
+        return [column for column in moves
+                if column <= self.__mirrored_columns[column] or self.__mirrored_columns[column] not in moves]
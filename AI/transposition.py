@@ -0,0 +1,274 @@
+"""
+    Module containing the transposition tables used to cache search results
+"""
+from multiprocessing import shared_memory
+
+
+class TranspositionTable:
+    """
+        Fixed size cache of search results indexed by the Zobrist hash of a position
+        Every bucket has two slots: a depth-preferred slot which keeps the deepest result stored in the bucket and an
+        always-replace slot which keeps the most recent shallower one
+        The table never grows past 2 * size entries, so one instance can be shared by every game of a process
+    """
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    def __init__(self, size: int = 1 << 15):
+        """
+        :param size: The number of buckets, rounded down to a power of two
+        """
+        if size < 1:
+            raise ValueError('The transposition table needs at least one bucket')
+        self.__size = 1 << (size.bit_length() - 1)
+        self.__mask = self.__size - 1
+        self.__deep = [None] * self.__size
+        self.__recent = [None] * self.__size
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def size(self):
+        """
+        The number of buckets of the table
+        """
+        return self.__size
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    @property
+    def hit_rate(self):
+        probes = self.__hits + self.__misses
+        return self.__hits / probes if probes else 0.0
+
+    def __len__(self):
+        """
+        Returns the number of entries stored in the table
+        :return: The number of entries
+        """
+        return sum(entry is not None for entry in self.__deep) + sum(entry is not None for entry in self.__recent)
+
+    def probe(self, key):
+        """
+        Looks up the result stored for a position
+        :param key: The Zobrist hash of the position
+        :return: A tuple containing the depth, score, bound flag and best move of the position, or None if it is
+                 not stored
+        """
+        index = key & self.__mask
+        entry = self.__deep[index]
+        if entry is None or entry[0] != key:
+            entry = self.__recent[index]
+            if entry is None or entry[0] != key:
+                self.__misses += 1
+                return None
+        self.__hits += 1
+        return entry[1:]
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Stores the result of a search
+        The result replaces the depth-preferred entry of its bucket if it is at least as deep or for the same
+        position, the replaced entry moving to the always-replace slot; otherwise it takes the always-replace slot
+        :param key: The Zobrist hash of the position
+        :param depth: The depth the position was searched to
+        :param score: The score of the position
+        :param flag: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: The best column found, -1 if there is none
+        :return: -
+        """
+        index = key & self.__mask
+        entry = (key, depth, score, flag, move)
+        deep = self.__deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                self.__recent[index] = deep
+            self.__deep[index] = entry
+        else:
+            self.__recent[index] = entry
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters
+        :return: -
+        """
+        self.__deep = [None] * self.__size
+        self.__recent = [None] * self.__size
+        self.__hits = 0
+        self.__misses = 0
+
+
+class SharedTranspositionTable:
+    """
+        Transposition table held in shared memory, so that the processes of a parallel search read and write the
+        same entries
+        Every bucket has the same depth-preferred and always-replace slots as the TranspositionTable, each slot being
+        two 64 bit words: the data of the entry, and its checksum, the xor of the key and the data
+        Entries are written without locks: an entry torn by two processes writing it at once, or read while being
+        written, does not match its checksum and is read as a miss
+        Pickling the table passes its name only, the table being attached to again in the receiving process
+    """
+    EXACT = TranspositionTable.EXACT
+    LOWER_BOUND = TranspositionTable.LOWER_BOUND
+    UPPER_BOUND = TranspositionTable.UPPER_BOUND
+    # the data word: depth in bits 0-7, score + SCORE_OFFSET in bits 8-39, flag in bits 40-41, move + 1 in bits
+    # 42-49, and a bit which is always set so that the data of an entry is never 0 like the one of an empty slot
+    SCORE_OFFSET = 1 << 31
+    MIN_SCORE = -SCORE_OFFSET
+    MAX_SCORE = SCORE_OFFSET - 1
+    VALID = 1 << 63
+    WORDS = 4
+    __attached = {}
+
+    def __init__(self, size: int = 1 << 15, name: str = None):
+        """
+        :param size: The number of buckets, rounded down to a power of two
+        :param name: The name of the shared memory block of an existing table to attach to, None to create a new
+                     table
+        :raises: ValueError if there is no bucket
+        """
+        if size < 1:
+            raise ValueError('The transposition table needs at least one bucket')
+        self.__size = 1 << (size.bit_length() - 1)
+        self.__mask = self.__size - 1
+        length = self.__size * self.WORDS * 8
+        self.__owner = name is None
+        self.__memory = shared_memory.SharedMemory(name=name, create=self.__owner, size=length)
+        self.__entries = self.__memory.buf[:length].cast('Q')
+        self.__attached[self.__memory.name] = self
+        self.__hits = 0
+        self.__misses = 0
+
+    @classmethod
+    def attach(cls, name: str, size: int):
+        """
+        Returns the table of a shared memory block, attaching to it only if the process does not hold it yet
+        :param name: The name of the shared memory block
+        :param size: The number of buckets of the table
+        :return: The table
+        """
+        if name not in cls.__attached:
+            cls(size, name)
+        return cls.__attached[name]
+
+    def __reduce__(self):
+        return SharedTranspositionTable.attach, (self.__memory.name, self.__size)
+
+    @property
+    def name(self):
+        """
+        The name of the shared memory block of the table
+        """
+        return self.__memory.name
+
+    @property
+    def size(self):
+        """
+        The number of buckets of the table
+        """
+        return self.__size
+
+    @property
+    def hits(self):
+        """
+        The number of probes of this process which found their entry
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    @property
+    def hit_rate(self):
+        probes = self.__hits + self.__misses
+        return self.__hits / probes if probes else 0.0
+
+    def __len__(self):
+        """
+        Returns the number of entries stored in the table
+        :return: The number of entries
+        """
+        entries = self.__entries
+        return sum(entries[index] != 0 for index in range(1, len(entries), 2))
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Unpacks the data word of an entry
+        :param data: The data word
+        :return: A tuple containing the depth, score, bound flag and best move
+        """
+        return data & 0xFF, (data >> 8 & 0xFFFFFFFF) - cls.SCORE_OFFSET, data >> 40 & 3, (data >> 42 & 0xFF) - 1
+
+    def probe(self, key):
+        """
+        Looks up the result stored for a position
+        :param key: The Zobrist hash of the position
+        :return: A tuple containing the depth, score, bound flag and best move of the position, or None if it is
+                 not stored
+        """
+        entries = self.__entries
+        base = (key & self.__mask) * self.WORDS
+        data = entries[base + 1]
+        if entries[base] ^ data != key or data == 0:
+            data = entries[base + 3]
+            if entries[base + 2] ^ data != key or data == 0:
+                self.__misses += 1
+                return None
+        self.__hits += 1
+        return self.decode(data)
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Stores the result of a search, with the replacement policy of the TranspositionTable
+        :param key: The Zobrist hash of the position
+        :param depth: The depth the position was searched to
+        :param score: The score of the position, clamped between MIN_SCORE and MAX_SCORE so that it never spills
+                      into the other fields
+        :param flag: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: The best column found, -1 if there is none
+        :return: -
+        """
+        entries = self.__entries
+        base = (key & self.__mask) * self.WORDS
+        score = min(max(score, self.MIN_SCORE), self.MAX_SCORE)
+        data = self.VALID | (move + 1) << 42 | flag << 40 | (score + self.SCORE_OFFSET) << 8 | depth
+        deep = entries[base + 1]
+        deep_key = entries[base] ^ deep
+        if deep == 0 or deep_key == key or depth >= deep & 0xFF:
+            if deep != 0 and deep_key != key:
+                entries[base + 2] = entries[base]
+                entries[base + 3] = deep
+            entries[base] = key ^ data
+            entries[base + 1] = data
+        else:
+            entries[base + 2] = key ^ data
+            entries[base + 3] = data
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters of this process
+        :return: -
+        """
+        self.__memory.buf[:len(self.__entries) * 8] = bytes(len(self.__entries) * 8)
+        self.__hits = 0
+        self.__misses = 0
+
+    def close(self):
+        """
+        Detaches the table from the shared memory, removing the block if this table created it
+        :return: -
+        """
+        self.__entries.release()
+        self.__attached.pop(self.__memory.name, None)
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
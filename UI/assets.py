@@ -0,0 +1,68 @@
+"""
+    Module which contains the cache of the images used by the GUI
+"""
+import pygame
+
+
+class SpriteAtlas:
+    """
+        Class which holds an image scaled to a cell size and its tinted copies, one per color
+        Every image is loaded and scaled only once per cell size and every tint is built only once, so the sprites
+        of the cells share the same surfaces and changing the color of a sprite only swaps its image
+    """
+    __atlases = {}
+
+    def __init__(self, image_path: str, size: int):
+        """
+        :param image_path: The path of the image
+        :param size: The size in pixels of the scaled image
+        """
+        image = pygame.image.load(image_path)
+        if pygame.display.get_surface() is not None:
+            # surfaces in the pixel format of the display are blitted without any conversion
+            image = image.convert_alpha()
+        self.__image = pygame.transform.scale(image, (size, size))
+        self.__tints = {}
+
+    @classmethod
+    def for_image(cls, image_path: str, size: int):
+        """
+        Returns the atlas of an image and a size, loading the image only the first time it is requested
+        :param image_path: The path of the image
+        :param size: The size in pixels of the scaled image
+        :return: The atlas
+        """
+        if (image_path, size) not in cls.__atlases:
+            cls.__atlases[(image_path, size)] = cls(image_path, size)
+        return cls.__atlases[(image_path, size)]
+
+    @classmethod
+    def clear(cls):
+        """
+        Forgets every cached atlas, for instance after the display was recreated
+        :return: -
+        """
+        cls.__atlases.clear()
+
+    @property
+    def image(self):
+        """
+        The scaled image, before any tint
+        """
+        return self.__image
+
+    def tinted(self, color):
+        """
+        Returns the image multiplied by a color, building it only the first time it is requested
+        The returned surface is shared and must not be drawn on
+        :param color: The color
+        :return: The tinted surface
+        """
+        key = tuple(pygame.Color(color))
+        if key not in self.__tints:
+            tint = pygame.Surface(self.__image.get_size(), pygame.SRCALPHA)
+            tint.fill(color)
+            surface = self.__image.copy()
+            surface.blit(tint, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+            self.__tints[key] = surface
+        return self.__tints[key]
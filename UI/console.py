@@ -2,6 +2,8 @@
     Module which contains the implementation of the Console User Interface
 """
 from services.game_service import GameServices, GameOutcome
+from services.game_session import GameSession
+from UI.renderer import BoardRenderer
 from enum import IntEnum
 from random import randint
 
@@ -13,9 +15,11 @@ class GameState(IntEnum):
 
 
 class Console:
-    def __init__(self, game_service: GameServices, ai):
+    def __init__(self, game_service: GameServices, ai, ansi: bool = False):
         self.__game_service = game_service
         self.__ai = ai
+        self.__session = GameSession(game_service, ai)
+        self.__renderer = BoardRenderer.for_board(game_service.board, ansi)
         self.__game_state = GameState.ROLLING
         self.__starting_player = -1
         self.__game_finished = False
@@ -41,70 +45,50 @@ class Console:
         else:
             print('Player 2 goes first!\n')
             self.__starting_player = 2
+        self.__session.reset(self.__starting_player)
         self.__game_state = GameState.PLAYING
 
     def player1_move(self):
         column = self.get_column()
-        return self.__game_service.make_player1_move(column)
+        return self.__session.play(column)
 
     @staticmethod
     def get_column():
             return int(input('On which column would you like to place?\n')) - 1
 
     def player2_move(self):
-        column = self.__ai.make_move(self.__game_service)
-        return self.__game_service.make_player2_move(column)
+        return self.__session.step_ai()
 
-    def is_game_over(self, point, player):
-        if self.__game_service.is_game_over(point, player) == GameOutcome.PLAYER1_WIN:
+    def is_game_over(self):
+        outcome = self.__session.outcome
+        if outcome == GameOutcome.PLAYER1_WIN:
             print('Player 1 wins!')
-            return True
-        elif self.__game_service.is_game_over(point, player) == GameOutcome.PLAYER2_WIN:
+        elif outcome == GameOutcome.PLAYER2_WIN:
             print('Player 2 wins!')
-            return True
-        elif self.__game_service.is_game_over(point, player) == GameOutcome.DRAW:
+        elif outcome == GameOutcome.DRAW:
             print('Game is a draw')
-            return True
-        return False
+        return outcome is not None
 
     def print_board(self):
-        print(str(self.__game_service.board) + '\n\n\n\n')
+        print(self.__renderer.render(self.__game_service) + '\n\n\n\n')
 
     def game_loop(self):
-        if self.__starting_player == 1:
-            while True:
-                try:
-                    self.print_board()
-                    point = self.player1_move()
-                    if self.is_game_over(point, 1):
-                        self.__game_state = GameState.GAME_OVER
-                        break
-                    self.print_board()
-                    point = self.player2_move()
-                    if self.is_game_over(point, 2):
-                        self.__game_state = GameState.GAME_OVER
-                        break
-                    self.print_board()
-                except Exception as e:
-                    print(e)
-        elif self.__starting_player == 2:
-            while True:
-                try:
-                    self.print_board()
-                    point = self.player2_move()
-                    if self.is_game_over(point, 2):
-                        self.__game_state = GameState.GAME_OVER
-                        break
-                    self.print_board()
-                    point = self.player1_move()
-                    if self.is_game_over(point, 1):
-                        self.__game_state = GameState.GAME_OVER
-                        break
-                    self.print_board()
-                except Exception as e:
-                    print(e)
-        else:
+        if self.__starting_player not in (1, 2):
             raise Exception('Invalid player!')
+        # the session keeps the turn order, whoever started
+        while True:
+            try:
+                self.print_board()
+                if self.__session.to_move == 1:
+                    self.player1_move()
+                else:
+                    self.player2_move()
+                if self.is_game_over():
+                    self.print_board()
+                    self.__game_state = GameState.GAME_OVER
+                    break
+            except Exception as e:
+                print(e)
 
     def choose_replay(self):
         option = input('Would you like to replay?Y for yes, N for no\n')
@@ -118,7 +102,7 @@ class Console:
 
     def replay_game(self):
         self.__game_state = GameState.ROLLING
-        self.__game_service.reset_board()
+        self.__session.reset()
 
     def end_game(self):
         self.__game_finished = True
@@ -1,7 +1,11 @@
 import pygame
 from services.game_service import GameServices, GameOutcome, MoveOutsideBoundsException
+from UI.assets import SpriteAtlas
+from services.ai_worker import AIWorker
+from services.game_session import GameSession
 from enum import IntEnum, Enum
 from sys import exit
+from time import perf_counter
 
 
 class GameState(IntEnum):
@@ -15,19 +19,15 @@ class MaskedSprite(pygame.sprite.Sprite):
         super().__init__()
 
         self.rect = pygame.rect.Rect(top_left_x, top_left_y, size, size)
-        self.image = pygame.image.load(image_path)
-        self.image = pygame.transform.scale(self.image, self.rect.size)
-
-        self.change_color(color)
+        # the image is loaded once per size and its tinted copies are shared by every sprite
+        self.__atlas = SpriteAtlas.for_image(image_path, size)
+        self.image = self.__atlas.tinted(color)
 
     def change_color(self, color):
-        color_image = pygame.Surface(self.image.get_size()).convert_alpha()
-        color_image.fill(color)
-        self.image.blit(color_image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        self.image = self.__atlas.tinted(color)
 
     def draw(self, surface):
-        renderer = pygame.sprite.RenderPlain(self)
-        renderer.draw(surface)
+        surface.blit(self.image, self.rect)
 
 
 class PlayerStatus(Enum):
@@ -46,26 +46,55 @@ class PlayerSprite(MaskedSprite):
 
 
 class GUI:
-    def __init__(self, game_service: GameServices, ai, rectangle_size: int):
+    def __init__(self, game_service: GameServices, ai, rectangle_size: int, fps: int = 60, show_stats: bool = False):
+        """
+        :param game_service: The game service
+        :param ai: The AI playing as the second player
+        :param rectangle_size: The size in pixels of a cell
+        :param fps: The highest number of frames drawn per second
+        :param show_stats: True to draw the frame rate and frame time over the board
+        """
         pygame.init()
         pygame.font.init()
         self.__game_service = game_service
         self.__ai = ai
+        # the AI moves are computed by the worker and then played through the session like the player moves
+        self.__session = GameSession(game_service)
+        # the AI thinks on a background thread while the event loop keeps running
+        self.__worker = AIWorker(ai)
+        self.__thinking_font = pygame.font.Font(pygame.font.get_default_font(), 18)
+        self.__thinking_rectangle = None
         self.__rectangle_size = rectangle_size
         self.__game_state = GameState.ROLLING
         self.__starting_player = 1
         self.__turn = 1
         self.__game_finished = False
 
+        # frame rate cap, redraws only happen after events and only the changed regions are sent to the display
+        self.__clock = pygame.time.Clock()
+        self.__fps = fps
+        self.__dirty_rectangles = []
+        self.__player_moved = False
+        self.__show_stats = show_stats
+        self.__frame_time = 0.0
+        self.__stats_font = pygame.font.Font(pygame.font.get_default_font(), 14) if show_stats else None
+        self.__stats_rectangle = pygame.rect.Rect(0, 0, 190, 20)
+
         # screen creation
         self.__screen_size = [self.__game_service.board.columns * self.__rectangle_size,
                               (self.__game_service.board.rows + 1) * self.__rectangle_size]
         self.__screen = pygame.display.set_mode(self.__screen_size)
+        self.__thinking_rectangle = pygame.rect.Rect(self.__screen_size[0] - 170, 0, 170, 24)
 
         # background creation
         self.__background = pygame.image.load('resources/images/bg1.jpg')
         self.__background = pygame.transform.scale(self.__background, self.__screen_size)
 
+        # the tints of the cells are built before the sprites, while the screen exists
+        atlas = SpriteAtlas.for_image('resources/images/circle.png', self.__rectangle_size)
+        for color in ('white', 'orangered', 'darkblue'):
+            atlas.tinted(pygame.color.THECOLORS[color])
+
         # sprites creation
         self.__player = PlayerSprite('resources/images/circle.png',
                                      pygame.color.THECOLORS['orangered'],
@@ -85,82 +114,206 @@ class GUI:
                 sprite_list.append(sprite)
             self.__board_sprites.append(sprite_list)
 
+        # static layer holding the background and the cells, everything but the hovering player sprite
+        self.__board_layer = pygame.Surface(self.__screen_size)
+        self.__board_layer.blit(self.__background, [0, 0])
+        for row in range(self.__game_service.board.rows):
+            for column in range(self.__game_service.board.columns):
+                self.draw_cell_layer(row, column)
+
         self.__victory_text = None
 
+    def draw_cell_layer(self, row, column):
+        """
+        Draws a cell on the static board layer
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: The rectangle of the cell
+        """
+        rectangle = pygame.rect.Rect(column * self.__rectangle_size, (row + 1) * self.__rectangle_size,
+                                     self.__rectangle_size, self.__rectangle_size)
+        pygame.draw.rect(self.__board_layer, pygame.color.THECOLORS['lightblue'], rectangle)
+        self.__board_sprites[row][column].draw(self.__board_layer)
+        return rectangle
+
     def draw_board(self):
-        self.__screen.blit(self.__background, [0, 0])
+        """
+        Draws the whole screen from the board layer and marks it as changed
+        :return: -
+        """
+        self.__screen.blit(self.__board_layer, [0, 0])
+        self.__player.draw(self.__screen)
+        self.__dirty_rectangles.append(self.__screen.get_rect())
 
-        for row in range(self.__game_service.board.rows):
-            for column in range(self.__game_service.board.columns):
-                pygame.draw.rect(self.__screen, pygame.color.THECOLORS['lightblue'],
-                                 (column * self.__rectangle_size, (row + 1) * self.__rectangle_size,
-                                  self.__rectangle_size, self.__rectangle_size))
-                self.__board_sprites[row][column].draw(self.__screen)
+    def draw_cell(self, row, column):
+        """
+        Redraws a single cell after its piece changed, on the board layer and on the screen
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: -
+        """
+        rectangle = self.draw_cell_layer(row, column)
+        self.__screen.blit(self.__board_layer, rectangle, rectangle)
+        self.__dirty_rectangles.append(rectangle)
 
+    def draw_player(self):
+        """
+        Moves the hovering player sprite to the mouse, erasing it from its previous place
+        :return: -
+        """
+        previous = self.__player.rect.copy()
+        self.__player.update()
+        self.__screen.blit(self.__board_layer, previous, previous)
         self.__player.draw(self.__screen)
+        self.__dirty_rectangles.append(previous.union(self.__player.rect))
+
+    def restore(self, rectangle):
+        """
+        Redraws a region of the screen from the board layer and the hovering player sprite
+        :param rectangle: The region
+        :return: -
+        """
+        self.__screen.blit(self.__board_layer, rectangle, rectangle)
+        if self.__player.rect.colliderect(rectangle):
+            # the rest of the player sprite is already on the screen, blending it again would darken its edges
+            self.__screen.set_clip(rectangle)
+            self.__player.draw(self.__screen)
+            self.__screen.set_clip(None)
+        self.__dirty_rectangles.append(rectangle)
 
-    def is_game_over(self, point, player):
-        if self.__game_service.is_game_over(point, player) == GameOutcome.PLAYER1_WIN:
-            font = pygame.font.Font(pygame.font.get_default_font(), 64)
-            font.set_italic(True)
-            self.__victory_text = font.render('Player 1 wins!!', True, pygame.color.THECOLORS['darkgreen'])
-            return True
-        elif self.__game_service.is_game_over(point, player) == GameOutcome.PLAYER2_WIN:
-            font = pygame.font.Font(pygame.font.get_default_font(), 64)
-            font.set_italic(True)
-            self.__victory_text = font.render('Player 2 wins!!', True, pygame.color.THECOLORS['darkred'])
-            return True
-        elif self.__game_service.is_game_over(point, player) == GameOutcome.DRAW:
-            font = pygame.font.Font(pygame.font.get_default_font(), 64)
-            font.set_italic(True)
-            self.__victory_text = font.render('Draw!!', True, pygame.color.THECOLORS['yellow'])
-            return True
-        return False
+    def draw_thinking(self):
+        """
+        Draws the indicator shown while the AI thinks, its dots moving with the thinking time
+        :return: -
+        """
+        self.restore(self.__thinking_rectangle)
+        dots = '.' * (int(self.__worker.thinking_time * 3) % 4)
+        text = self.__thinking_font.render('AI is thinking' + dots, True, pygame.color.THECOLORS['darkblue'])
+        self.__screen.blit(text, self.__thinking_rectangle.topleft)
+
+    def draw_stats(self):
+        """
+        Draws the frame rate and the time taken by the last frame over the board
+        :return: -
+        """
+        self.restore(self.__stats_rectangle)
+        text = self.__stats_font.render('{:.0f} fps  {:.2f} ms/frame'.format(self.__clock.get_fps(),
+                                                                             self.__frame_time * 1000),
+                                        True, pygame.color.THECOLORS['black'])
+        self.__screen.blit(text, self.__stats_rectangle.topleft)
+        self.__dirty_rectangles.append(self.__stats_rectangle)
+
+    def draw_frame(self):
+        """
+        Sends the changed regions of the screen to the display
+        :return: -
+        """
+        if self.__player_moved:
+            self.draw_player()
+            self.__player_moved = False
+        if self.__worker.busy:
+            self.draw_thinking()
+        if self.__show_stats:
+            self.draw_stats()
+        if self.__dirty_rectangles:
+            pygame.display.update(self.__dirty_rectangles)
+            self.__dirty_rectangles.clear()
+
+    def is_game_over(self):
+        outcome_texts = {
+            GameOutcome.PLAYER1_WIN: ('Player 1 wins!!', 'darkgreen'),
+            GameOutcome.PLAYER2_WIN: ('Player 2 wins!!', 'darkred'),
+            GameOutcome.DRAW: ('Draw!!', 'yellow')
+        }
+        outcome = self.__session.outcome
+        if outcome is None:
+            return False
+        text, color = outcome_texts[outcome]
+        font = pygame.font.Font(pygame.font.get_default_font(), 64)
+        font.set_italic(True)
+        self.__victory_text = font.render(text, True, pygame.color.THECOLORS[color])
+        return True
+
+    def show_victory(self):
+        """
+        Shows the result of the game over the board, then closes the application
+        :return: -
+        """
+        self.__game_state = GameState.GAME_OVER
+        self.draw_frame()
+        destination_rectangle = self.__victory_text.get_rect()
+        destination_rectangle.center = (self.__screen_size[0] // 2,
+                                        self.__screen_size[1] // 2)
+        self.__screen.blit(self.__victory_text, destination_rectangle)
+        pygame.display.update(destination_rectangle)
+        pygame.time.wait(1000)
+        exit(0)
+
+    def handle_event(self, event):
+        """
+        Reacts to an event, drawing what it changed off screen
+        :param event: The pygame event
+        :return: -
+        """
+        if event.type == pygame.QUIT:
+            self.__worker.cancel()
+            exit()
+
+        # clicks are ignored while the AI thinks
+        if event.type == pygame.MOUSEBUTTONDOWN and not self.__worker.busy:
+            try:
+                self.make_player_move(event)
+                if self.is_game_over():
+                    self.show_victory()
+
+                self.__worker.start(self.__game_service)
+            except MoveOutsideBoundsException as mobe:
+                print(mobe)
+
+        if event.type == pygame.MOUSEMOTION:
+            # a burst of mouse motions only moves the sprite once, on the next frame
+            self.__player_moved = True
+
+    def play_ai_move(self):
+        """
+        Makes the move of the AI once the worker has it
+        :return: -
+        """
+        try:
+            column = self.__worker.poll()
+            if column is None:
+                return
+            point = self.__session.play(column)
+            self.__board_sprites[point.y][point.x].change_color(pygame.color.THECOLORS['darkblue'])
+            self.draw_cell(point.y, point.x)
+            self.restore(self.__thinking_rectangle)
+            if self.is_game_over():
+                self.show_victory()
+        except MoveOutsideBoundsException as mobe:
+            print(mobe)
 
     def run_application(self):
+        self.draw_board()
+        pygame.display.update()
+        # the loop sleeps until the next event, unless the stats overlay or the thinking indicator have to be
+        # refreshed at the frame rate cap
+        frame_interval = max(1, 1000 // self.__fps)
         while not self.__game_finished:
-            self.draw_board()
-            pygame.display.update()
+            event = pygame.event.wait(frame_interval if self.__show_stats or self.__worker.busy else 0)
+            start = perf_counter()
+            self.handle_event(event)
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    exit()
-
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    try:
-                        point = self.make_player_move(event)
-                        if self.is_game_over(point, 1):
-                            self.__game_state = GameState.GAME_OVER
-                            destination_rectangle = self.__victory_text.get_rect()
-                            destination_rectangle.center = (self.__screen_size[0] // 2,
-                                                            self.__screen_size[1] // 2)
-                            self.__screen.blit(self.__victory_text, destination_rectangle)
-                            pygame.display.update()
-                            pygame.time.wait(1000)
-                            exit(0)
-
-                        column = self.__ai.make_move(self.__game_service)
-                        point = self.__game_service.make_player2_move(column)
-                        self.__board_sprites[point.y][point.x].change_color(pygame.color.THECOLORS['darkblue'])
-                        self.draw_board()
-                        if self.is_game_over(point, 2):
-                            self.__game_state = GameState.GAME_OVER
-                            destination_rectangle = self.__victory_text.get_rect()
-                            destination_rectangle.center = (self.__screen_size[0] // 2,
-                                                            self.__screen_size[1] // 2)
-                            self.__screen.blit(self.__victory_text, destination_rectangle)
-                            pygame.display.update()
-                            pygame.time.wait(1000)
-                            exit(0)
-                    except MoveOutsideBoundsException as mobe:
-                        print(mobe)
-
-                if event.type == pygame.MOUSEMOTION:
-                    self.__player.update()
+                self.handle_event(event)
+            if self.__worker.busy:
+                self.play_ai_move()
+            self.draw_frame()
+            self.__frame_time = perf_counter() - start
+            self.__clock.tick(self.__fps)
 
     def make_player_move(self, event):
         position_x = event.pos[0]
         column = int(position_x // self.__rectangle_size)
-        point = self.__game_service.make_player1_move(column)
+        point = self.__session.play(column)
         self.__board_sprites[point.y][point.x].change_color(pygame.color.THECOLORS['orangered'])
-        self.draw_board()
+        self.draw_cell(point.y, point.x)
         return point
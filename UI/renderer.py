@@ -0,0 +1,161 @@
+"""
+    Module which contains the incremental text renderer of the board used by the console
+"""
+from domain.cell import CellStatus
+
+
+class BoardFrame:
+    """
+        Class which holds the pre-built text of an empty board as a list of parts, every cell being a part of its own
+        The text mode draws the same table as the __str__ method of the boards, without Texttable; the ANSI mode draws
+        a compact colored grid
+        Frames are built once per board size and mode and shared by all the renderers
+    """
+    __frames = {}
+    TEXT_CELLS = {
+        CellStatus.EMPTY: ' ',
+        CellStatus.OCCUPIED_BY_PLAYER1: '1',
+        CellStatus.OCCUPIED_BY_PLAYER2: '2'
+    }
+    ANSI_CELLS = {
+        CellStatus.EMPTY: '\x1b[2m.\x1b[0m',
+        CellStatus.OCCUPIED_BY_PLAYER1: '\x1b[1;31mO\x1b[0m',
+        CellStatus.OCCUPIED_BY_PLAYER2: '\x1b[1;33mX\x1b[0m'
+    }
+
+    def __init__(self, rows: int, columns: int, ansi: bool = False):
+        self.__rows = rows
+        self.__columns = columns
+        self.__cells = self.ANSI_CELLS if ansi else self.TEXT_CELLS
+        parts = []
+        self.__cell_parts = [[0] * columns for row in range(rows)]
+        headers = [str(column + 1) for column in range(columns)]
+        if ansi:
+            parts.append(' '.join(header.rjust(2) for header in headers) + '\n')
+            for row in range(rows):
+                for column in range(columns):
+                    # every cell sits under the last digit of its header
+                    parts.append(' ' if column == 0 else '  ')
+                    self.__cell_parts[row][column] = len(parts)
+                    parts.append(self.__cells[CellStatus.EMPTY])
+                parts.append('\n')
+            parts[-1] = ''
+        else:
+            # the cells are left aligned in columns as wide as their header, as Texttable draws them
+            widths = [len(header) for header in headers]
+            border = '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+            parts.append(border + '\n')
+            parts.append('| ' + ' | '.join(headers) + ' |\n')
+            parts.append('+' + '+'.join('=' * (width + 2) for width in widths) + '+\n')
+            for row in range(rows):
+                parts.append('| ')
+                for column in range(columns):
+                    self.__cell_parts[row][column] = len(parts)
+                    parts.append(self.__cells[CellStatus.EMPTY])
+                    parts.append(' ' * (widths[column] - 1) + (' | ' if column < columns - 1 else ' |\n'))
+                parts.append(border + ('\n' if row < rows - 1 else ''))
+        self.__parts = tuple(parts)
+
+    @classmethod
+    def for_size(cls, rows: int, columns: int, ansi: bool = False):
+        """
+        Returns the frame of a board size, building it only the first time it is requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :param ansi: True for the compact ANSI mode, False for the text table mode
+        :return: The frame
+        """
+        if (rows, columns, ansi) not in cls.__frames:
+            cls.__frames[(rows, columns, ansi)] = cls(rows, columns, ansi)
+        return cls.__frames[(rows, columns, ansi)]
+
+    @property
+    def parts(self):
+        """
+        Tuple holding the parts of the text of the empty board
+        """
+        return self.__parts
+
+    def cell_part(self, row, column):
+        """
+        Returns the index in parts of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: The index of the part
+        """
+        return self.__cell_parts[row][column]
+
+    def cell_text(self, status):
+        """
+        Returns the text of a cell having the given status
+        :param status: The CellStatus of the cell
+        :return: The text of the cell
+        """
+        return self.__cells[status]
+
+
+class BoardRenderer:
+    """
+        Class which renders the board of a game service, patching only the cells changed by the moves made or undone
+        since the previous render
+    """
+    def __init__(self, rows: int, columns: int, ansi: bool = False):
+        """
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :param ansi: True for the compact ANSI mode, False for the text table mode
+        """
+        self.__frame = BoardFrame.for_size(rows, columns, ansi)
+        self.__parts = list(self.__frame.parts)
+        self.__moves = []
+        self.__text = None
+
+    @classmethod
+    def for_board(cls, board, ansi: bool = False):
+        """
+        Creates a renderer for the size of a board
+        :param board: The board
+        :param ansi: True for the compact ANSI mode, False for the text table mode
+        :return: The renderer
+        """
+        return cls(board.rows, board.columns, ansi)
+
+    def set_cell(self, row, column, status):
+        """
+        Changes the text of a single cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param status: The CellStatus of the cell
+        :return: -
+        """
+        self.__parts[self.__frame.cell_part(row, column)] = self.__frame.cell_text(status)
+        self.__text = None
+
+    def sync(self, service):
+        """
+        Brings the rendered cells up to date with the moves of a game service
+        Only the moves which differ from the ones seen by the previous call are drawn or erased
+        :param service: The game service
+        :return: -
+        """
+        history = service.history
+        common = min(len(self.__moves), len(history))
+        while common > 0 and self.__moves[common - 1] != history[common - 1]:
+            common -= 1
+        for row, column, player_index in self.__moves[common:]:
+            self.set_cell(row, column, CellStatus.EMPTY)
+        for row, column, player_index in history[common:]:
+            self.set_cell(row, column, CellStatus(player_index))
+        self.__moves = history
+
+    def render(self, service=None):
+        """
+        Returns the text of the board, joining the parts again only if a cell changed
+        :param service: The game service whose moves are drawn first, if any
+        :return: The text of the board
+        """
+        if service is not None:
+            self.sync(service)
+        if self.__text is None:
+            self.__text = ''.join(self.__parts)
+        return self.__text
@@ -14,7 +14,7 @@ class CellStatus(IntEnum):
     OCCUPIED_BY_PLAYER2 = 2
 
 
-@dataclass
+@dataclass(slots=True)
 class Cell:
     """
         Class which describes the behaviour and attributes of a cell
@@ -1,14 +1,20 @@
 """
     The entry point of the application
+    Usage: python entry.py [--metrics metrics.json] [--profile game.prof] [--flamegraph game.folded]
+    --metrics records the call counts and latencies of the game, the AI and the rendering and writes them as JSON on
+    exit, --profile runs the game under cProfile and --flamegraph samples the stacks of the game for flamegraph tools
 """
+from argparse import ArgumentParser
 from repos.board import Board
 from services.game_service import GameServices
+from services.instrumentation import Instrumentation, profile
 from AI.random import RandomAI
 from AI.basic import BasicAI
 from UI.console import Console
 from UI.gui import GUI
 
-if __name__ == '__main__':
+
+def run_application():
     board = Board()
     services = GameServices(board)
     ai = BasicAI()
@@ -24,3 +30,23 @@ if __name__ == '__main__':
         ui = GUI(services, ai, 100)
 
     ui.run_application()
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Connect Four against the AI')
+    parser.add_argument('--metrics', help='file the recorded metrics are written to as JSON on exit')
+    parser.add_argument('--profile', help='file the cProfile data is dumped to, a report being printed on exit')
+    parser.add_argument('--flamegraph', help='file the sampled stacks are written to in the collapsed format')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.metrics is not None:
+        Instrumentation.enable()
+    try:
+        profile(run_application, arguments.profile, arguments.flamegraph)
+    finally:
+        if arguments.metrics is not None:
+            Instrumentation.export(arguments.metrics)
+
+
+if __name__ == '__main__':
+    main()
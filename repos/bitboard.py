@@ -0,0 +1,424 @@
+"""
+    Module which contains the implementation of the bitboard backed board
+"""
+from texttable import Texttable
+from domain.cell import CellStatus
+from repos.board import BoardType, BoardSizeCreator, create_geometry
+
+
+class BitBoardLayout:
+    """
+        Class which holds the precomputed masks of a board geometry
+        Every column takes rows + 1 bits, starting from the bottom cell; the extra bit on top of each column is
+        always empty and stops lines from wrapping from one column into the next
+    """
+    __layouts = {}
+
+    def __init__(self, rows: int, columns: int):
+        self.__rows = rows
+        self.__columns = columns
+        self.__height = rows + 1
+        self.__bottom_mask = sum(1 << (column * self.__height) for column in range(columns))
+        self.__board_mask = self.__bottom_mask * ((1 << rows) - 1)
+        self.__directions = (self.__height, 1, self.__height + 1, self.__height - 1)
+        # the shifts of has_alignment for every direction, by connect length
+        self.__shifts = {}
+
+    @classmethod
+    def for_size(cls, rows: int, columns: int):
+        """
+        Returns the layout of a board with the given size, computing it only the first time it is requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The layout of the board
+        """
+        if (rows, columns) not in cls.__layouts:
+            cls.__layouts[(rows, columns)] = cls(rows, columns)
+        return cls.__layouts[(rows, columns)]
+
+    @classmethod
+    def for_type(cls, board_type: BoardType):
+        """
+        Returns the layout of the given board type
+        :param board_type: The type of the board
+        :return: The layout of the board type
+        :raises: BoardTypeException if the board type is invalid
+        """
+        board_size = BoardSizeCreator.create_size(board_type)
+        return cls.for_size(board_size.ROWS.value, board_size.COLUMNS.value)
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def bottom_mask(self):
+        return self.__bottom_mask
+
+    @property
+    def board_mask(self):
+        return self.__board_mask
+
+    @property
+    def directions(self):
+        """
+        The bit shifts which move a cell one step horizontally, vertically and along both diagonals
+        """
+        return self.__directions
+
+    def bit(self, row, column):
+        """
+        Returns the bit of the given cell
+        :param row: The row of the cell, 0 being the top row as in the Board class
+        :param column: The column of the cell
+        :return: An integer having only the bit of the cell set
+        """
+        return 1 << (column * self.__height + self.__rows - 1 - row)
+
+    def has_alignment(self, bits, connect: int = 4):
+        """
+        Checks if a bitmask holds a line of at least connect cells in any direction, with 2 shifts per direction for
+        a line of 4 and 3 for a line of 5
+        :param bits: The bitmask
+        :param connect: The number of cells of a line
+        :return: True - there is a line
+                 False - otherwise
+        """
+        for direction_shifts in self.__line_shifts(connect):
+            line = bits
+            for shift in direction_shifts:
+                line &= line >> shift
+            if line:
+                return True
+        return False
+
+    def completes_line(self, bits, cell, connect: int = 4):
+        """
+        Checks if adding an empty cell to a bitmask makes a line of at least connect cells passing through the cell
+        A line through the cell is one whose first cell is found in the bitmask holding the cell only
+        :param bits: The bitmask, which does not hold the cell
+        :param cell: The bit of the cell
+        :param connect: The number of cells of a line
+        :return: True - the cell completes a line
+                 False - otherwise
+        """
+        with_cell = bits | cell
+        for direction_shifts in self.__line_shifts(connect):
+            line = with_cell
+            line_before = bits
+            for shift in direction_shifts:
+                line &= line >> shift
+                line_before &= line_before >> shift
+            if line & ~line_before:
+                return True
+        return False
+
+    def __line_shifts(self, connect):
+        """
+        Returns the shifts which reduce a bitmask to the first cells of its lines of connect cells, computed only the
+        first time they are requested: along every direction, the mask of the cells starting a line of run cells is
+        combined with itself shifted by up to run cells, which doubles the run until it reaches connect
+        :param connect: The number of cells of a line
+        :return: A list holding the list of shifts of every direction
+        """
+        shifts = self.__shifts.get(connect)
+        if shifts is None:
+            steps = []
+            run = 1
+            while run < connect:
+                steps.append(min(run, connect - run))
+                run += steps[-1]
+            shifts = self.__shifts[connect] = [[step * direction for step in steps] for direction in self.__directions]
+        return shifts
+
+    def mirror(self, bits):
+        """
+        Returns the bitmask mirrored left to right, the first column swapping places with the last one
+        Any value built column by column without carries between the columns is mirrored, position keys included
+        :param bits: The bitmask
+        :return: The mirrored bitmask
+        """
+        column_mask = (1 << self.__height) - 1
+        mirrored = 0
+        shift = (self.__columns - 1) * self.__height
+        while bits:
+            mirrored |= (bits & column_mask) << shift
+            bits >>= self.__height
+            shift -= self.__height
+        return mirrored
+
+
+class BitCell:
+    """
+        Lightweight view over a single cell of a bitboard, offering the same interface as the Cell class
+    """
+    __slots__ = ('__board', '__row', '__column')
+
+    def __init__(self, board, row: int, column: int):
+        self.__board = board
+        self.__row = row
+        self.__column = column
+
+    @property
+    def status(self):
+        return self.__board.status(self.__row, self.__column)
+
+    @status.setter
+    def status(self, value):
+        self.__board.occupy(self.__row, self.__column, value)
+
+    def occupy_by_player1(self):
+        """
+        Mark the cell as being occupied by the first player
+        :return: -
+        """
+        self.status = CellStatus.OCCUPIED_BY_PLAYER1
+
+    def occupy_by_player2(self):
+        """
+        Mark the cell as being occupied by the second player(AI)
+        :return: -
+        """
+        self.status = CellStatus.OCCUPIED_BY_PLAYER2
+
+    def reset(self):
+        """
+        Mark the cell as being empty
+        :return: -
+        """
+        self.status = CellStatus.EMPTY
+
+    def __str__(self):
+        status_display = \
+        {
+            0: ' ',
+            1: '1',
+            2: '2'
+        }
+        return status_display[self.status.value]
+
+
+class BitBoard:
+    """
+        Class which describes a board stored as two bitmasks, one for the pieces of each player
+        It can be used by the game service in place of the Board class
+    """
+    def __init__(self, board_type: BoardType = BoardType.NORMAL, rows: int = None, columns: int = None,
+                 connect: int = 4):
+        """
+        :param board_type: The type of the board, ignored if both rows and columns are given
+        :param rows: The number of rows of a board of any size
+        :param columns: The number of columns of a board of any size
+        :param connect: The number of cells in a line needed to win
+        :raises: BoardTypeException if the board type is invalid
+                 BoardException if the size or the connect length is invalid
+        """
+        self.__type = board_type
+        self.__layout = BitBoardLayout.for_size(*create_geometry(board_type, rows, columns, connect))
+        self.__rows = self.__layout.rows
+        self.__columns = self.__layout.columns
+        self.__connect = connect
+        self.__player1 = 0
+        self.__player2 = 0
+        self.__column_height = [0 for index in range(self.__columns)]
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def column_height(self):
+        return self.__column_height
+
+    @property
+    def connect(self):
+        return self.__connect
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @property
+    def player1_mask(self):
+        return self.__player1
+
+    @property
+    def player2_mask(self):
+        return self.__player2
+
+    def status(self, row, column):
+        """
+        Returns the status of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: The CellStatus of the cell
+        """
+        bit = self.__layout.bit(row, column)
+        if self.__player1 & bit:
+            return CellStatus.OCCUPIED_BY_PLAYER1
+        if self.__player2 & bit:
+            return CellStatus.OCCUPIED_BY_PLAYER2
+        return CellStatus.EMPTY
+
+    def occupy(self, row, column, status):
+        """
+        Sets the status of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param status: The new CellStatus of the cell
+        :return: -
+        """
+        bit = self.__layout.bit(row, column)
+        self.__player1 &= ~bit
+        self.__player2 &= ~bit
+        if status == CellStatus.OCCUPIED_BY_PLAYER1:
+            self.__player1 |= bit
+        elif status == CellStatus.OCCUPIED_BY_PLAYER2:
+            self.__player2 |= bit
+
+    def is_full(self):
+        """
+        Checks if every cell of the board is occupied
+        :return: True - there are no empty cells left
+                 False - otherwise
+        """
+        return self.__player1 | self.__player2 == self.__layout.board_mask
+
+    def player_mask(self, player_index):
+        """
+        Returns the bitmask of the pieces of a player
+        :param player_index: The index of the player, 1 or 2
+        :return: The bitmask
+        """
+        return self.__player1 if player_index == 1 else self.__player2
+
+    def drop(self, column, player_index):
+        """
+        Drops a piece of a player on top of a column with integer operations only
+        :param column: The column, which must not be full
+        :param player_index: The index of the player, 1 or 2
+        :return: The row of the cell taken by the piece, 0 being the top row
+        """
+        height = self.__column_height[column]
+        bit = 1 << (column * (self.__rows + 1) + height)
+        if player_index == 1:
+            self.__player1 |= bit
+        else:
+            self.__player2 |= bit
+        self.__column_height[column] = height + 1
+        return self.__rows - 1 - height
+
+    def take_back(self, column):
+        """
+        Removes the top piece of a column with integer operations only
+        :param column: The column, which must not be empty
+        :return: The row of the emptied cell, 0 being the top row
+        """
+        height = self.__column_height[column] - 1
+        bit = ~(1 << (column * (self.__rows + 1) + height))
+        self.__player1 &= bit
+        self.__player2 &= bit
+        self.__column_height[column] = height
+        return self.__rows - 1 - height
+
+    def clear(self):
+        """
+        Empties the board
+        :return: -
+        """
+        self.__player1 = 0
+        self.__player2 = 0
+        for column in range(self.__columns):
+            self.__column_height[column] = 0
+
+    def has_won(self, player_index):
+        """
+        Checks if a player has a line of at least connect pieces
+        :param player_index: The index of the player, 1 or 2
+        :return: True - the player has a line
+                 False - otherwise
+        """
+        return self.__layout.has_alignment(self.player_mask(player_index), self.__connect)
+
+    def winning_columns(self, player_index):
+        """
+        Returns the columns where a piece of a player would complete a line right away
+        :param player_index: The index of the player, 1 or 2
+        :return: The sorted list of columns
+        """
+        mask = self.player_mask(player_index)
+        height = self.__layout.height
+        rows = self.__rows
+        return [column for column, column_height in enumerate(self.__column_height)
+                if column_height < rows and
+                self.__layout.completes_line(mask, 1 << (column * height + column_height), self.__connect)]
+
+    def threats(self, player_index):
+        """
+        Returns the empty cells which would complete a line of a player, playable yet or not
+        :param player_index: The index of the player, 1 or 2
+        :return: A set of (row, column) tuples
+        """
+        mask = self.player_mask(player_index)
+        occupied = self.__player1 | self.__player2
+        threats = set()
+        for column in range(self.__columns):
+            for row in range(self.__rows - self.__column_height[column]):
+                bit = self.__layout.bit(row, column)
+                if not occupied & bit and self.__layout.completes_line(mask, bit, self.__connect):
+                    threats.add((row, column))
+        return threats
+
+    def is_checkmate(self, row, column, cell_status):
+        """
+        Checks if the given cell is part of a line of at least connect cells, the same rule used by the game service
+        Only the lines of the player of the cell are tested, with shifts of the whole bitmask of the player
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param cell_status: The status of the cell
+        :return: True - the cell completes a line
+                 False - otherwise
+        """
+        if cell_status == CellStatus.OCCUPIED_BY_PLAYER1:
+            mask = self.__player1
+        elif cell_status == CellStatus.OCCUPIED_BY_PLAYER2:
+            mask = self.__player2
+        else:
+            return False
+        bit = self.__layout.bit(row, column)
+        return bool(mask & bit) and self.__layout.completes_line(mask ^ bit, bit, self.__connect)
+
+    def __getitem__(self, item):
+        """
+        Returns the item-th row of the board
+        :param item: The index of the row
+        :return: A list holding views over the cells of the item-th row of the board
+        """
+        if not -self.rows <= item < self.rows:
+            raise IndexError('Row index out of range')
+        return [BitCell(self, item % self.rows, column) for column in range(self.columns)]
+
+    def __str__(self):
+        """
+        Returns the string representation of the board as a text table
+        :return: A string containing the current representation of the board
+        """
+        board = Texttable()
+        header = [index + 1 for index in range(self.columns)]
+        board.header(header)
+
+        for row in range(self.rows):
+            board.add_row(self[row])
+        return board.draw()
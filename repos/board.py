@@ -3,7 +3,8 @@
 """
 from texttable import Texttable
 from enum import Enum
-from domain.cell import Cell
+from domain.cell import Cell, CellStatus
+from repos.win_lines import WinLineTable
 
 
 class BoardException(Exception):
@@ -36,56 +37,104 @@ class BoardType(Enum):
 class BoardSizeCreator:
     """
         Class which handles creating the size of the board
+        Every size is created only once and shared by all the boards of its type
     """
-    @staticmethod
-    def create_normal_size():
+    __sizes = {}
+
+    @classmethod
+    def __create_size(cls, name, rows, columns):
+        """
+        Returns the size with the given name, creating it the first time it is requested
+        :param name: The name of the size
+        :param rows: The number of rows of the size
+        :param columns: The number of columns of the size
+        :return: Enumeration class containing the size
+        """
+        if name not in cls.__sizes:
+            cls.__sizes[name] = Enum('BoardSize', {'ROWS': rows, 'COLUMNS': columns})
+        return cls.__sizes[name]
+
+    @classmethod
+    def create_normal_size(cls):
         """
         Creates the normal size of the board(7x6)
         :return: Enumeration class containing the normal size of the board
         """
-        return Enum('BoardSize', {'ROWS': 6, 'COLUMNS': 7})
+        return cls.__create_size('NORMAL', 6, 7)
 
-    @staticmethod
-    def create_big_size():
+    @classmethod
+    def create_big_size(cls):
         """
         Creates the big size of the board(9x7)
         :return: Enumeration class containing the big size of the board
         """
-        return Enum('BoardSize', {'ROWS': 7, 'COLUMNS': 9})
+        return cls.__create_size('BIG', 7, 9)
 
-    @staticmethod
-    def create_small_size():
+    @classmethod
+    def create_small_size(cls):
         """
         Creates the small size of the board(5x4)
         :return: Enumeration class containing the small size of the board
         """
-        return Enum('BoardSize', {'ROWS': 4, 'COLUMNS': 5})
+        return cls.__create_size('SMALL', 4, 5)
+
+    @classmethod
+    def create_size(cls, board_type: BoardType):
+        """
+        Creates the size of the given board type
+        :param board_type: The type of the board
+        :return: Enumeration class containing the size of the board
+        :raises: BoardTypeException if the board type is invalid
+        """
+        if board_type == BoardType.NORMAL:
+            return cls.create_normal_size()
+        elif board_type == BoardType.BIG:
+            return cls.create_big_size()
+        elif board_type == BoardType.SMALL:
+            return cls.create_small_size()
+        raise BoardTypeException('Invalid board type!')
+
+
+def create_geometry(board_type: BoardType, rows: int = None, columns: int = None, connect: int = 4):
+    """
+    Creates the size of a board, either from its type or from the given number of rows and columns
+    :param board_type: The type of the board, ignored if both rows and columns are given
+    :param rows: The number of rows of a board of any size
+    :param columns: The number of columns of a board of any size
+    :param connect: The number of cells in a line needed to win
+    :return: A tuple (rows, columns)
+    :raises: BoardTypeException if the board type is invalid
+             BoardException if the size or the connect length is invalid
+    """
+    if rows is None or columns is None:
+        board_size = BoardSizeCreator.create_size(board_type)
+        rows, columns = board_size.ROWS.value, board_size.COLUMNS.value
+    if rows < 1 or columns < 1:
+        raise BoardException('Invalid board size!')
+    if not 2 <= connect <= max(rows, columns):
+        raise BoardException('The connect length does not fit on the board!')
+    return rows, columns
 
 
 class Board:
     """
         Class which describes the behaviour and attributes of the board
     """
-    def __init__(self, board_type: BoardType = BoardType.NORMAL):
-        self.__type = board_type
-        self.__create_size()
-        self.__create_board()
-
-    def __create_size(self):
+    def __init__(self, board_type: BoardType = BoardType.NORMAL, rows: int = None, columns: int = None,
+                 connect: int = 4):
         """
-        Creates the size of the board which is represented by the columns and rows properties
-        :return: -
+        :param board_type: The type of the board, ignored if both rows and columns are given
+        :param rows: The number of rows of a board of any size
+        :param columns: The number of columns of a board of any size
+        :param connect: The number of cells in a line needed to win
+        :raises: BoardTypeException if the board type is invalid
+                 BoardException if the size or the connect length is invalid
         """
-        if self.__type == BoardType.NORMAL:
-            board_size = BoardSizeCreator.create_normal_size()
-        elif self.__type == BoardType.BIG:
-            board_size = BoardSizeCreator.create_big_size()
-        elif self.__type == BoardType.SMALL:
-            board_size = BoardSizeCreator.create_small_size()
-        else:
-            raise BoardTypeException('Invalid board type!')
-        self.__columns = board_size.COLUMNS.value
-        self.__rows = board_size.ROWS.value
+        self.__type = board_type
+        self.__rows, self.__columns = create_geometry(board_type, rows, columns, connect)
+        self.__connect = connect
+        self.__win_lines = WinLineTable.for_geometry(self.__rows, self.__columns, connect)
+        self.__create_board()
 
     def __create_board(self):
         """
@@ -97,6 +146,16 @@ class Board:
                         for row in range(self.__rows)]
         self.__column_height = [0 for index in range(self.__columns)]
 
+    def __getstate__(self):
+        # the win line table is shared by every board of the geometry, so it is looked up again instead of copied
+        state = dict(self.__dict__)
+        del state['_Board__win_lines']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__win_lines = WinLineTable.for_geometry(self.__rows, self.__columns, self.__connect)
+
     @property
     def columns(self):
         return self.__columns
@@ -109,6 +168,17 @@ class Board:
     def column_height(self):
         return self.__column_height
 
+    @property
+    def connect(self):
+        return self.__connect
+
+    @property
+    def win_lines(self):
+        """
+        The WinLineTable of the geometry of the board
+        """
+        return self.__win_lines
+
     def __getitem__(self, item):
         """
         Returns the item-th row of the board
@@ -117,6 +187,28 @@ class Board:
         """
         return self.__board[item]
 
+    def occupy(self, row, column, status):
+        """
+        Sets the status of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param status: The new CellStatus of the cell
+        :return: -
+        """
+        self.__board[row][column].status = status
+
+    def is_full(self):
+        """
+        Checks if every cell of the board is occupied
+        :return: True - there are no empty cells left
+                 False - otherwise
+        """
+        for row in self.__board:
+            for cell in row:
+                if cell.status == CellStatus.EMPTY:
+                    return False
+        return True
+
     def __str__(self):
         """
         Returns the string representation of the board as a text table
@@ -136,6 +228,8 @@ class BoardPoint:
     """
     A wrapper class for a 2d point on the board
     """
+    __slots__ = ('__x', '__y')
+
     def __init__(self, x: int, y: int):
         self.__x = x
         self.__y = y
@@ -0,0 +1,244 @@
+"""
+    Module which contains the implementation of the board stored in a single bytearray
+"""
+from texttable import Texttable
+from domain.cell import CellStatus
+from repos.board import BoardType, create_geometry
+from repos.win_lines import WinLineTable
+
+
+class CompactCell:
+    """
+        Lightweight view over a single cell of a compact board, offering the same interface as the Cell class
+    """
+    __slots__ = ('__cells', '__index')
+
+    def __init__(self, cells: bytearray, index: int):
+        self.__cells = cells
+        self.__index = index
+
+    @property
+    def status(self):
+        return CellStatus(self.__cells[self.__index])
+
+    @status.setter
+    def status(self, value):
+        self.__cells[self.__index] = value
+
+    def occupy_by_player1(self):
+        """
+        Mark the cell as being occupied by the first player
+        :return: -
+        """
+        self.__cells[self.__index] = CellStatus.OCCUPIED_BY_PLAYER1
+
+    def occupy_by_player2(self):
+        """
+        Mark the cell as being occupied by the second player(AI)
+        :return: -
+        """
+        self.__cells[self.__index] = CellStatus.OCCUPIED_BY_PLAYER2
+
+    def reset(self):
+        """
+        Mark the cell as being empty
+        :return: -
+        """
+        self.__cells[self.__index] = CellStatus.EMPTY
+
+    def __str__(self):
+        status_display = \
+        {
+            0: ' ',
+            1: '1',
+            2: '2'
+        }
+        return status_display[self.__cells[self.__index]]
+
+
+class CompactRow:
+    """
+        Lightweight view over a row of a compact board, indexed by column like the rows of the Board class
+    """
+    __slots__ = ('__cells', '__row', '__rows', '__columns')
+
+    def __init__(self, cells: bytearray, row: int, rows: int, columns: int):
+        self.__cells = cells
+        self.__row = row
+        self.__rows = rows
+        self.__columns = columns
+
+    def __len__(self):
+        return self.__columns
+
+    def __getitem__(self, item):
+        """
+        Returns a view over the cell of the row in the item-th column
+        :param item: The index of the column
+        :return: The view over the cell
+        """
+        if not -self.__columns <= item < self.__columns:
+            raise IndexError('Column index out of range')
+        return CompactCell(self.__cells, (item % self.__columns) * self.__rows + self.__row)
+
+    def __iter__(self):
+        for column in range(self.__columns):
+            yield CompactCell(self.__cells, column * self.__rows + self.__row)
+
+
+class CompactBoard:
+    """
+        Class which describes a board stored as a single bytearray holding the CellStatus value of every cell
+        The cells are stored column by column, from the top row down, so a board only takes one byte per cell and
+        copying or pickling it copies a single buffer
+        It can be used by the game service in place of the Board class
+    """
+    __slots__ = ('__type', '__rows', '__columns', '__connect', '__win_lines', '__cells', '__column_height')
+
+    def __init__(self, board_type: BoardType = BoardType.NORMAL, rows: int = None, columns: int = None,
+                 connect: int = 4):
+        """
+        :param board_type: The type of the board, ignored if both rows and columns are given
+        :param rows: The number of rows of a board of any size
+        :param columns: The number of columns of a board of any size
+        :param connect: The number of cells in a line needed to win
+        :raises: BoardTypeException if the board type is invalid
+                 BoardException if the size or the connect length is invalid
+        """
+        self.__type = board_type
+        self.__rows, self.__columns = create_geometry(board_type, rows, columns, connect)
+        self.__connect = connect
+        self.__win_lines = WinLineTable.for_geometry(self.__rows, self.__columns, connect)
+        self.__cells = bytearray(self.__rows * self.__columns)
+        self.__column_height = [0 for index in range(self.__columns)]
+
+    def __getstate__(self):
+        # the win line table is shared by every board of the geometry, so it is looked up again instead of copied
+        return self.__type, self.__rows, self.__columns, self.__connect, bytes(self.__cells), self.__column_height
+
+    def __setstate__(self, state):
+        self.__type, self.__rows, self.__columns, self.__connect, cells, column_height = state
+        self.__win_lines = WinLineTable.for_geometry(self.__rows, self.__columns, self.__connect)
+        self.__cells = bytearray(cells)
+        self.__column_height = list(column_height)
+
+    def copy(self):
+        """
+        Returns an independent copy of the board
+        :return: The copy
+        """
+        board = CompactBoard.__new__(CompactBoard)
+        board.__type = self.__type
+        board.__rows = self.__rows
+        board.__columns = self.__columns
+        board.__connect = self.__connect
+        board.__win_lines = self.__win_lines
+        board.__cells = bytearray(self.__cells)
+        board.__column_height = list(self.__column_height)
+        return board
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def column_height(self):
+        return self.__column_height
+
+    @property
+    def connect(self):
+        return self.__connect
+
+    @property
+    def win_lines(self):
+        """
+        The WinLineTable of the geometry of the board
+        """
+        return self.__win_lines
+
+    @property
+    def cells(self):
+        """
+        The bytearray holding the CellStatus value of every cell, the cell of a row and column being at index
+        column * rows + row
+        """
+        return self.__cells
+
+    def status(self, row, column):
+        """
+        Returns the status of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: The CellStatus of the cell
+        """
+        return CellStatus(self.__cells[column * self.__rows + row])
+
+    def occupy(self, row, column, status):
+        """
+        Sets the status of the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param status: The new CellStatus of the cell
+        :return: -
+        """
+        self.__cells[column * self.__rows + row] = status
+
+    def is_full(self):
+        """
+        Checks if every cell of the board is occupied
+        :return: True - there are no empty cells left
+                 False - otherwise
+        """
+        return CellStatus.EMPTY not in self.__cells
+
+    def is_checkmate(self, row, column, cell_status):
+        """
+        Checks if the given cell completes a line of at least connect cells, the same rule used by the game service
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param cell_status: The status of the cell
+        :return: True - the cell completes a line
+                 False - otherwise
+        """
+        cells = self.__cells
+        rows = self.__rows
+        for line in self.__win_lines.cell_lines(row, column):
+            for line_row, line_column in line:
+                if cells[line_column * rows + line_row] != cell_status:
+                    break
+            else:
+                return True
+        return False
+
+    def __getitem__(self, item):
+        """
+        Returns the item-th row of the board
+        :param item: The index of the row
+        :return: A view over the cells of the item-th row of the board
+        """
+        if not -self.__rows <= item < self.__rows:
+            raise IndexError('Row index out of range')
+        return CompactRow(self.__cells, item % self.__rows, self.__rows, self.__columns)
+
+    def __str__(self):
+        """
+        Returns the string representation of the board as a text table
+        :return: A string containing the current representation of the board
+        """
+        board = Texttable()
+        header = [index + 1 for index in range(self.__columns)]
+        board.header(header)
+
+        for row in range(self.__rows):
+            board.add_row(list(self[row]))
+        return board.draw()
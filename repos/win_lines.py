@@ -0,0 +1,88 @@
+"""
+    Module which contains the precomputed winning lines of the board geometries
+"""
+
+
+class WinLineTable:
+    """
+        Class which holds every line of connect cells of a board geometry and, for every cell, the lines passing
+        through it
+        The table is computed once per geometry, so checking if a move wins only looks at the lines through the
+        cell of the move instead of scanning the board
+    """
+    __tables = {}
+    STEPS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+    def __init__(self, rows: int, columns: int, connect: int):
+        self.__rows = rows
+        self.__columns = columns
+        self.__connect = connect
+        lines = []
+        for row in range(rows):
+            for column in range(columns):
+                for row_step, column_step in self.STEPS:
+                    end_row = row + (connect - 1) * row_step
+                    end_column = column + (connect - 1) * column_step
+                    if end_row < rows and 0 <= end_column < columns:
+                        lines.append(tuple((row + step * row_step, column + step * column_step)
+                                           for step in range(connect)))
+        self.__lines = tuple(lines)
+
+        cell_lines = [[[] for column in range(columns)] for row in range(rows)]
+        cell_line_indexes = [[[] for column in range(columns)] for row in range(rows)]
+        for index, line in enumerate(lines):
+            for row, column in line:
+                cell_lines[row][column].append(line)
+                cell_line_indexes[row][column].append(index)
+        self.__cell_lines = tuple(tuple(tuple(cell) for cell in row) for row in cell_lines)
+        self.__cell_line_indexes = tuple(tuple(tuple(cell) for cell in row) for row in cell_line_indexes)
+
+    @classmethod
+    def for_geometry(cls, rows: int, columns: int, connect: int = 4):
+        """
+        Returns the table of a board geometry, computing it only the first time it is requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :param connect: The number of cells in a line needed to win
+        :return: The table of the geometry
+        """
+        if (rows, columns, connect) not in cls.__tables:
+            cls.__tables[(rows, columns, connect)] = cls(rows, columns, connect)
+        return cls.__tables[(rows, columns, connect)]
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    @property
+    def connect(self):
+        return self.__connect
+
+    @property
+    def lines(self):
+        """
+        Tuple holding every line as a tuple of (row, column) cells, ordered by their first cell
+        """
+        return self.__lines
+
+    def cell_lines(self, row, column):
+        """
+        Returns the lines passing through the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: A tuple of lines, each line a tuple of (row, column) cells
+        """
+        return self.__cell_lines[row][column]
+
+    def cell_line_indexes(self, row, column):
+        """
+        Returns the indexes in lines of the lines passing through the given cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :return: A tuple of indexes
+        """
+        return self.__cell_line_indexes[row][column]
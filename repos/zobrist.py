@@ -0,0 +1,115 @@
+"""
+    Module which contains the Zobrist keys used to hash board positions
+"""
+from random import Random
+from domain.cell import CellStatus
+
+
+class ZobristKeys:
+    """
+        Class which holds one random 64 bit key for every (player, cell) pair of a board size
+        The hash of a position is the xor of the keys of its occupied cells, so it can be updated with a single xor
+        when a piece is dropped or taken back
+        The keys are generated from a fixed seed, so every process computes the same hash for the same position
+    """
+    SEED = 0x5EED
+    __keys = {}
+
+    def __init__(self, rows: int, columns: int):
+        generator = Random(self.SEED * 1000003 + rows * 1009 + columns)
+        self.__rows = rows
+        self.__columns = columns
+        self.__cells = {
+            1: [[generator.getrandbits(64) for column in range(columns)] for row in range(rows)],
+            2: [[generator.getrandbits(64) for column in range(columns)] for row in range(rows)]
+        }
+        self.__side = generator.getrandbits(64)
+        self.__drops = {}
+
+    @classmethod
+    def for_size(cls, rows: int, columns: int):
+        """
+        Returns the keys of a board with the given size, generating them only the first time they are requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The Zobrist keys of the board
+        """
+        if (rows, columns) not in cls.__keys:
+            cls.__keys[(rows, columns)] = cls(rows, columns)
+        return cls.__keys[(rows, columns)]
+
+    @property
+    def side(self):
+        """
+        The key which is mixed in by searches to tell apart positions where the second player is to move
+        """
+        return self.__side
+
+    def cells(self, player_index):
+        """
+        Returns the keys of the cells occupied by the given player
+        :param player_index: The index of the player, 1 or 2
+        :return: A list of rows, each row being a list holding the key of every column
+        """
+        return self.__cells[player_index]
+
+    def drops(self, player_index):
+        """
+        Returns the hash changes of the drops of a player, built only the first time they are requested
+        A drop in a column at a height, counted from the bottom, changes the hash of the position by the key of its
+        cell and the side key, and the hash of the mirrored position by the key of the mirrored cell and the side key
+        :param player_index: The index of the player, 1 or 2
+        :return: A tuple holding the changes of the hash and of the mirrored hash, each one a list holding a list per
+                 column indexed by height
+        """
+        if player_index not in self.__drops:
+            cells = self.__cells[player_index]
+            self.__drops[player_index] = tuple(
+                [[cells[self.__rows - 1 - height][cell_column] ^ self.__side for height in range(self.__rows)]
+                 for cell_column in columns]
+                for columns in (range(self.__columns), range(self.__columns - 1, -1, -1)))
+        return self.__drops[player_index]
+
+    def key(self, row, column, player_index):
+        """
+        Returns the key of a cell occupied by the given player
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param player_index: The index of the player, 1 or 2
+        :return: The 64 bit key
+        """
+        return self.__cells[player_index][row][column]
+
+    def hash_board(self, board):
+        """
+        Computes the hash of a board from scratch
+        :param board: The board
+        :return: The 64 bit hash of the position on the board
+        """
+        position_hash = 0
+        for row in range(self.__rows):
+            for column in range(self.__columns):
+                status = board[row][column].status
+                if status == CellStatus.OCCUPIED_BY_PLAYER1:
+                    position_hash ^= self.__cells[1][row][column]
+                elif status == CellStatus.OCCUPIED_BY_PLAYER2:
+                    position_hash ^= self.__cells[2][row][column]
+        return position_hash
+
+    def hash_bits(self, player1_bits, player2_bits):
+        """
+        Computes the hash of a position held in bitmasks from scratch, reading only the occupied cells
+        :param player1_bits: The bitmask of the pieces of the first player, laid out as in the BitBoardLayout class
+        :param player2_bits: The bitmask of the pieces of the second player
+        :return: The 64 bit hash of the position
+        """
+        height = self.__rows + 1
+        position_hash = 0
+        for player_index, bits in ((1, player1_bits), (2, player2_bits)):
+            cells = self.__cells[player_index]
+            while bits:
+                low = bits & -bits
+                index = low.bit_length() - 1
+                position_hash ^= cells[self.__rows - 1 - index % height][index // height]
+                bits ^= low
+        return position_hash
@@ -0,0 +1,512 @@
+"""
+    Module containing the asyncio server hosting many concurrent games over the line-delimited JSON protocol
+    Usage: python -m server.game_server --port 8765 --ai basic --workers 4
+    Every connection plays one game at a time, against the AI or against another client waiting for a game on the
+    same board type; the AI moves are computed in an executor so the event loop never waits for them, the moves of the
+    searching AIs in processes so that they do not hold the GIL the event loop needs
+"""
+import asyncio
+import logging
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import count
+from repos.board import BoardType
+from repos.compact_board import CompactBoard
+from services.game_service import GameServices, GameException
+from services.game_session import GameSession
+from services.game_records import GameRecord, GameRecordWriter
+from AI.random import RandomAI
+from AI.basic import BasicAI
+from AI.negamax import NegamaxAI
+from AI.mcts import MCTSAI
+from AI.transposition import TranspositionTable
+from AI.position import Position
+from server.protocol import encode, decode, ProtocolException, MAX_LINE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# every negamax AI of the process shares one table instead of allocating its own for every game; its entries are
+# keyed by the whole hash of their position and replaced in one assignment, so the games can share them safely
+NEGAMAX_TABLE = TranspositionTable()
+
+# the AIs whose moves are computed in the search processes, as they hold the GIL for the whole time of a move
+SEARCHING_AIS = (NegamaxAI, MCTSAI)
+
+# the AIs of a search process, one per factory, kept from one move to the next with their tables and trees
+SEARCH_PROCESS_AIS = {}
+
+
+def negamax_ai():
+    return NegamaxAI(time_limit=0.2, transposition_table=NEGAMAX_TABLE)
+
+
+def mcts_ai():
+    return MCTSAI(time_limit=0.2)
+
+
+AI_FACTORIES = {
+    'random': RandomAI,
+    'basic': BasicAI,
+    'negamax': negamax_ai,
+    'mcts': mcts_ai
+}
+
+
+def compute_ai_move(ai, service: GameServices):
+    """
+    Computes the move of an AI, run in the executor
+    :param ai: The AI
+    :param service: The game service of the game
+    :return: The column chosen by the AI
+    """
+    return ai.make_move(service)
+
+
+def compute_search_move(ai_factory, position: Position):
+    """
+    Computes the move of a searching AI, run in a search process by the AI the process keeps for the factory
+    :param ai_factory: The factory of the AI, which has to be picklable such as a module level function
+    :param position: The position of the game, the AI being the player to move
+    :return: The column chosen by the AI
+    """
+    ai = SEARCH_PROCESS_AIS.get(ai_factory)
+    if ai is None:
+        ai = SEARCH_PROCESS_AIS[ai_factory] = ai_factory()
+    return ai.search(position)
+
+
+class Connection:
+    """
+        Class which sends the messages of a client through a bounded queue drained by a task of its own
+        A client which stops reading its messages fills its queue and is disconnected, so it never slows down the
+        other clients, its opponent included
+    """
+    FLUSH_TIMEOUT = 5.0
+
+    def __init__(self, writer: asyncio.StreamWriter, max_queued_messages: int):
+        """
+        :param writer: The stream writer of the connection
+        :param max_queued_messages: The largest number of messages waiting to be sent before the client is dropped
+        """
+        self.__writer = writer
+        self.__queue = asyncio.Queue(max_queued_messages)
+        self.__closed = False
+        self.__task = asyncio.get_running_loop().create_task(self.__write_messages())
+        self.game = None
+        self.player = None
+
+    @property
+    def closed(self):
+        return self.__closed
+
+    def send(self, message: dict):
+        """
+        Queues a message without waiting
+        :param message: The message
+        :return: -
+        """
+        if self.__closed:
+            return
+        try:
+            self.__queue.put_nowait(encode(message))
+        except asyncio.QueueFull:
+            self.close()
+
+    async def __write_messages(self):
+        """
+        Writes the queued messages, waiting for the socket buffer to drain after each one
+        :return: -
+        """
+        try:
+            while True:
+                message = await self.__queue.get()
+                try:
+                    self.__writer.write(message)
+                    await self.__writer.drain()
+                finally:
+                    self.__queue.task_done()
+        except ConnectionError:
+            self.close()
+        except asyncio.CancelledError:
+            pass
+
+    async def flush(self):
+        """
+        Waits until every queued message has been written, closing the connection if the client does not read them
+        within FLUSH_TIMEOUT seconds
+        :return: -
+        """
+        if self.__closed:
+            return
+        try:
+            await asyncio.wait_for(self.__queue.join(), self.FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.close()
+
+    def close(self):
+        """
+        Stops sending messages and closes the connection
+        :return: -
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__task.cancel()
+        self.__writer.close()
+
+
+class HostedGame:
+    """
+        Class which holds a game hosted by the server: its session, the connections of its players and its AI
+    """
+    def __init__(self, game_id: int, board_type: BoardType, players: dict, ai=None):
+        """
+        :param game_id: The id of the game
+        :param board_type: The type of the board
+        :param players: Dictionary mapping the player indexes of the clients to their connections
+        :param ai: The AI playing as the second player, None in games between two clients
+        """
+        self.__id = game_id
+        self.__board_type = board_type
+        self.__players = players
+        self.__ai = ai
+        self.__session = GameSession(GameServices(CompactBoard(board_type)))
+        self.finished = False
+
+    @property
+    def id(self):
+        return self.__id
+
+    @property
+    def board_type(self):
+        return self.__board_type
+
+    @property
+    def players(self):
+        return self.__players
+
+    @property
+    def ai(self):
+        return self.__ai
+
+    @property
+    def session(self):
+        return self.__session
+
+    def broadcast(self, message: dict):
+        """
+        Sends a message to every client of the game
+        :param message: The message
+        :return: -
+        """
+        for connection in self.__players.values():
+            connection.send(message)
+
+
+class GameServer:
+    """
+        Class which accepts the clients and hosts their games
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, ai_factory=BasicAI, executor=None,
+                 max_queued_messages: int = 64, records: GameRecordWriter = None, search_executor=None):
+        """
+        :param host: The address the server listens on
+        :param port: The port the server listens on, 0 for any free port
+        :param ai_factory: Function creating the AI of a new game
+        :param executor: The executor computing the moves of the AIs which do not search, a thread pool owned by
+                         the server if None
+        :param max_queued_messages: The largest number of messages waiting to be sent to a client before it is
+                                    dropped
+        :param records: The writer receiving the record of every game played, None to keep no records
+        :param search_executor: The process pool computing the moves of the searching AIs, whose number of processes
+                                is the number of moves searched at once, the other ones waiting for a free process;
+                                one process per core owned by the server and started with the first search if None
+        """
+        self.__host = host
+        self.__port = port
+        self.__ai_factory = ai_factory
+        self.__own_executor = executor is None
+        self.__executor = ThreadPoolExecutor() if executor is None else executor
+        self.__own_search_executor = search_executor is None
+        self.__search_executor = search_executor
+        self.__max_queued_messages = max_queued_messages
+        self.__records = records
+        self.__server = None
+        self.__handlers = {}
+        self.__game_ids = count(1)
+        self.__games = {}
+        self.__waiting = {}
+        self.__games_started = 0
+        self.__games_finished = 0
+        self.__moves = 0
+
+    @property
+    def port(self):
+        """
+        The port the server listens on, known once it is started
+        """
+        return self.__port
+
+    @property
+    def active_games(self):
+        return len(self.__games)
+
+    @property
+    def stats(self):
+        """
+        Dictionary holding the number of games started and finished and the number of moves played
+        """
+        return {'games_started': self.__games_started, 'games_finished': self.__games_finished,
+                'moves': self.__moves}
+
+    async def start(self):
+        """
+        Starts listening for clients
+        :return: -
+        """
+        self.__server = await asyncio.start_server(self.handle_connection, self.__host, self.__port,
+                                                   limit=MAX_LINE_LENGTH)
+        self.__port = self.__server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Serves the clients until the task is cancelled
+        :return: -
+        """
+        if self.__server is None:
+            await self.start()
+        await self.__server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening, disconnects the clients and shuts down the executor if the server owns it
+        :return: -
+        """
+        if self.__server is not None:
+            self.__server.close()
+        handlers = list(self.__handlers.values())
+        for connection in list(self.__handlers):
+            connection.close()
+        # the handlers see the end of their streams and end their games before the executor goes away
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self.__server is not None:
+            await self.__server.wait_closed()
+        if self.__own_executor:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+        if self.__own_search_executor and self.__search_executor is not None:
+            self.__search_executor.shutdown(wait=False, cancel_futures=True)
+            self.__search_executor = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads the messages of a client one at a time until it disconnects
+        The next message is only read once the previous one is handled, AI reply included
+        :param reader: The stream reader of the connection
+        :param writer: The stream writer of the connection
+        :return: -
+        """
+        connection = Connection(writer, self.__max_queued_messages)
+        self.__handlers[connection] = asyncio.current_task()
+        try:
+            while not connection.closed:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    connection.send({'type': 'error', 'message': 'The message is too long!'})
+                    break
+                if not line:
+                    break
+                try:
+                    await self.handle_message(connection, decode(line))
+                except (ProtocolException, GameException) as error:
+                    connection.send({'type': 'error', 'message': str(error)})
+                except Exception as error:
+                    # a failure of the server or of the AI ends the game of the client, which could not go on
+                    logger.exception('Failed to handle a message of a client')
+                    connection.send({'type': 'error', 'message': 'Internal error: {}'.format(error)})
+                    self.leave(connection)
+        except ConnectionError:
+            pass
+        finally:
+            del self.__handlers[connection]
+            self.leave(connection)
+            await connection.flush()
+            connection.close()
+
+    async def handle_message(self, connection: Connection, message: dict):
+        """
+        Handles a message of a client
+        :param connection: The connection of the client
+        :param message: The message
+        :return: -
+        :raises: ProtocolException if the message is invalid
+                 GameException if the move is not allowed
+        """
+        if message['type'] == 'new_game':
+            self.new_game(connection, message)
+        elif message['type'] == 'move':
+            await self.move(connection, message)
+        elif message['type'] == 'leave':
+            self.leave(connection)
+        else:
+            raise ProtocolException('Unknown message type!')
+
+    def new_game(self, connection: Connection, message: dict):
+        """
+        Starts a game against the AI or pairs the client with a waiting client
+        :param connection: The connection of the client
+        :param message: The new_game message
+        :return: -
+        :raises: ProtocolException if the client is already playing or the message is invalid
+        """
+        if connection.game is not None or connection in self.__waiting.values():
+            raise ProtocolException('You are already in a game!')
+        board_name = message.get('board', BoardType.NORMAL.name)
+        if board_name not in BoardType.__members__:
+            raise ProtocolException('Invalid board type!')
+        board_type = BoardType[board_name]
+        mode = message.get('mode', 'ai')
+        if mode == 'ai':
+            self.start_game(board_type, {1: connection}, self.__ai_factory())
+        elif mode == 'human':
+            opponent = self.__waiting.pop(board_type, None)
+            if opponent is None or opponent.closed:
+                self.__waiting[board_type] = connection
+                connection.send({'type': 'waiting'})
+            else:
+                self.start_game(board_type, {1: opponent, 2: connection})
+        else:
+            raise ProtocolException('Invalid game mode!')
+
+    def start_game(self, board_type: BoardType, players: dict, ai=None):
+        """
+        Creates a game and tells its clients
+        :param board_type: The type of the board
+        :param players: Dictionary mapping the player indexes of the clients to their connections
+        :param ai: The AI playing as the second player, None in games between two clients
+        :return: The game
+        """
+        game = HostedGame(next(self.__game_ids), board_type, players, ai)
+        self.__games[game.id] = game
+        self.__games_started += 1
+        board = game.session.board
+        for player_index, connection in players.items():
+            connection.game = game
+            connection.player = player_index
+            connection.send({'type': 'start', 'game': game.id, 'player': player_index, 'board': board_type.name,
+                             'rows': board.rows, 'columns': board.columns})
+        return game
+
+    async def move(self, connection: Connection, message: dict):
+        """
+        Plays the move of a client, followed by the move of the AI in games against it
+        :param connection: The connection of the client
+        :param message: The move message
+        :return: -
+        :raises: ProtocolException if the client is not playing or the column is invalid
+                 GameException if it is not the turn of the client or the column is full
+        """
+        game = connection.game
+        if game is None:
+            raise ProtocolException('You are not in a game!')
+        column = message.get('column')
+        if not isinstance(column, int) or not 0 <= column < game.session.board.columns:
+            raise ProtocolException('Invalid column!')
+        if game.session.to_move != connection.player:
+            raise ProtocolException('It is not your turn!')
+        self.play(game, column)
+        if game.ai is not None and not game.finished:
+            loop = asyncio.get_running_loop()
+            if isinstance(game.ai, SEARCHING_AIS):
+                if self.__search_executor is None:
+                    self.__search_executor = ProcessPoolExecutor()
+                column = await loop.run_in_executor(self.__search_executor, compute_search_move, self.__ai_factory,
+                                                    Position.from_board(game.session.board))
+            else:
+                # the AI gets the service of the game itself rather than a snapshot, which would have to hash and
+                # scan the board again: nothing else touches the game while its only client waits for the reply
+                column = await loop.run_in_executor(self.__executor, compute_ai_move, game.ai, game.session.service)
+            # the client may have left while the AI was thinking
+            if not game.finished:
+                self.play(game, column)
+
+    def play(self, game: HostedGame, column: int):
+        """
+        Makes a move in a game and tells its clients, ending the game if the move was the last one
+        :param game: The game
+        :param column: The column of the move
+        :return: -
+        """
+        player_index = game.session.to_move
+        point = game.session.play(column)
+        self.__moves += 1
+        game.broadcast({'type': 'move', 'player': player_index, 'row': point.y, 'column': point.x})
+        if game.session.outcome is not None:
+            self.finish(game, game.session.outcome.name)
+
+    def finish(self, game: HostedGame, outcome: str):
+        """
+        Ends a game and tells its clients
+        :param game: The game
+        :param outcome: The name of the outcome
+        :return: -
+        """
+        game.finished = True
+        game.broadcast({'type': 'game_over', 'outcome': outcome})
+        if self.__records is not None and len(game.session.history) > 0:
+            # abandoned games are recorded without an outcome
+            self.__records.write(GameRecord.from_service(game.session.service, game.board_type,
+                                                         game.session.outcome))
+        for connection in game.players.values():
+            connection.game = None
+            connection.player = None
+        del self.__games[game.id]
+        self.__games_finished += 1
+
+    def leave(self, connection: Connection):
+        """
+        Takes a client out of the matchmaking queue and out of its game, which ends for its opponent
+        :param connection: The connection of the client
+        :return: -
+        """
+        for board_type, waiting in list(self.__waiting.items()):
+            if waiting is connection:
+                del self.__waiting[board_type]
+        if connection.game is not None:
+            self.finish(connection.game, 'ABANDONED')
+
+
+async def serve(host: str, port: int, ai_factory, search_executor, records=None):
+    server = GameServer(host, port, ai_factory, records=records, search_executor=search_executor)
+    await server.start()
+    print('Serving on {}:{}'.format(host, server.port))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Hosts Connect Four games over line-delimited JSON')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ai', choices=sorted(AI_FACTORIES), default='basic')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes of the searching AIs, one per core by default')
+    parser.add_argument('--records', default=None, help='file receiving the record of every game played')
+    arguments = parser.parse_args(arguments)
+
+    executor = ProcessPoolExecutor(arguments.workers)
+    records = GameRecordWriter(arguments.records) if arguments.records is not None else None
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, AI_FACTORIES[arguments.ai], executor, records))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if records is not None:
+            records.close()
+
+
+if __name__ == '__main__':
+    main()
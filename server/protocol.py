@@ -0,0 +1,54 @@
+"""
+    Module containing the line-delimited JSON protocol spoken by the game server and its clients
+    Every message is a JSON object on a single line, its "type" key naming the message
+
+    Client messages:
+        {"type": "new_game", "mode": "ai" or "human", "board": "NORMAL", "BIG" or "SMALL"}
+        {"type": "move", "column": <index of the column>}
+        {"type": "leave"}
+    Server messages:
+        {"type": "waiting"}                                       the client waits for a human opponent
+        {"type": "start", "game": <id>, "player": 1 or 2, "board": <board type>, "rows": <rows>, "columns": <columns>}
+        {"type": "move", "player": 1 or 2, "row": <row>, "column": <column>}
+        {"type": "game_over", "outcome": "PLAYER1_WIN", "PLAYER2_WIN", "DRAW" or "ABANDONED"}
+        {"type": "error", "message": <text>}
+"""
+import json
+
+MAX_LINE_LENGTH = 4096
+
+
+class ProtocolException(Exception):
+    """
+        Custom exception class for malformed messages
+    """
+    def __init__(self, message):
+        self.__message = message
+
+    def __str__(self):
+        return self.__message
+
+
+def encode(message: dict):
+    """
+    Encodes a message as a line
+    :param message: The message
+    :return: The bytes of the line, ending with a newline
+    """
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+def decode(line: bytes):
+    """
+    Decodes a line into a message
+    :param line: The bytes of the line, with or without its newline
+    :return: The message
+    :raises: ProtocolException if the line is not a JSON object with a string type
+    """
+    try:
+        message = json.loads(line)
+    except (ValueError, UnicodeDecodeError):
+        raise ProtocolException('The message is not valid JSON!')
+    if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+        raise ProtocolException('The message has no type!')
+    return message
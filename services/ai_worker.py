@@ -0,0 +1,138 @@
+"""
+    Module containing the worker which computes the moves of an AI in the background
+"""
+import copy
+from threading import Thread, Event
+from time import perf_counter
+from services.game_service import GameServices, GameException
+
+
+class AIWorkerException(GameException):
+    """
+        Exception which occurs if the worker is asked for a move while it is already computing one
+    """
+    pass
+
+
+class AIWorker:
+    """
+        Class which runs the make_move method of an AI on a background thread, so that the caller keeps running while
+        the AI thinks
+        The AI plays on a snapshot of the game, so the game itself is never touched by the background thread; the
+        caller polls for the column and makes the move itself
+        A thread is used rather than a process so that the AI keeps its state, such as its transposition table, from
+        one move to the next
+    """
+    def __init__(self, ai):
+        """
+        :param ai: The AI, any object with a make_move(service) method; if it also has a stop method, it is called
+                   to cut the search short when the move is cancelled, and its resume method is called before the
+                   next move starts
+        """
+        self.__ai = ai
+        self.__thread = None
+        self.__abandoned = None
+        self.__cancelled = Event()
+        self.__column = None
+        self.__error = None
+        self.__started = None
+
+    @property
+    def ai(self):
+        return self.__ai
+
+    @property
+    def busy(self):
+        """
+        True while a move is being computed or waits to be picked up by poll
+        """
+        return self.__thread is not None
+
+    @property
+    def thinking_time(self):
+        """
+        The number of seconds since the current move was requested, 0 if the worker is not busy
+        """
+        return perf_counter() - self.__started if self.busy else 0.0
+
+    def start(self, service: GameServices):
+        """
+        Starts computing the move of the AI on a snapshot of the game
+        :param service: The game service
+        :return: -
+        :raises: AIWorkerException if a move is already being computed
+        """
+        if self.busy:
+            raise AIWorkerException('The AI is already thinking!')
+        if self.__abandoned is not None:
+            # the AI is not shared between two threads, the cancelled move has to end first
+            self.__abandoned.join()
+            self.__abandoned = None
+        # the stop request of a cancelled move is only cleared here, before the next move starts: a search clearing
+        # it itself would lose a cancel sent before it got to run
+        resume = getattr(self.__ai, 'resume', None)
+        if resume is not None:
+            resume()
+        snapshot = GameServices(copy.deepcopy(service.board))
+        self.__cancelled = Event()
+        self.__column = None
+        self.__error = None
+        self.__started = perf_counter()
+        self.__thread = Thread(target=self.__run, args=(snapshot, self.__cancelled), daemon=True)
+        self.__thread.start()
+
+    def __run(self, snapshot, cancelled):
+        """
+        Computes the move, run on the background thread
+        :param snapshot: The game service holding the snapshot of the game
+        :param cancelled: The event set if the move is cancelled
+        :return: -
+        """
+        try:
+            column = self.__ai.make_move(snapshot)
+        except Exception as error:
+            if not cancelled.is_set():
+                self.__error = error
+        else:
+            if not cancelled.is_set():
+                self.__column = column
+
+    def poll(self):
+        """
+        Picks up the move if it is ready
+        :return: The column chosen by the AI, None if it is still thinking or not busy
+        :raises: The exception raised by the AI, if any
+        """
+        if self.__thread is None or self.__thread.is_alive():
+            return None
+        self.__thread = None
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+        return self.__column
+
+    def wait(self, timeout: float = None):
+        """
+        Blocks until the move is ready
+        :param timeout: The longest wait in seconds, None to wait for as long as it takes
+        :return: The column chosen by the AI, None if it is still thinking after the timeout or not busy
+        :raises: The exception raised by the AI, if any
+        """
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+        return self.poll()
+
+    def cancel(self):
+        """
+        Abandons the move being computed, asking the AI to stop if it can; the thread is left to finish on its own,
+        its result is thrown away and the next move only starts once it is over
+        :return: -
+        """
+        if self.__thread is None:
+            return
+        self.__cancelled.set()
+        stop = getattr(self.__ai, 'stop', None)
+        if stop is not None:
+            stop()
+        self.__abandoned = self.__thread
+        self.__thread = None
@@ -0,0 +1,231 @@
+"""
+    Module containing the implementation of the game logic for many games played at once
+"""
+import numpy as np
+from repos.board import BoardType
+from repos.bitboard import BitBoardLayout
+from repos.win_lines import WinLineTable
+from services.game_service import MoveOutsideBoundsException
+
+
+class WindowTable:
+    """
+        Class which holds the index arrays of every line of 4 cells of a board size
+        Cells are indexed row by row in the flattened board, as in the cells array of the batch service
+    """
+    __tables = {}
+
+    def __init__(self, rows: int, columns: int):
+        windows = [[row * columns + column for row, column in line]
+                   for line in WinLineTable.for_geometry(rows, columns, 4).lines]
+        self.__windows = np.array(windows, dtype=np.intp)
+
+        cell_windows = [[] for cell in range(rows * columns)]
+        for index, window in enumerate(windows):
+            for cell in window:
+                cell_windows[cell].append(index)
+        width = max(len(indexes) for indexes in cell_windows)
+        # every cell gets the same number of windows, the missing ones padded with window 0 and masked out
+        self.__cell_windows = np.zeros((rows * columns, width), dtype=np.intp)
+        self.__cell_windows_valid = np.zeros((rows * columns, width), dtype=bool)
+        self.__cell_window_others = np.zeros((rows * columns, width, 3), dtype=np.intp)
+        for cell, indexes in enumerate(cell_windows):
+            self.__cell_windows[cell, :len(indexes)] = indexes
+            self.__cell_windows_valid[cell, :len(indexes)] = True
+            for position, index in enumerate(indexes):
+                self.__cell_window_others[cell, position] = [other for other in windows[index] if other != cell]
+
+    @classmethod
+    def for_size(cls, rows: int, columns: int):
+        """
+        Returns the window table of a board size, computing it only the first time it is requested
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :return: The window table
+        """
+        if (rows, columns) not in cls.__tables:
+            cls.__tables[(rows, columns)] = cls(rows, columns)
+        return cls.__tables[(rows, columns)]
+
+    @property
+    def windows(self):
+        """
+        Array of shape (windows, 4) holding the flat cell indexes of every window
+        """
+        return self.__windows
+
+    @property
+    def cell_windows(self):
+        """
+        Array of shape (cells, width) holding the indexes of the windows passing through every cell
+        """
+        return self.__cell_windows
+
+    @property
+    def cell_windows_valid(self):
+        """
+        Array of shape (cells, width) which is False where cell_windows holds padding
+        """
+        return self.__cell_windows_valid
+
+    @property
+    def cell_window_others(self):
+        """
+        Array of shape (cells, width, 3) holding, for every window passing through a cell, its other 3 cells
+        """
+        return self.__cell_window_others
+
+
+class BatchGameServices:
+    """
+        Class which handles the game logic of many games of the same board type played at once
+        The boards are stored in a single array of shape (games, rows, columns) holding CellStatus values
+        Every call applies one move to every game which is still in progress
+    """
+    ONGOING = 0
+    PLAYER1_WIN = 1
+    PLAYER2_WIN = 2
+    DRAW = 3
+
+    def __init__(self, board_type: BoardType, games: int, starting_players=None):
+        """
+        :param board_type: The type of every board
+        :param games: The number of games
+        :param starting_players: Array holding the index of the player who moves first in every game,
+                                 the first player starting every game if it is None
+        """
+        layout = BitBoardLayout.for_type(board_type)
+        self.__board_type = board_type
+        self.__games = games
+        self.__rows = layout.rows
+        self.__columns = layout.columns
+        self.__table = WindowTable.for_size(self.__rows, self.__columns)
+        self.__game_indexes = np.arange(games)
+        self.__starting_players = np.ones(games, dtype=np.int8) if starting_players is None \
+            else np.asarray(starting_players, dtype=np.int8).copy()
+        self.reset()
+
+    @property
+    def board_type(self):
+        return self.__board_type
+
+    @property
+    def games(self):
+        return self.__games
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def columns(self):
+        return self.__columns
+
+    @property
+    def cells(self):
+        """
+        Array of shape (games, rows, columns) holding the status of every cell, row 0 being the top row
+        """
+        return self.__cells.reshape(self.__games, self.__rows, self.__columns)
+
+    @property
+    def column_height(self):
+        """
+        Array of shape (games, columns) holding how many cells of every column are occupied
+        """
+        return self.__heights
+
+    @property
+    def to_move(self):
+        """
+        Array holding the index of the player to move in every game
+        """
+        return self.__to_move
+
+    @property
+    def outcomes(self):
+        """
+        Array holding ONGOING, PLAYER1_WIN, PLAYER2_WIN or DRAW for every game
+        """
+        return self.__outcomes
+
+    @property
+    def moves(self):
+        """
+        Array holding the number of moves made in every game
+        """
+        return self.__moves
+
+    def active(self):
+        """
+        Returns which games are still in progress
+        :return: Boolean array of shape (games,)
+        """
+        return self.__outcomes == self.ONGOING
+
+    def available_columns(self):
+        """
+        Returns the columns where a piece can be dropped in every game in progress
+        :return: Boolean array of shape (games, columns)
+        """
+        return (self.__heights < self.__rows) & self.active()[:, None]
+
+    def reset(self):
+        """
+        Empties every board for a new batch of games
+        :return: -
+        """
+        self.__cells = np.zeros((self.__games, self.__rows * self.__columns), dtype=np.int8)
+        self.__heights = np.zeros((self.__games, self.__columns), dtype=np.int8)
+        self.__to_move = self.__starting_players.copy()
+        self.__outcomes = np.full(self.__games, self.ONGOING, dtype=np.int8)
+        self.__moves = np.zeros(self.__games, dtype=np.int16)
+
+    def make_moves(self, columns):
+        """
+        Drops a piece of the player to move in the given column of every game in progress, then checks which games
+        are over
+        :param columns: Array holding the column of every game; the entries of finished games are ignored
+        :return: -
+        :raises: MoveOutsideBoundsException if a move of a game in progress is outside of the board
+        """
+        columns = np.asarray(columns, dtype=np.intp)
+        games = self.__game_indexes[self.active()]
+        columns = columns[games]
+        if np.any((columns < 0) | (columns >= self.__columns)):
+            raise MoveOutsideBoundsException('Move is outside of the board!')
+        heights = self.__heights[games, columns]
+        if np.any(heights >= self.__rows):
+            raise MoveOutsideBoundsException('Move is outside of the board!')
+
+        cells = (self.__rows - 1 - heights).astype(np.intp) * self.__columns + columns
+        players = self.__to_move[games]
+        self.__cells[games, cells] = players
+        self.__heights[games, columns] += 1
+        self.__moves[games] += 1
+
+        others = self.__table.cell_window_others[cells]
+        lines = (self.__cells[games[:, None, None], others] == players[:, None, None]).all(axis=2)
+        wins = (lines & self.__table.cell_windows_valid[cells]).any(axis=1)
+        self.__outcomes[games[wins]] = players[wins]
+        full = ~wins & (self.__moves[games] == self.__rows * self.__columns)
+        self.__outcomes[games[full]] = self.DRAW
+        self.__to_move[games] = 3 - players
+
+    def winning_moves(self, players):
+        """
+        Finds the columns where dropping a piece would connect 4 for the given player of every game in progress
+        :param players: The index of the player, either a single index or an array holding one per game
+        :return: Boolean array of shape (games, columns)
+        """
+        players = np.broadcast_to(np.asarray(players, dtype=np.int8), (self.__games,))
+        wins = np.zeros((self.__games, self.__columns), dtype=bool)
+        games = self.__game_indexes[self.active()]
+        heights = self.__heights[games].astype(np.intp)
+        # full columns point at their top cell, they are masked out by the available columns anyway
+        cells = np.maximum(self.__rows - 1 - heights, 0) * self.__columns + np.arange(self.__columns)
+        others = self.__table.cell_window_others[cells]
+        values = self.__cells[games[:, None, None, None], others]
+        lines = (values == players[games][:, None, None, None]).all(axis=3)
+        wins[games] = (lines & self.__table.cell_windows_valid[cells]).any(axis=2)
+        return wins & self.available_columns()
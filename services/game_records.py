@@ -0,0 +1,364 @@
+"""
+    Module containing the compact binary format of the game records and its streaming writer and readers
+    A record file holds a header followed by the records, one after the other:
+        flags       1 byte, the board type in bits 0-1, the first player in bit 2 and the outcome in bits 3-4
+        move count  1 byte
+        moves       the columns of the moves, packed little-endian at the fewest bits holding a column of the board,
+                    3 bits on the NORMAL and SMALL boards and 4 bits on the BIG board
+    A full game on the NORMAL board takes 18 bytes
+"""
+import mmap
+import struct
+from repos.board import BoardType, BoardSizeCreator
+from repos.compact_board import CompactBoard
+from services.game_service import GameServices, GameOutcome
+
+BOARD_CODES = {board_type: code for code, board_type in enumerate(BoardType)}
+OUTCOME_CODES = {None: 0, GameOutcome.PLAYER1_WIN: 1, GameOutcome.PLAYER2_WIN: 2, GameOutcome.DRAW: 3}
+
+
+class GameRecordException(Exception):
+    """
+        Custom exception class for invalid game records and record files
+    """
+    def __init__(self, message):
+        self.__message = message
+
+    def __str__(self):
+        return self.__message
+
+
+def move_bits(board_type: BoardType):
+    """
+    Returns the number of bits of a move on a board type
+    :param board_type: The type of the board
+    :return: The number of bits holding any column of the board
+    """
+    columns = BoardSizeCreator.create_size(board_type).COLUMNS.value
+    return max(1, (columns - 1).bit_length())
+
+
+class GameRecord:
+    """
+        Class which holds a game as its board type, first player, moves and outcome
+        The moves are kept packed; records read from a buffer keep a view of the buffer instead of a copy of their
+        moves, so iterating over a mapped file copies nothing
+    """
+    __slots__ = ('__board_type', '__starting_player', '__outcome', '__move_count', '__packed')
+    HEADER = struct.Struct('<BB')
+
+    def __init__(self, board_type: BoardType, starting_player: int, columns, outcome: GameOutcome = None):
+        """
+        :param board_type: The type of the board
+        :param starting_player: The index of the player who moved first
+        :param columns: The columns of the moves, in the order they were made
+        :param outcome: The GameOutcome of the game, None if it did not end
+        :raises: GameRecordException if the player, a column or the number of moves is invalid
+        """
+        size = BoardSizeCreator.create_size(board_type)
+        if starting_player not in (1, 2):
+            raise GameRecordException('Invalid player!')
+        if len(columns) > size.ROWS.value * size.COLUMNS.value:
+            raise GameRecordException('Too many moves for the board!')
+        bits = move_bits(board_type)
+        value = 0
+        for index, column in enumerate(columns):
+            if not 0 <= column < size.COLUMNS.value:
+                raise GameRecordException('Move is outside of the board!')
+            value |= column << (index * bits)
+        self.__board_type = board_type
+        self.__starting_player = starting_player
+        self.__outcome = outcome
+        self.__move_count = len(columns)
+        self.__packed = value.to_bytes((len(columns) * bits + 7) // 8, 'little')
+
+    @classmethod
+    def from_packed(cls, board_type: BoardType, starting_player: int, outcome, move_count: int, packed):
+        """
+        Creates a record from its packed moves without checking or copying them
+        :param board_type: The type of the board
+        :param starting_player: The index of the player who moved first
+        :param outcome: The GameOutcome of the game, None if it did not end
+        :param move_count: The number of moves
+        :param packed: A bytes-like object holding the packed moves
+        :return: The record
+        """
+        record = cls.__new__(cls)
+        record.__board_type = board_type
+        record.__starting_player = starting_player
+        record.__outcome = outcome
+        record.__move_count = move_count
+        record.__packed = packed
+        return record
+
+    @classmethod
+    def from_service(cls, service: GameServices, board_type: BoardType, outcome: GameOutcome = None):
+        """
+        Creates the record of the moves made through a game service
+        :param service: The game service
+        :param board_type: The type of the board of the service
+        :param outcome: The GameOutcome of the game, None if it did not end
+        :return: The record
+        :raises: GameRecordException if no move was made
+        """
+        history = service.history
+        if len(history) == 0:
+            raise GameRecordException('The game has no moves!')
+        return cls(board_type, history[0][2], [column for row, column, player_index in history], outcome)
+
+    @property
+    def board_type(self):
+        return self.__board_type
+
+    @property
+    def starting_player(self):
+        return self.__starting_player
+
+    @property
+    def outcome(self):
+        """
+        The GameOutcome of the game, None if it did not end
+        """
+        return self.__outcome
+
+    @property
+    def packed(self):
+        """
+        The packed moves, a view of the buffer the record was read from if any
+        """
+        return self.__packed
+
+    @property
+    def moves(self):
+        """
+        Tuple holding the columns of the moves, in the order they were made
+        """
+        bits = move_bits(self.__board_type)
+        value = int.from_bytes(self.__packed, 'little')
+        mask = (1 << bits) - 1
+        return tuple((value >> (index * bits)) & mask for index in range(self.__move_count))
+
+    def __len__(self):
+        return self.__move_count
+
+    def __eq__(self, other):
+        if not isinstance(other, GameRecord):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __repr__(self):
+        return 'GameRecord({}, {}, {}, {})'.format(self.__board_type, self.__starting_player, self.moves,
+                                                   self.__outcome)
+
+    def copy(self):
+        """
+        Returns a record owning its moves, which outlives the buffer this record was read from
+        :return: The record
+        """
+        return GameRecord.from_packed(self.__board_type, self.__starting_player, self.__outcome, self.__move_count,
+                                      bytes(self.__packed))
+
+    def to_bytes(self):
+        """
+        Encodes the record
+        :return: The bytes of the record
+        """
+        flags = BOARD_CODES[self.__board_type] | (self.__starting_player - 1) << 2 | OUTCOME_CODES[self.__outcome] << 3
+        return self.HEADER.pack(flags, self.__move_count) + bytes(self.__packed)
+
+    def replay(self, move_count: int = None, board_class=CompactBoard):
+        """
+        Rebuilds a position of the game
+        :param move_count: The number of moves made in the position, all of them if None
+        :param board_class: The class of the board of the returned service
+        :return: A game service holding the position
+        :raises: GameRecordException if the number of moves is invalid
+        """
+        moves = self.moves
+        if move_count is None:
+            move_count = len(moves)
+        if not 0 <= move_count <= len(moves):
+            raise GameRecordException('Invalid number of moves!')
+        service = GameServices(board_class(self.__board_type))
+        player_index = self.__starting_player
+        for column in moves[:move_count]:
+            if player_index == 1:
+                service.make_player1_move(column)
+            else:
+                service.make_player2_move(column)
+            player_index = 3 - player_index
+        return service
+
+
+BOARD_TYPES = {code: board_type for board_type, code in BOARD_CODES.items()}
+OUTCOMES = {code: outcome for outcome, code in OUTCOME_CODES.items()}
+PACKED_SIZES = {board_type: [(count * move_bits(board_type) + 7) // 8 for count in range(256)]
+                for board_type in BoardType}
+
+
+def decode_flags(flags: int):
+    """
+    Decodes the flags byte of a record
+    :param flags: The flags byte
+    :return: A tuple (board type, starting player, outcome)
+    :raises: GameRecordException if the board type is invalid
+    """
+    if flags & 3 not in BOARD_TYPES:
+        raise GameRecordException('Invalid board type in a record!')
+    return BOARD_TYPES[flags & 3], (flags >> 2 & 1) + 1, OUTCOMES[flags >> 3 & 3]
+
+
+class GameRecordWriter:
+    """
+        Class which streams records to a file, one write per record
+    """
+    MAGIC = b'C4GR'
+    VERSION = 1
+    HEADER = struct.Struct('<4sH')
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the record file, overwritten if it exists
+        """
+        self.__file = open(path, 'wb')
+        self.__file.write(self.HEADER.pack(self.MAGIC, self.VERSION))
+        self.__count = 0
+
+    @property
+    def count(self):
+        """
+        The number of records written
+        """
+        return self.__count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def write(self, record: GameRecord):
+        """
+        Appends a record to the file
+        :param record: The record
+        :return: -
+        """
+        self.__file.write(record.to_bytes())
+        self.__count += 1
+
+    def flush(self):
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
+
+
+def check_file_header(header):
+    """
+    Checks the header of a record file
+    :param header: A bytes-like object starting with the header
+    :return: -
+    :raises: GameRecordException if the header is not the one of a record file
+    """
+    if len(header) < GameRecordWriter.HEADER.size:
+        raise GameRecordException('The record file is too short!')
+    magic, version = GameRecordWriter.HEADER.unpack_from(header, 0)
+    if magic != GameRecordWriter.MAGIC or version != GameRecordWriter.VERSION:
+        raise GameRecordException('The file is not a record file!')
+
+
+def read_records(path: str):
+    """
+    Reads the records of a file one at a time, in constant memory whatever the size of the file
+    :param path: The path of the record file
+    :return: A generator of the records
+    :raises: GameRecordException if the file is not a record file or is truncated
+    """
+    with open(path, 'rb') as file:
+        check_file_header(file.read(GameRecordWriter.HEADER.size))
+        while True:
+            header = file.read(GameRecord.HEADER.size)
+            if len(header) == 0:
+                return
+            if len(header) < GameRecord.HEADER.size:
+                raise GameRecordException('The record file is truncated!')
+            flags, move_count = GameRecord.HEADER.unpack(header)
+            board_type, starting_player, outcome = decode_flags(flags)
+            size = PACKED_SIZES[board_type][move_count]
+            packed = file.read(size)
+            if len(packed) < size:
+                raise GameRecordException('The record file is truncated!')
+            yield GameRecord.from_packed(board_type, starting_player, outcome, move_count, packed)
+
+
+def iter_records(buffer):
+    """
+    Iterates over the records of a file held in a buffer without copying them, every record keeping a view of the
+    buffer
+    :param buffer: A bytes-like object holding the file, such as bytes, a memoryview or a mmap
+    :return: A generator of the records
+    :raises: GameRecordException if the buffer does not hold a record file or is truncated
+    """
+    view = memoryview(buffer)
+    check_file_header(view)
+    offset = GameRecordWriter.HEADER.size
+    header_size = GameRecord.HEADER.size
+    while offset < len(view):
+        if offset + header_size > len(view):
+            raise GameRecordException('The record file is truncated!')
+        flags, move_count = GameRecord.HEADER.unpack_from(view, offset)
+        board_type, starting_player, outcome = decode_flags(flags)
+        offset += header_size
+        size = PACKED_SIZES[board_type][move_count]
+        if offset + size > len(view):
+            raise GameRecordException('The record file is truncated!')
+        yield GameRecord.from_packed(board_type, starting_player, outcome, move_count, view[offset:offset + size])
+        offset += size
+
+
+class GameRecordFile:
+    """
+        Class which memory-maps a record file and iterates over its records without copying them
+        The records read keep views of the map: the ones kept after the file is closed have to be copied first
+    """
+    def __init__(self, path: str):
+        """
+        :param path: The path of the record file
+        :raises: GameRecordException if the file is not a record file
+        """
+        self.__map = None
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            check_file_header(self.__map)
+        except ValueError:
+            self.close()
+            raise GameRecordException('The record file is empty!')
+        except GameRecordException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def __iter__(self):
+        return iter_records(self.__map)
+
+    def close(self):
+        """
+        Unmaps and closes the record file
+        :return: -
+        :raises: GameRecordException if records read from the map are still in use, the file being closed anyway
+                 and the map unmapped once they are released
+        """
+        try:
+            if self.__map is not None:
+                self.__map.close()
+        except BufferError:
+            raise GameRecordException('Records read from the file are still in use, copy them first!')
+        finally:
+            self.__map = None
+            self.__file.close()
@@ -2,6 +2,10 @@
     Module containing the implementation of game logic
 """
 from repos.board import Board, BoardPoint
+from repos.bitboard import BitBoard
+from repos.compact_board import CompactBoard
+from repos.zobrist import ZobristKeys
+from services.game_tracker import GameStateTracker
 from domain.cell import CellStatus
 from enum import Enum
 
@@ -24,6 +28,13 @@ class MoveOutsideBoundsException(GameException):
     pass
 
 
+class NoMoveToUndoException(GameException):
+    """
+        Exception which occurs if a move is undone while no move has been made
+    """
+    pass
+
+
 class GameOutcome(Enum):
     DRAW = 0,
     PLAYER1_WIN = 1,
@@ -33,9 +44,11 @@ class GameOutcome(Enum):
 class GameServices:
     """
         Class which handles all of the game logic
+        A BitBoard is played on through its integer masks only: the moves, the wins and the threats never go through
+        the cell views or the tracker, which is only built on request
     """
-    def __init__(self, board: Board):
-        self.__board = board
+    def __init__(self, board: Board | BitBoard | CompactBoard):
+        self.board = board
 
     @property
     def board(self):
@@ -44,6 +57,58 @@ class GameServices:
     @board.setter
     def board(self, value):
         self.__board = value
+        self.__zobrist = ZobristKeys.for_size(value.rows, value.columns)
+        self.__bits = value if isinstance(value, BitBoard) else None
+        if self.__bits is not None:
+            self.__hash = self.__zobrist.hash_bits(value.player1_mask, value.player2_mask)
+        else:
+            self.__hash = self.__zobrist.hash_board(value)
+        self.__history = []
+        self.__tracker = GameStateTracker.for_board(value) if self.__bits is None else None
+
+    @property
+    def zobrist_hash(self):
+        """
+        The Zobrist hash of the position on the board, kept up to date by every move
+        """
+        return self.__hash
+
+    @property
+    def history(self):
+        """
+        The moves made since the board was set or reset, as a list of (row, column, player index) tuples
+        """
+        return list(self.__history)
+
+    @property
+    def tracker(self):
+        """
+        The GameStateTracker of the board, kept up to date by every move
+        The tracker of a BitBoard is built from the board every time it is requested
+        """
+        if self.__bits is not None:
+            return GameStateTracker.for_board(self.__bits)
+        return self.__tracker
+
+    def immediate_wins(self, player_index):
+        """
+        Returns the columns where a move of the given player would win the game right away, without making any move
+        :param player_index: The index of the player
+        :return: The sorted list of columns
+        """
+        if self.__bits is not None:
+            return self.__bits.winning_columns(player_index)
+        return self.__tracker.immediate_wins(player_index, self.__board.column_height)
+
+    def threats(self, player_index):
+        """
+        Returns the empty cells which would complete a line of the given player, playable yet or not
+        :param player_index: The index of the player
+        :return: A set of (row, column) tuples
+        """
+        if self.__bits is not None:
+            return self.__bits.threats(player_index)
+        return self.__tracker.threats(player_index)
 
     def mark_move(self, column):
         """
@@ -67,7 +132,15 @@ class GameServices:
         current_row = self.__board.rows - self.__board.column_height[column] - 1
         if current_row < 0:
             raise MoveOutsideBoundsException('Move is outside of the board!')
-        self.__board[current_row][column].occupy_by_player1()
+        if self.__bits is not None:
+            self.__bits.drop(column, 1)
+            self.__hash ^= self.__zobrist.key(current_row, column, 1)
+            self.__history.append((current_row, column, 1))
+            return BoardPoint(column, current_row)
+        self.__board.occupy(current_row, column, CellStatus.OCCUPIED_BY_PLAYER1)
+        self.__hash ^= self.__zobrist.key(current_row, column, 1)
+        self.__history.append((current_row, column, 1))
+        self.__tracker.play(current_row, column, 1)
         self.mark_move(column)
         return BoardPoint(column, current_row)
 
@@ -80,31 +153,60 @@ class GameServices:
         current_row = self.__board.rows - self.__board.column_height[column] - 1
         if current_row < 0:
             raise MoveOutsideBoundsException('Move is outside of the board!')
-        self.__board[current_row][column].occupy_by_player2()
+        if self.__bits is not None:
+            self.__bits.drop(column, 2)
+            self.__hash ^= self.__zobrist.key(current_row, column, 2)
+            self.__history.append((current_row, column, 2))
+            return BoardPoint(column, current_row)
+        self.__board.occupy(current_row, column, CellStatus.OCCUPIED_BY_PLAYER2)
+        self.__hash ^= self.__zobrist.key(current_row, column, 2)
+        self.__history.append((current_row, column, 2))
+        self.__tracker.play(current_row, column, 2)
         self.mark_move(column)
         return BoardPoint(column, current_row)
 
+    def undo_move(self):
+        """
+        Takes back the last move, emptying its cell and decreasing its column's height
+        :return: The point on the board where the undone move was made
+        :raises: NoMoveToUndoException if no move was made since the board was set or reset
+        """
+        if len(self.__history) == 0:
+            raise NoMoveToUndoException('There is no move to undo!')
+        row, column, player_index = self.__history.pop()
+        self.__hash ^= self.__zobrist.key(row, column, player_index)
+        if self.__bits is not None:
+            self.__bits.take_back(column)
+            return BoardPoint(column, row)
+        self.__board.occupy(row, column, CellStatus.EMPTY)
+        self.__tracker.undo(row, column, player_index)
+        self.__board.column_height[column] -= 1
+        return BoardPoint(column, row)
+
     def is_game_over(self, point, player_index):
         """
         Checks if the game is over - either the board is full or one player has won
-        Evaluates if the last move made was a winning one or not
+        Both are read from the tracker, a player having won as soon as one of the player's lines is complete; a
+        BitBoard answers both itself with a comparison and a few shifts of the mask of the player
         :param point: Point of the last move
         :param player_index: The index of the player who made the move
         :return: GameOutcome.DRAW if the board is full
                  GameOutcome.PLAYER1_WIN if the first player won
                  GameOutcome.PLAYER2_WIN if the second player won
         """
-        spaces_left = []
-        for row in range(self.__board.rows):
-            spaces_left.append(any([cell.status == CellStatus.EMPTY for cell in self.__board[row]]))
-        spaces_left = any(spaces_left)
-        if not spaces_left:
+        if self.__bits is not None:
+            if self.__bits.is_full():
+                return GameOutcome.DRAW
+            elif player_index in (1, 2) and self.__bits.has_won(player_index):
+                return GameOutcome.PLAYER1_WIN if player_index == 1 else GameOutcome.PLAYER2_WIN
+            return None
+        if self.__tracker.is_full():
             return GameOutcome.DRAW
         elif player_index == 1:
-            if self.is_checkmate(point, CellStatus.OCCUPIED_BY_PLAYER1):
+            if self.__tracker.has_won(1):
                 return GameOutcome.PLAYER1_WIN
         elif player_index == 2:
-            if self.is_checkmate(point, CellStatus.OCCUPIED_BY_PLAYER2):
+            if self.__tracker.has_won(2):
                 return GameOutcome.PLAYER2_WIN
 
     def is_checkmate(self, point, cell_status):
@@ -115,9 +217,17 @@ class GameServices:
         :return: True - the last move was a checkmate
                  False - the last move was not a checkmate
         """
-        return self.check_horizontal_line(point, cell_status) or self.check_vertical_line(point, cell_status) \
-            or self.check_primary_diagonal_line(point, cell_status) \
-            or self.check_secondary_diagonal_line(point, cell_status)
+        if isinstance(self.__board, (BitBoard, CompactBoard)):
+            return self.__board.is_checkmate(point.y, point.x, cell_status)
+        # only the precomputed lines passing through the cell of the move can have been completed by it
+        board = self.__board
+        for line in board.win_lines.cell_lines(point.y, point.x):
+            for row, column in line:
+                if board[row][column].status != cell_status:
+                    break
+            else:
+                return True
+        return False
 
     def check_horizontal_line(self, point, cell_status):
         """
@@ -127,7 +237,7 @@ class GameServices:
         :return: True - the last move completes a line
                  False - the last move does not complete a line
         """
-        return self.calculate_horizontal_line(point, cell_status) == 4
+        return self.calculate_horizontal_line(point, cell_status) >= self.__board.connect
 
     def calculate_horizontal_line(self, point, cell_status):
         """
@@ -176,7 +286,7 @@ class GameServices:
         :return: True - the last move completes a line
                  False - the last move does not complete a line
         """
-        return self.calculate_vertical_line(point, cell_status) == 4
+        return self.calculate_vertical_line(point, cell_status) >= self.__board.connect
 
     def calculate_vertical_line(self, point, cell_status):
         """
@@ -225,7 +335,7 @@ class GameServices:
         :return: True - the last move completes a line
                  False - the last move does not complete a line
         """
-        return self.calculate_primary_diagonal_line(point, cell_status) == 4
+        return self.calculate_primary_diagonal_line(point, cell_status) >= self.__board.connect
 
     def calculate_primary_diagonal_line(self, point, cell_status):
         """
@@ -278,7 +388,7 @@ class GameServices:
         :return: True - the last move completes a line
                  False - the last move does not complete a line
         """
-        return self.calculate_secondary_diagonal_line(point, cell_status) == 4
+        return self.calculate_secondary_diagonal_line(point, cell_status) >= self.__board.connect
 
     def calculate_secondary_diagonal_line(self, point, cell_status):
         """
@@ -328,9 +438,15 @@ class GameServices:
         Resets the board for a new game
         :return: -
         """
+        self.__hash = 0
+        self.__history.clear()
+        if self.__bits is not None:
+            self.__bits.clear()
+            return
         for row in range(self.__board.rows):
             for column in range(self.__board.columns):
                 self.__board[row][column].reset()
 
-        for row in range(self.__board.rows):
-            self.board.column_height[row] = 0
+        for column in range(self.__board.columns):
+            self.__board.column_height[column] = 0
+        self.__tracker.reset()
@@ -0,0 +1,163 @@
+"""
+    Module containing the headless game session which drives a game from start to end
+"""
+from repos.board import BoardPoint
+from services.game_service import GameServices, GameException
+
+
+class GameSessionException(GameException):
+    """
+        Exception which occurs if a move is made out of turn or after the game is over
+    """
+    pass
+
+
+class GameSession:
+    """
+        Class which runs a game between the first player and, optionally, an AI playing as the second player
+        The session owns the turn order and evaluates the outcome once per move, the result being kept until the
+        move is undone or the game is reset, so callers read it as often as they like for free
+        It draws nothing, so the console, the GUI, the tools and any server share the same game flow
+    """
+    def __init__(self, service: GameServices, ai=None, starting_player: int = 1):
+        """
+        :param service: The game service holding the board
+        :param ai: The AI playing as the second player, None if both players make their moves through play
+        :param starting_player: The index of the player who moves first
+        :raises: GameSessionException if the starting player is invalid
+        """
+        if starting_player not in (1, 2):
+            raise GameSessionException('Invalid player!')
+        self.__service = service
+        self.__ai = ai
+        self.__starting_player = starting_player
+        self.__to_move = starting_player
+        self.__outcome = None
+        self.__last_point = None
+
+    @property
+    def service(self):
+        return self.__service
+
+    @property
+    def board(self):
+        return self.__service.board
+
+    @property
+    def ai(self):
+        return self.__ai
+
+    @property
+    def starting_player(self):
+        return self.__starting_player
+
+    @property
+    def to_move(self):
+        """
+        The index of the player whose turn it is
+        """
+        return self.__to_move
+
+    @property
+    def outcome(self):
+        """
+        The GameOutcome of the game, None while it is in progress
+        """
+        return self.__outcome
+
+    @property
+    def is_over(self):
+        return self.__outcome is not None
+
+    @property
+    def last_point(self):
+        """
+        The point of the last move, None if no move was made
+        """
+        return self.__last_point
+
+    @property
+    def history(self):
+        """
+        The moves of the game, as a list of (row, column, player index) tuples
+        """
+        return self.__service.history
+
+    def play(self, column):
+        """
+        Makes the move of the player whose turn it is
+        :param column: The column of the move
+        :return: The point on the board where the move was made
+        :raises: GameSessionException if the game is over
+                 MoveOutsideBoundsException if the move was outside of the board
+        """
+        if self.__outcome is not None:
+            raise GameSessionException('The game is over!')
+        if self.__to_move == 1:
+            point = self.__service.make_player1_move(column)
+        else:
+            point = self.__service.make_player2_move(column)
+        self.__outcome = self.__service.is_game_over(point, self.__to_move)
+        self.__last_point = point
+        self.__to_move = 3 - self.__to_move
+        return point
+
+    def step_ai(self):
+        """
+        Lets the AI choose and make the move of the second player
+        :return: The point on the board where the move was made
+        :raises: GameSessionException if there is no AI, the game is over or it is not the turn of the second player
+        """
+        if self.__ai is None:
+            raise GameSessionException('There is no AI in this game!')
+        if self.__to_move != 2:
+            raise GameSessionException('It is not the turn of the AI!')
+        if self.__outcome is not None:
+            raise GameSessionException('The game is over!')
+        return self.play(self.__ai.make_move(self.__service))
+
+    def undo(self):
+        """
+        Takes back the last move, giving the turn back to its player
+        :return: The point on the board where the undone move was made
+        :raises: NoMoveToUndoException if no move was made
+        """
+        point = self.__service.undo_move()
+        # the game was in progress before the undone move, since no move is made once it is over
+        self.__outcome = None
+        self.__to_move = 3 - self.__to_move
+        history = self.__service.history
+        self.__last_point = None
+        if len(history) > 0:
+            row, column, player_index = history[-1]
+            self.__last_point = BoardPoint(column, row)
+        return point
+
+    def reset(self, starting_player: int = None):
+        """
+        Empties the board for a new game
+        :param starting_player: The index of the player who moves first, the one of the previous game if None
+        :return: -
+        :raises: GameSessionException if the starting player is invalid
+        """
+        if starting_player is not None:
+            if starting_player not in (1, 2):
+                raise GameSessionException('Invalid player!')
+            self.__starting_player = starting_player
+        self.__service.reset_board()
+        self.__to_move = self.__starting_player
+        self.__outcome = None
+        self.__last_point = None
+
+    def play_out(self, player1):
+        """
+        Plays the game to its end, the moves of the first player being chosen by a function
+        :param player1: Function receiving the session and returning the column of the first player
+        :return: The GameOutcome of the game
+        """
+        while self.__outcome is None:
+            if self.__to_move == 1 or self.__ai is None:
+                self.play(player1(self))
+            else:
+                self.step_ai()
+        return self.__outcome
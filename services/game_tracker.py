@@ -0,0 +1,193 @@
+"""
+    Module containing the incremental tracker of the state of a game
+"""
+from domain.cell import CellStatus
+from repos.win_lines import WinLineTable
+
+
+class GameStateTracker:
+    """
+        Class which keeps the state of a game up to date move by move, so that it never has to be recomputed from the
+        board: the number of moves made, the number of pieces of each player on every winning line and the threats
+        of each player
+        A threat is an empty cell which would complete a line of its player, the other cells of the line being
+        occupied by that player; every threat cell keeps the number of lines it would complete
+    """
+    def __init__(self, rows: int, columns: int, connect: int = 4):
+        """
+        :param rows: The number of rows of the board
+        :param columns: The number of columns of the board
+        :param connect: The number of cells in a line needed to win
+        """
+        self.__rows = rows
+        self.__columns = columns
+        self.__connect = connect
+        self.__table = WinLineTable.for_geometry(rows, columns, connect)
+        self.reset()
+
+    @classmethod
+    def for_board(cls, board):
+        """
+        Creates a tracker holding the pieces already found on a board
+        :param board: The board, either a Board or a BitBoard
+        :return: The tracker
+        """
+        tracker = cls(board.rows, board.columns, board.connect)
+        for row in range(board.rows):
+            for column in range(board.columns):
+                status = board[row][column].status
+                if status == CellStatus.OCCUPIED_BY_PLAYER1:
+                    tracker.play(row, column, 1)
+                elif status == CellStatus.OCCUPIED_BY_PLAYER2:
+                    tracker.play(row, column, 2)
+        return tracker
+
+    @property
+    def moves(self):
+        return self.__moves
+
+    def reset(self):
+        """
+        Empties the tracker for a new game
+        :return: -
+        """
+        lines = len(self.__table.lines)
+        self.__moves = 0
+        self.__owners = [[0] * self.__columns for row in range(self.__rows)]
+        # the lists and dictionaries below are indexed by the player index, index 0 being unused
+        self.__counts = (None, [0] * lines, [0] * lines)
+        self.__completed = [0, 0, 0]
+        self.__threats = (None, {}, {})
+
+    def play(self, row, column, player_index):
+        """
+        Records a piece placed on an empty cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param player_index: The index of the player who placed the piece
+        :return: -
+        """
+        self.__update(row, column, player_index, 1)
+
+    def undo(self, row, column, player_index):
+        """
+        Records a piece taken back from a cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param player_index: The index of the player whose piece is taken back
+        :return: -
+        """
+        self.__update(row, column, player_index, -1)
+
+    def __update(self, row, column, player_index, change):
+        """
+        Adds or removes a piece and updates the lines passing through its cell
+        Only the lines holding connect - 1 pieces of one player and none of the other one are threats, so the cells
+        of a line are only looked at when the line becomes or stops being a threat away from the changed cell
+        :param row: The row of the cell
+        :param column: The column of the cell
+        :param player_index: The index of the player of the piece
+        :param change: 1 if the piece is added, -1 if it is removed
+        :return: -
+        """
+        mine = self.__counts[player_index]
+        theirs = self.__counts[3 - player_index]
+        almost = self.__connect - 1
+        cell = (row, column)
+        self.__moves += change
+        if change > 0:
+            for line in self.__table.cell_line_indexes(row, column):
+                count = mine[line]
+                if theirs[line] == 0:
+                    if count == almost:
+                        # the cell was the one missing from the line
+                        self.__remove_threat(player_index, cell)
+                        self.__completed[player_index] += 1
+                    elif count == almost - 1:
+                        self.__add_threat(player_index, self.__empty_cell(line, cell))
+                elif count == 0 and theirs[line] == almost:
+                    self.__remove_threat(3 - player_index, cell)
+                mine[line] = count + 1
+            self.__owners[row][column] = player_index
+        else:
+            for line in self.__table.cell_line_indexes(row, column):
+                count = mine[line]
+                if theirs[line] == 0:
+                    if count == almost:
+                        self.__remove_threat(player_index, self.__empty_cell(line, cell))
+                    elif count == almost + 1:
+                        self.__completed[player_index] -= 1
+                        self.__add_threat(player_index, cell)
+                elif count == 1 and theirs[line] == almost:
+                    self.__add_threat(3 - player_index, cell)
+                mine[line] = count - 1
+            self.__owners[row][column] = 0
+
+    def __empty_cell(self, line, cell):
+        """
+        Finds the empty cell of a line, other than the changed cell
+        :param line: The index of the line
+        :param cell: The (row, column) tuple of the changed cell
+        :return: The (row, column) tuple of the empty cell
+        """
+        owners = self.__owners
+        for row, column in self.__table.lines[line]:
+            if owners[row][column] == 0 and (row, column) != cell:
+                return row, column
+
+    def __add_threat(self, player_index, cell):
+        threats = self.__threats[player_index]
+        threats[cell] = threats.get(cell, 0) + 1
+
+    def __remove_threat(self, player_index, cell):
+        threats = self.__threats[player_index]
+        threats[cell] -= 1
+        if threats[cell] == 0:
+            del threats[cell]
+
+    def is_full(self):
+        """
+        Checks if every cell of the board is occupied
+        :return: True - there are no empty cells left
+                 False - otherwise
+        """
+        return self.__moves == self.__rows * self.__columns
+
+    def has_won(self, player_index):
+        """
+        Checks if a player has completed a line
+        :param player_index: The index of the player
+        :return: True - the player has at least one complete line
+                 False - otherwise
+        """
+        return self.__completed[player_index] > 0
+
+    def line_count(self, line, player_index):
+        """
+        Returns the number of pieces of a player on a line
+        :param line: The index of the line in the WinLineTable of the geometry
+        :param player_index: The index of the player
+        :return: The number of pieces
+        """
+        return self.__counts[player_index][line]
+
+    def threats(self, player_index):
+        """
+        Returns the threats of a player, whether the cells are playable yet or not
+        :param player_index: The index of the player
+        :return: A set of (row, column) cells
+        """
+        return set(self.__threats[player_index])
+
+    def immediate_wins(self, player_index, column_height):
+        """
+        Returns the columns where a piece of the player would win the game right away
+        :param player_index: The index of the player
+        :param column_height: The list holding the height of each column of the board
+        :return: The sorted list of columns
+        """
+        wins = set()
+        for row, column in self.__threats[player_index]:
+            if row == self.__rows - column_height[column] - 1:
+                wins.add(column)
+        return sorted(wins)
@@ -0,0 +1,392 @@
+"""
+    Module containing the opt-in instrumentation of the game core, the AIs and the renderers, and the profilers used
+    by the entry point
+"""
+import cProfile
+import functools
+import importlib
+import json
+import pstats
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, sleep
+
+
+class LatencyHistogram:
+    """
+        Class which counts durations in buckets of powers of two nanoseconds: a duration of n nanoseconds falls in the
+        bucket of index n.bit_length(), whose upper bound is 2 ** index nanoseconds
+        Recording a duration costs a few integer operations whatever the number of durations recorded
+    """
+    BUCKETS = 48
+
+    def __init__(self):
+        self.__buckets = [0] * self.BUCKETS
+        self.__count = 0
+        self.__total = 0
+        self.__minimum = None
+        self.__maximum = 0
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def total(self):
+        """
+        The sum of the durations, in nanoseconds
+        """
+        return self.__total
+
+    def record(self, nanoseconds: int):
+        """
+        Adds a duration
+        :param nanoseconds: The duration in nanoseconds
+        :return: -
+        """
+        self.__buckets[min(nanoseconds.bit_length(), self.BUCKETS - 1)] += 1
+        self.__count += 1
+        self.__total += nanoseconds
+        if self.__minimum is None or nanoseconds < self.__minimum:
+            self.__minimum = nanoseconds
+        if nanoseconds > self.__maximum:
+            self.__maximum = nanoseconds
+
+    def percentile(self, fraction: float):
+        """
+        Returns an upper bound of a percentile of the durations
+        :param fraction: The fraction of the durations below the percentile, between 0 and 1
+        :return: The upper bound of the bucket holding the percentile in nanoseconds, capped by the longest duration,
+                 0 if no duration was recorded
+        """
+        if self.__count == 0:
+            return 0
+        rank = max(1, round(fraction * self.__count))
+        seen = 0
+        for index, count in enumerate(self.__buckets):
+            seen += count
+            if seen >= rank:
+                return min(1 << index, self.__maximum)
+        return self.__maximum
+
+    def snapshot(self):
+        """
+        Returns the statistics of the durations
+        :return: A dictionary holding the count, the total, mean, minimum, maximum and percentiles in microseconds
+                 and the non empty buckets keyed by their upper bound in nanoseconds
+        """
+        return {
+            'count': self.__count,
+            'total_us': self.__total / 1000,
+            'mean_us': self.__total / self.__count / 1000 if self.__count else 0.0,
+            'min_us': (self.__minimum or 0) / 1000,
+            'max_us': self.__maximum / 1000,
+            'p50_us': self.percentile(0.5) / 1000,
+            'p90_us': self.percentile(0.9) / 1000,
+            'p99_us': self.percentile(0.99) / 1000,
+            'buckets': {str(1 << index): count for index, count in enumerate(self.__buckets) if count}
+        }
+
+
+class Instrumentation:
+    """
+        Class which records call counts and latency histograms of the hot paths of the game, and counters such as
+        the nodes searched by the AIs and the hits of their caches
+        While disabled, which is the default, nothing is recorded and the instrumented methods are the original
+        ones, so instrumentation costs nothing; enabling it wraps the methods listed in POINTS and the make_move
+        method of the AIs listed in AI_CLASSES, and disabling it puts the original methods back
+        Classes whose module cannot be imported, such as the GUI without pygame, are left out
+    """
+    # (module, class, method, timer)
+    POINTS = (
+        ('services.game_service', 'GameServices', 'make_player1_move', 'game.make_move'),
+        ('services.game_service', 'GameServices', 'make_player2_move', 'game.make_move'),
+        ('services.game_service', 'GameServices', 'undo_move', 'game.undo_move'),
+        ('services.game_service', 'GameServices', 'is_game_over', 'game.is_game_over'),
+        ('UI.renderer', 'BoardRenderer', 'render', 'render.console'),
+        ('UI.gui', 'GUI', 'draw_frame', 'render.gui')
+    )
+    # (module, class), the timer of the moves of an AI being ai.<class>.make_move
+    AI_CLASSES = (
+        ('AI.random', 'RandomAI'),
+        ('AI.basic', 'BasicAI'),
+        ('AI.negamax', 'NegamaxAI'),
+        ('AI.mcts', 'MCTSAI'),
+        ('AI.lazy_smp', 'LazySMPAI'),
+        ('AI.perfect', 'PerfectAI')
+    )
+    __enabled = False
+    __originals = {}
+    __timers = {}
+    __counters = Counter()
+    __lock = threading.Lock()
+
+    @classmethod
+    def is_enabled(cls):
+        return cls.__enabled
+
+    @classmethod
+    def enable(cls):
+        """
+        Starts recording, wrapping the instrumented methods
+        :return: -
+        """
+        if cls.__enabled:
+            return
+        for module_name, class_name, method_name, timer in cls.POINTS:
+            target = cls.__resolve(module_name, class_name, method_name)
+            if target is not None:
+                cls.__wrap(target, method_name, cls.timed(target.__dict__[method_name], timer))
+        for module_name, class_name in cls.AI_CLASSES:
+            target = cls.__resolve(module_name, class_name, 'make_move')
+            if target is not None:
+                cls.__wrap(target, 'make_move', cls.timed_ai(target.__dict__['make_move'], 'ai.' + class_name))
+        cls.__enabled = True
+
+    @classmethod
+    def disable(cls):
+        """
+        Stops recording, putting the original methods back; the recorded metrics are kept
+        :return: -
+        """
+        for (target, method_name), original in cls.__originals.items():
+            setattr(target, method_name, original)
+        cls.__originals.clear()
+        cls.__enabled = False
+
+    @classmethod
+    def __resolve(cls, module_name, class_name, method_name):
+        """
+        Finds a class defining an instrumented method
+        :param module_name: The name of the module of the class
+        :param class_name: The name of the class
+        :param method_name: The name of the method
+        :return: The class, None if its module cannot be imported or it does not define the method itself
+        """
+        try:
+            target = getattr(importlib.import_module(module_name), class_name)
+        except ImportError:
+            return None
+        return target if method_name in target.__dict__ else None
+
+    @classmethod
+    def __wrap(cls, target, method_name, wrapper):
+        cls.__originals[(target, method_name)] = target.__dict__[method_name]
+        setattr(target, method_name, wrapper)
+
+    @classmethod
+    def timed(cls, function, timer: str):
+        """
+        Wraps a function so that every call is timed
+        :param function: The function
+        :param timer: The name of the timer the calls are recorded in
+        :return: The wrapper
+        """
+        @functools.wraps(function)
+        def wrapper(*arguments, **keywords):
+            started = perf_counter()
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                cls.record(timer, perf_counter() - started)
+        return wrapper
+
+    @classmethod
+    def timed_ai(cls, make_move, name: str):
+        """
+        Wraps the make_move method of an AI so that every move is timed and the nodes it searched and the probes of
+        its transposition table are counted, for the AIs which have them
+        :param make_move: The method
+        :param name: The prefix of the timer and the counters of the AI
+        :return: The wrapper
+        """
+        timer = name + '.make_move'
+
+        @functools.wraps(make_move)
+        def wrapper(ai, service):
+            table = getattr(ai, 'transposition_table', None)
+            hits, misses = (table.hits, table.misses) if table is not None else (0, 0)
+            started = perf_counter()
+            try:
+                return make_move(ai, service)
+            finally:
+                cls.record(timer, perf_counter() - started)
+                nodes = getattr(ai, 'nodes', getattr(ai, 'playouts', None))
+                if nodes is not None:
+                    cls.add(name + '.nodes', nodes)
+                if table is not None:
+                    cls.add(name + '.cache_hits', table.hits - hits)
+                    cls.add(name + '.cache_misses', table.misses - misses)
+        return wrapper
+
+    @classmethod
+    def record(cls, timer: str, seconds: float):
+        """
+        Adds a call to a timer, whether instrumentation is enabled or not
+        :param timer: The name of the timer
+        :param seconds: The duration of the call
+        :return: -
+        """
+        with cls.__lock:
+            histogram = cls.__timers.get(timer)
+            if histogram is None:
+                histogram = cls.__timers[timer] = LatencyHistogram()
+            histogram.record(int(seconds * 1e9))
+
+    @classmethod
+    def add(cls, counter: str, amount: int = 1):
+        """
+        Adds to a counter, whether instrumentation is enabled or not
+        :param counter: The name of the counter
+        :param amount: The amount added
+        :return: -
+        """
+        with cls.__lock:
+            cls.__counters[counter] += amount
+
+    @classmethod
+    def reset(cls):
+        """
+        Forgets every recorded metric
+        :return: -
+        """
+        with cls.__lock:
+            cls.__timers.clear()
+            cls.__counters.clear()
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Returns the metrics recorded so far
+        :return: A dictionary holding whether instrumentation is enabled, the statistics of every timer, every
+                 counter and the hit rate of the caches of every AI which probed one
+        """
+        with cls.__lock:
+            timers = {timer: histogram.snapshot() for timer, histogram in sorted(cls.__timers.items())}
+            counters = dict(sorted(cls.__counters.items()))
+        hit_rates = {}
+        for counter, hits in counters.items():
+            if counter.endswith('.cache_hits'):
+                name = counter[:-len('.cache_hits')]
+                probes = hits + counters.get(name + '.cache_misses', 0)
+                hit_rates[name] = hits / probes if probes else 0.0
+        return {'enabled': cls.__enabled, 'timers': timers, 'counters': counters, 'cache_hit_rates': hit_rates}
+
+    @classmethod
+    def to_json(cls):
+        return json.dumps(cls.snapshot(), indent=2)
+
+    @classmethod
+    def export(cls, path: str):
+        """
+        Writes the snapshot of the metrics to a JSON file
+        :param path: The path of the file
+        :return: -
+        """
+        with open(path, 'w') as file:
+            file.write(cls.to_json())
+
+
+class StackSampler:
+    """
+        Class which samples the stack of a thread at a fixed interval from a background thread and writes the
+        samples in the collapsed stack format of flamegraph tools: one line per distinct stack, its frames from the
+        outermost to the innermost separated by semicolons, followed by the number of samples
+    """
+    def __init__(self, interval: float = 0.001, thread_id: int = None):
+        """
+        :param interval: The time between two samples in seconds
+        :param thread_id: The identifier of the sampled thread, the thread creating the sampler if None
+        """
+        self.__interval = interval
+        self.__thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.__stacks = Counter()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    @property
+    def samples(self):
+        return sum(self.__stacks.values())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Starts sampling
+        :return: -
+        """
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops sampling, keeping the samples taken
+        :return: -
+        """
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __sample(self):
+        while not self.__stopped.is_set():
+            frame = sys._current_frames().get(self.__thread_id)
+            if frame is not None:
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append('{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                self.__stacks[';'.join(reversed(frames))] += 1
+            sleep(self.__interval)
+
+    def collapsed(self):
+        """
+        Returns the samples in the collapsed stack format
+        :return: The lines, the most sampled stacks first
+        """
+        return ['{} {}'.format(stack, count) for stack, count in self.__stacks.most_common()]
+
+    def write(self, path: str):
+        """
+        Writes the samples to a file in the collapsed stack format
+        :param path: The path of the file
+        :return: -
+        """
+        with open(path, 'w') as file:
+            file.writelines(line + '\n' for line in self.collapsed())
+
+
+def profile(function, profile_path: str = None, flamegraph_path: str = None, report_lines: int = 30):
+    """
+    Runs a function under cProfile and/or the stack sampler
+    :param function: The function, called without arguments
+    :param profile_path: The file the pstats data is dumped to, a report sorted by cumulative time being printed
+                         too; None to run without cProfile
+    :param flamegraph_path: The file the collapsed stacks are written to, None to run without sampling
+    :param report_lines: The number of functions of the printed report
+    :return: The result of the function
+    """
+    profiler = cProfile.Profile() if profile_path is not None else None
+    sampler = StackSampler() if flamegraph_path is not None else None
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(report_lines)
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(flamegraph_path)
@@ -1,9 +1,60 @@
+import contextlib
+import copy
+import gc
+import io
+import json
+import os
+import pstats
+import pickle
+import tempfile
+import threading
 import unittest
-from repos.board import Board, BoardType, BoardPoint
+import warnings
+import numpy as np
+from multiprocessing import shared_memory
+from repos.board import Board, BoardType, BoardPoint, BoardSizeCreator, BoardException
+from repos.win_lines import WinLineTable
+from repos.bitboard import BitBoard
+from repos.compact_board import CompactBoard
 from domain.cell import CellStatus, Cell
-from services.game_service import GameServices, MoveOutsideBoundsException, GameOutcome
+from services.game_service import GameServices, MoveOutsideBoundsException, GameOutcome, \
+    NoMoveToUndoException
 from AI.random import RandomAI
 from AI.basic import BasicAI
+from AI.negamax import NegamaxAI
+from AI.position import Position
+from AI.transposition import TranspositionTable, SharedTranspositionTable
+from AI.lazy_smp import LazySMPAI
+from services.instrumentation import Instrumentation, LatencyHistogram, StackSampler, profile
+from repos.zobrist import ZobristKeys
+from services.batch_service import BatchGameServices
+from services.game_tracker import GameStateTracker
+from services.ai_worker import AIWorker, AIWorkerException
+from services.game_session import GameSession, GameSessionException
+from UI.renderer import BoardRenderer, BoardFrame
+from UI.assets import SpriteAtlas
+from AI.batch import BatchRandomAI, BatchBasicAI
+from server.protocol import encode, decode, ProtocolException
+from server.game_server import GameServer, AI_FACTORIES
+from tools.load_test import run_load_test
+from services.game_records import GameRecord, GameRecordWriter, GameRecordFile, GameRecordException, \
+    read_records, iter_records
+from AI.position_store import PositionStore, PositionStoreException
+from tools.merge_stores import merge_stores
+from AI.symmetry import Symmetry
+from AI.mcts import MCTSAI, rollout
+from AI.evaluation import WindowEvaluator
+import asyncio
+from tools.self_play import play_batch
+from tools.tournament import schedule, play_game, run_tournament
+from tools.benchmark import run_benchmarks, compare
+from tools.build_opening_book import opening_positions
+from AI.opening_book import OpeningBook, OpeningBookException
+from AI.perfect import SolutionTable, SolutionTableException, PerfectAI
+from tools.solve_small import solve_board
+from repos.bitboard import BitBoardLayout
+from random import Random
+from time import perf_counter
 
 
 class TestBoard(unittest.TestCase):
@@ -49,6 +100,324 @@ class TestBoard(unittest.TestCase):
             self.assertEqual(self.small_board.column_height[index], 0)
 
 
+    def testCustomGeometry(self):
+        board = Board(rows=20, columns=20, connect=5)
+        self.assertEqual((board.rows, board.columns, board.connect), (20, 20, 5))
+        self.assertEqual(self.normal_board.connect, 4)
+        self.assertIs(board.win_lines, Board(rows=20, columns=20, connect=5).win_lines)
+        with self.assertRaises(BoardException):
+            Board(rows=0, columns=7)
+        with self.assertRaises(BoardException):
+            Board(rows=3, columns=3, connect=4)
+
+    def testSizesCreatedOnce(self):
+        self.assertIs(BoardSizeCreator.create_normal_size(), BoardSizeCreator.create_normal_size())
+        self.assertIs(BoardSizeCreator.create_size(BoardType.BIG), BoardSizeCreator.create_big_size())
+
+
+class TestWinLineTable(unittest.TestCase):
+    def testLineCounts(self):
+        self.assertEqual(len(WinLineTable.for_geometry(6, 7).lines), 69)
+        self.assertEqual(len(WinLineTable.for_geometry(4, 5).lines), 4 * 2 + 5 + 2 * 2)
+        table = WinLineTable.for_geometry(20, 20, 5)
+        self.assertEqual(len(table.lines), 2 * 20 * 16 + 2 * 16 * 16)
+        self.assertIs(table, WinLineTable.for_geometry(20, 20, 5))
+
+    def testCellLines(self):
+        table = WinLineTable.for_geometry(6, 7)
+        # a corner cell is on one horizontal, one vertical and one diagonal line
+        self.assertEqual(len(table.cell_lines(0, 0)), 3)
+        self.assertEqual(len(table.cell_lines(3, 3)), 13)
+        for line in table.cell_lines(2, 4):
+            self.assertIn((2, 4), line)
+            self.assertEqual(len(line), 4)
+
+    def testLongerLinesWin(self):
+        for board_class in (Board, BitBoard):
+            services = GameServices(board_class(rows=20, columns=20, connect=5))
+            for column in (0, 1, 3, 4):
+                point = services.make_player1_move(column)
+                self.assertIsNone(services.is_game_over(point, 1))
+            point = services.make_player1_move(2)
+            self.assertEqual(services.is_game_over(point, 1), GameOutcome.PLAYER1_WIN)
+            # a line of five also wins a connect four game
+            services = GameServices(board_class())
+            for column in (0, 1, 3, 4):
+                services.make_player1_move(column)
+            point = services.make_player1_move(2)
+            self.assertEqual(services.is_game_over(point, 1), GameOutcome.PLAYER1_WIN)
+
+
+
+class TestGameStateTracker(unittest.TestCase):
+    @staticmethod
+    def brute_force_threats(board, player_index):
+        status = CellStatus.OCCUPIED_BY_PLAYER1 if player_index == 1 else CellStatus.OCCUPIED_BY_PLAYER2
+        threats = set()
+        for line in board.win_lines.lines:
+            empty = [cell for cell in line if board[cell[0]][cell[1]].status == CellStatus.EMPTY]
+            mine = [cell for cell in line if board[cell[0]][cell[1]].status == status]
+            if len(empty) == 1 and len(mine) == len(line) - 1:
+                threats.add(empty[0])
+        return threats
+
+    def testMatchesBoard(self):
+        generator = Random(11)
+        for geometry in ({'board_type': BoardType.NORMAL}, {'rows': 8, 'columns': 8, 'connect': 5},
+                         {'rows': 5, 'columns': 6, 'connect': 3}):
+            services = GameServices(Board(**geometry))
+            for move in range(services.board.rows * services.board.columns):
+                columns = [column for column in range(services.board.columns)
+                           if services.board.column_height[column] != services.board.rows]
+                if move > 10 and generator.random() < 0.2:
+                    services.undo_move()
+                elif move % 2 == 0:
+                    services.make_player1_move(generator.choice(columns))
+                else:
+                    services.make_player2_move(generator.choice(columns))
+                for player_index in (1, 2):
+                    self.assertEqual(services.threats(player_index),
+                                     self.brute_force_threats(services.board, player_index))
+                self.assertEqual(services.tracker.moves, len(services.history))
+
+    def testImmediateWins(self):
+        services = GameServices(Board())
+        self.assertEqual(services.immediate_wins(1), [])
+        for column in (1, 2, 3):
+            services.make_player1_move(column)
+        services.make_player2_move(3)
+        self.assertEqual(services.immediate_wins(1), [0, 4])
+        self.assertEqual(services.threats(1), {(5, 0), (5, 4)})
+        self.assertEqual(services.immediate_wins(2), [])
+        services.make_player2_move(4)
+        self.assertEqual(services.immediate_wins(1), [0])
+        services.undo_move()
+        self.assertEqual(services.immediate_wins(1), [0, 4])
+        services.reset_board()
+        self.assertEqual(services.threats(1), set())
+
+    def testWinAndDraw(self):
+        tracker = GameStateTracker(2, 2, 2)
+        tracker.play(1, 0, 1)
+        tracker.play(1, 1, 2)
+        self.assertFalse(tracker.has_won(1) or tracker.has_won(2) or tracker.is_full())
+        tracker.play(0, 0, 1)
+        self.assertTrue(tracker.has_won(1))
+        tracker.play(0, 1, 2)
+        self.assertTrue(tracker.is_full())
+        tracker.undo(0, 0, 1)
+        self.assertFalse(tracker.has_won(1))
+        self.assertEqual(tracker.moves, 3)
+
+    def testForBoard(self):
+        board = BitBoard()
+        board[5][0].occupy_by_player2()
+        board[5][1].occupy_by_player2()
+        board[5][2].occupy_by_player2()
+        tracker = GameStateTracker.for_board(board)
+        self.assertEqual(tracker.moves, 3)
+        self.assertEqual(tracker.threats(2), {(5, 3)})
+
+class TestBitBoard(unittest.TestCase):
+    def testBoardCreation(self):
+        for board_type in BoardType:
+            bit_board = BitBoard(board_type)
+            board = Board(board_type)
+            self.assertEqual(bit_board.columns, board.columns)
+            self.assertEqual(bit_board.rows, board.rows)
+            self.assertEqual(bit_board.column_height, board.column_height)
+            self.assertEqual(str(bit_board), str(board))
+
+    def testCellViews(self):
+        bit_board = BitBoard()
+        bit_board[5][1].occupy_by_player1()
+        bit_board[4][1].occupy_by_player2()
+        self.assertEqual(bit_board[5][1].status, CellStatus.OCCUPIED_BY_PLAYER1)
+        self.assertEqual(bit_board[4][1].status, CellStatus.OCCUPIED_BY_PLAYER2)
+        self.assertEqual(bit_board[3][1].status, CellStatus.EMPTY)
+        bit_board[5][1].reset()
+        self.assertEqual(bit_board[5][1].status, CellStatus.EMPTY)
+        self.assertEqual(bit_board.player1_mask, 0)
+
+    def testSameOutcomesAsBoard(self):
+        generator = Random(7)
+        for board_type in BoardType:
+            for game in range(30):
+                services = GameServices(Board(board_type))
+                bit_services = GameServices(BitBoard(board_type))
+                player = 1
+                while True:
+                    columns = [column for column in range(services.board.columns)
+                               if services.board.column_height[column] != services.board.rows]
+                    column = generator.choice(columns)
+                    if player == 1:
+                        point = services.make_player1_move(column)
+                        bit_point = bit_services.make_player1_move(column)
+                    else:
+                        point = services.make_player2_move(column)
+                        bit_point = bit_services.make_player2_move(column)
+                    self.assertEqual((point.x, point.y), (bit_point.x, bit_point.y))
+                    outcome = services.is_game_over(point, player)
+                    self.assertEqual(outcome, bit_services.is_game_over(bit_point, player))
+                    if outcome is not None:
+                        self.assertEqual(str(services.board), str(bit_services.board))
+                        break
+                    player = 3 - player
+
+    def testFastPathMatchesBoard(self):
+        generator = Random(13)
+        for geometry in ({'board_type': BoardType.NORMAL}, {'rows': 8, 'columns': 8, 'connect': 5}):
+            services = GameServices(Board(**geometry))
+            bit_services = GameServices(BitBoard(**geometry))
+            for move in range(40):
+                columns = [column for column in range(services.board.columns)
+                           if services.board.column_height[column] != services.board.rows]
+                if move > 6 and generator.random() < 0.2:
+                    point, bit_point = services.undo_move(), bit_services.undo_move()
+                elif move % 2 == 0:
+                    column = generator.choice(columns)
+                    point, bit_point = services.make_player1_move(column), bit_services.make_player1_move(column)
+                else:
+                    column = generator.choice(columns)
+                    point, bit_point = services.make_player2_move(column), bit_services.make_player2_move(column)
+                self.assertEqual((point.x, point.y), (bit_point.x, bit_point.y))
+                self.assertEqual(str(services.board), str(bit_services.board))
+                for status in (CellStatus.OCCUPIED_BY_PLAYER1, CellStatus.OCCUPIED_BY_PLAYER2):
+                    self.assertEqual(services.is_checkmate(point, status), bit_services.is_checkmate(point, status))
+                self.assertEqual(services.zobrist_hash, bit_services.zobrist_hash)
+                for player_index in (1, 2):
+                    self.assertEqual(services.threats(player_index), bit_services.threats(player_index))
+                    self.assertEqual(services.immediate_wins(player_index), bit_services.immediate_wins(player_index))
+                    self.assertEqual(services.tracker.has_won(player_index), bit_services.board.has_won(player_index))
+            bit_services.reset_board()
+            self.assertEqual((bit_services.board.player1_mask, bit_services.zobrist_hash), (0, 0))
+            self.assertEqual(bit_services.board.column_height, [0] * bit_services.board.columns)
+
+
+
+class TestCompactBoard(unittest.TestCase):
+    def testBoardCreation(self):
+        for board_type in BoardType:
+            compact_board = CompactBoard(board_type)
+            board = Board(board_type)
+            self.assertEqual((compact_board.rows, compact_board.columns), (board.rows, board.columns))
+            self.assertEqual(len(compact_board.cells), board.rows * board.columns)
+            self.assertEqual(str(compact_board), str(board))
+
+    def testCellViews(self):
+        board = CompactBoard()
+        board[5][1].occupy_by_player1()
+        board[-3][1].occupy_by_player2()
+        self.assertEqual(board[5][1].status, CellStatus.OCCUPIED_BY_PLAYER1)
+        self.assertEqual(board[3][1].status, CellStatus.OCCUPIED_BY_PLAYER2)
+        self.assertEqual(board.status(4, 1), CellStatus.EMPTY)
+        self.assertEqual(board.cells[1 * 6 + 5], 1)
+        self.assertEqual(len(board[0]), 7)
+        board[5][1].reset()
+        self.assertEqual(board[5][1].status, CellStatus.EMPTY)
+        with self.assertRaises(IndexError):
+            board[6]
+
+    def testSameOutcomesAsBoard(self):
+        generator = Random(5)
+        for board_type in BoardType:
+            for game in range(20):
+                services = GameServices(Board(board_type))
+                compact_services = GameServices(CompactBoard(board_type))
+                player = 1
+                while True:
+                    columns = [column for column in range(services.board.columns)
+                               if services.board.column_height[column] != services.board.rows]
+                    column = generator.choice(columns)
+                    if player == 1:
+                        point = services.make_player1_move(column)
+                        compact_services.make_player1_move(column)
+                    else:
+                        point = services.make_player2_move(column)
+                        compact_services.make_player2_move(column)
+                    status = services.board[point.y][point.x].status
+                    self.assertEqual(services.is_checkmate(point, status),
+                                     compact_services.is_checkmate(point, status))
+                    outcome = services.is_game_over(point, player)
+                    self.assertEqual(outcome, compact_services.is_game_over(point, player))
+                    if outcome is not None:
+                        self.assertEqual(str(services.board), str(compact_services.board))
+                        self.assertEqual(services.zobrist_hash, compact_services.zobrist_hash)
+                        break
+                    player = 3 - player
+
+    def testCopies(self):
+        services = GameServices(CompactBoard())
+        services.make_player1_move(3)
+        for board in (copy.deepcopy(services.board), pickle.loads(pickle.dumps(services.board)),
+                      services.board.copy()):
+            self.assertEqual(str(board), str(services.board))
+            self.assertIs(board.win_lines, services.board.win_lines)
+            board.occupy(0, 0, CellStatus.OCCUPIED_BY_PLAYER2)
+            board.column_height[0] = 6
+            self.assertEqual(services.board.status(0, 0), CellStatus.EMPTY)
+            self.assertEqual(services.board.column_height[0], 0)
+        # copies of the Board class share the win line table too
+        board = copy.deepcopy(Board())
+        self.assertIs(board.win_lines, Board().win_lines)
+
+
+class TestBoardRenderer(unittest.TestCase):
+    def testSameTextAsBoard(self):
+        generator = Random(2)
+        for board_type in BoardType:
+            services = GameServices(Board(board_type))
+            renderer = BoardRenderer.for_board(services.board)
+            self.assertEqual(renderer.render(services), str(services.board))
+            for move in range(20):
+                columns = [column for column in range(services.board.columns)
+                           if services.board.column_height[column] != services.board.rows]
+                if move % 2 == 0:
+                    services.make_player1_move(generator.choice(columns))
+                else:
+                    services.make_player2_move(generator.choice(columns))
+                if move % 7 == 6:
+                    services.undo_move()
+                self.assertEqual(renderer.render(services), str(services.board))
+            services.reset_board()
+            self.assertEqual(renderer.render(services), str(services.board))
+
+    def testWideBoard(self):
+        services = GameServices(Board(rows=3, columns=11))
+        services.make_player1_move(10)
+        services.make_player2_move(9)
+        self.assertEqual(BoardRenderer.for_board(services.board).render(services), str(services.board))
+
+    def testAnsiMode(self):
+        services = GameServices(Board(BoardType.SMALL))
+        renderer = BoardRenderer.for_board(services.board, ansi=True)
+        services.make_player1_move(0)
+        services.make_player2_move(4)
+        lines = renderer.render(services).split('\n')
+        self.assertEqual(lines[0], ' 1  2  3  4  5')
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[4].count(BoardFrame.ANSI_CELLS[CellStatus.OCCUPIED_BY_PLAYER1]), 1)
+        self.assertTrue(lines[4].endswith(BoardFrame.ANSI_CELLS[CellStatus.OCCUPIED_BY_PLAYER2]))
+        self.assertEqual(lines[1].count(BoardFrame.ANSI_CELLS[CellStatus.EMPTY]), 5)
+
+    def testFramesBuiltOnce(self):
+        self.assertIs(BoardFrame.for_size(6, 7), BoardFrame.for_size(6, 7))
+        self.assertIsNot(BoardFrame.for_size(6, 7), BoardFrame.for_size(6, 7, ansi=True))
+
+
+class TestSpriteAtlas(unittest.TestCase):
+    def testSharedSurfaces(self):
+        atlas = SpriteAtlas.for_image('resources/images/circle.png', 40)
+        self.assertIs(atlas, SpriteAtlas.for_image('resources/images/circle.png', 40))
+        self.assertIsNot(atlas, SpriteAtlas.for_image('resources/images/circle.png', 50))
+        self.assertEqual(atlas.image.get_size(), (40, 40))
+        red = atlas.tinted((255, 0, 0))
+        self.assertIs(red, atlas.tinted((255, 0, 0, 255)))
+        self.assertIsNot(red, atlas.tinted((0, 0, 255)))
+        # the white tint keeps the colors of the image
+        self.assertEqual(atlas.tinted((255, 255, 255)).get_at((20, 20)), atlas.image.get_at((20, 20)))
+        self.assertEqual(red.get_at((20, 20)).g, 0)
+
 class TestBoardPoint(unittest.TestCase):
     def setUp(self):
         self.point = BoardPoint(1, 2)
@@ -97,6 +466,33 @@ class ServiceAITests(unittest.TestCase):
         self.assertEqual(self.board[5][1].status, CellStatus.OCCUPIED_BY_PLAYER1)
         self.assertEqual(self.board[4][1].status, CellStatus.OCCUPIED_BY_PLAYER2)
 
+    def testUndoMove(self):
+        with self.assertRaises(NoMoveToUndoException):
+            self.services.undo_move()
+        self.services.make_player1_move(1)
+        start_hash = self.services.zobrist_hash
+        self.services.make_player2_move(1)
+        self.assertEqual(self.services.history, [(5, 1, 1), (4, 1, 2)])
+        point = self.services.undo_move()
+        self.assertEqual((point.x, point.y), (1, 4))
+        self.assertEqual(self.board[4][1].status, CellStatus.EMPTY)
+        self.assertEqual(self.board[5][1].status, CellStatus.OCCUPIED_BY_PLAYER1)
+        self.assertEqual(self.board.column_height[1], 1)
+        self.assertEqual(self.services.zobrist_hash, start_hash)
+        self.assertEqual(self.services.history, [(5, 1, 1)])
+
+    def testBasicAIKeepsBoard(self):
+        self.services.make_player1_move(1)
+        self.services.make_player1_move(2)
+        self.services.make_player2_move(3)
+        history = self.services.history
+        board_text = str(self.board)
+        self.basic_ai.make_move(self.services)
+        self.assertIs(self.services.board, self.board)
+        self.assertEqual(self.services.history, history)
+        self.assertEqual(str(self.board), board_text)
+        self.assertEqual(self.board.column_height, [0, 1, 1, 1, 0, 0, 0])
+
     def testHorizontalLineCalculation(self):
         self.services.make_player1_move(1)
         self.services.make_player1_move(2)
@@ -267,3 +663,1141 @@ class ServiceAITests(unittest.TestCase):
         column = self.basic_ai.make_move(self.services)
         self.assertEqual(column, 4)
 
+
+
+class TestNegamaxAI(unittest.TestCase):
+    def setUp(self):
+        self.board = Board()
+        self.services = GameServices(self.board)
+        self.ai = NegamaxAI(time_limit=0.5)
+
+    def testWin(self):
+        self.services.make_player2_move(1)
+        self.services.make_player2_move(2)
+        self.services.make_player2_move(3)
+        self.services.make_player1_move(1)
+        self.services.make_player1_move(2)
+        self.services.make_player1_move(3)
+        self.assertIn(self.ai.make_move(self.services), [0, 4])
+
+    def testBlock(self):
+        self.services.make_player1_move(1)
+        self.services.make_player1_move(1)
+        self.services.make_player1_move(1)
+        self.services.make_player2_move(4)
+        self.services.make_player2_move(5)
+        self.assertEqual(self.ai.make_move(self.services), 1)
+
+    def testForcedWin(self):
+        # two open ends on the bottom row cannot both be blocked
+        self.services.make_player2_move(2)
+        self.services.make_player2_move(3)
+        self.services.make_player1_move(2)
+        self.services.make_player1_move(3)
+        self.assertIn(self.ai.make_move(self.services), [1, 4])
+        self.assertGreater(self.ai.last_score, 0)
+
+    def testTimeBudget(self):
+        ai = NegamaxAI(time_limit=0.1)
+        services = GameServices(Board(BoardType.BIG))
+        start = perf_counter()
+        column = ai.make_move(services)
+        self.assertLess(perf_counter() - start, 0.3)
+        self.assertIn(column, range(services.board.columns))
+
+    def testNodeBudget(self):
+        ai = NegamaxAI(time_limit=None, max_nodes=1000)
+        self.assertEqual(ai.make_move(self.services), 3)
+        self.assertLessEqual(ai.nodes, 1001)
+
+    def testFullBoard(self):
+        for i in range(self.board.rows):
+            for j in range(self.board.columns):
+                self.services.make_player1_move(j)
+        self.assertEqual(self.ai.make_move(self.services), -1)
+
+    def testLongerLines(self):
+        board = Board(rows=6, columns=8, connect=5)
+        services = GameServices(board)
+        for column in (1, 2, 3):
+            services.make_player2_move(column)
+            services.make_player1_move(7)
+        position = Position.from_board(board)
+        self.assertEqual(position.connect, 5)
+        self.assertFalse(any(position.is_winning_move(column) for column in range(board.columns)))
+        self.assertEqual(Position.from_board(Board(rows=6, columns=8)).connect, 4)
+        services.make_player2_move(4)
+        position = Position.from_board(board)
+        self.assertEqual([column for column in range(board.columns) if position.is_winning_move(column)], [0, 5])
+        self.assertEqual(position.copy().connect, 5)
+        self.assertIn(self.ai.make_move(services), [0, 5])
+
+
+class TestZobristHashing(unittest.TestCase):
+    def setUp(self):
+        self.board = Board()
+        self.services = GameServices(self.board)
+        self.keys = ZobristKeys.for_size(self.board.rows, self.board.columns)
+
+    def testIncrementalHash(self):
+        self.assertEqual(self.services.zobrist_hash, 0)
+        self.services.make_player1_move(3)
+        self.services.make_player2_move(3)
+        self.services.make_player1_move(4)
+        self.assertNotEqual(self.services.zobrist_hash, 0)
+        self.assertEqual(self.services.zobrist_hash, self.keys.hash_board(self.board))
+        self.assertEqual(GameServices(self.board).zobrist_hash, self.services.zobrist_hash)
+
+    def testTranspositionsHashEqually(self):
+        other = GameServices(Board())
+        self.services.make_player1_move(3)
+        self.services.make_player2_move(4)
+        self.services.make_player1_move(2)
+        other.make_player1_move(2)
+        other.make_player2_move(4)
+        other.make_player1_move(3)
+        self.assertEqual(self.services.zobrist_hash, other.zobrist_hash)
+
+    def testResetHash(self):
+        self.services.make_player1_move(3)
+        self.services.reset_board()
+        self.assertEqual(self.services.zobrist_hash, 0)
+        self.assertEqual(self.board.column_height, [0] * self.board.columns)
+
+    def testPositionHash(self):
+        self.services.make_player1_move(3)
+        position = Position.from_board(self.board)
+        start = position.hash
+        position.play(2)
+        position.play(2)
+        self.services.make_player2_move(2)
+        self.services.make_player1_move(2)
+        self.assertEqual(position.hash, Position.from_board(self.board).hash)
+        position.undo(2)
+        position.undo(2)
+        self.assertEqual(position.hash, start)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def setUp(self):
+        self.table = TranspositionTable(4)
+
+    def testProbeCounters(self):
+        self.assertIsNone(self.table.probe(1))
+        self.table.store(1, 3, 5, TranspositionTable.EXACT, 2)
+        self.assertEqual(self.table.probe(1), (3, 5, TranspositionTable.EXACT, 2))
+        self.assertEqual(self.table.hits, 1)
+        self.assertEqual(self.table.misses, 1)
+        self.assertEqual(self.table.hit_rate, 0.5)
+
+    def testReplacement(self):
+        self.table.store(1, 5, 0, TranspositionTable.EXACT, 0)
+        self.table.store(5, 2, 0, TranspositionTable.EXACT, 1)
+        self.table.store(9, 3, 0, TranspositionTable.EXACT, 2)
+        # the deepest entry stays, the shallower ones share the always-replace slot
+        self.assertIsNotNone(self.table.probe(1))
+        self.assertIsNone(self.table.probe(5))
+        self.assertIsNotNone(self.table.probe(9))
+        self.table.store(13, 7, 0, TranspositionTable.EXACT, 3)
+        self.assertIsNotNone(self.table.probe(13))
+        self.assertIsNotNone(self.table.probe(1))
+        self.assertIsNone(self.table.probe(9))
+
+    def testBoundedSize(self):
+        for key in range(1000):
+            self.table.store(key, key % 7, 0, TranspositionTable.EXACT, 0)
+        self.assertLessEqual(len(self.table), 2 * self.table.size)
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+
+
+class TestBatchGameServices(unittest.TestCase):
+    def setUp(self):
+        self.service = BatchGameServices(BoardType.NORMAL, 3, [1, 1, 2])
+
+    def testMoves(self):
+        self.service.make_moves([0, 3, 6])
+        self.assertEqual(self.service.cells[0, 5, 0], CellStatus.OCCUPIED_BY_PLAYER1)
+        self.assertEqual(self.service.cells[2, 5, 6], CellStatus.OCCUPIED_BY_PLAYER2)
+        self.assertEqual(list(self.service.column_height[1]), [0, 0, 0, 1, 0, 0, 0])
+        self.assertEqual(list(self.service.to_move), [2, 2, 1])
+        with self.assertRaises(MoveOutsideBoundsException):
+            self.service.make_moves([0, 7, 0])
+
+    def testWins(self):
+        # game 0 and game 2 connect horizontally, game 1 vertically
+        for columns in ([0, 3, 0], [0, 4, 0], [1, 3, 1], [0, 4, 1], [2, 3, 2], [0, 4, 2]):
+            self.service.make_moves(columns)
+        self.assertEqual(list(self.service.winning_moves(1)[0]), [False, False, False, True, False, False, False])
+        self.assertTrue(self.service.winning_moves(1)[1, 3])
+        self.service.make_moves([3, 3, 3])
+        self.assertEqual(list(self.service.outcomes),
+                         [BatchGameServices.PLAYER1_WIN, BatchGameServices.PLAYER1_WIN, BatchGameServices.PLAYER2_WIN])
+        self.assertEqual(list(self.service.available_columns()[0]), [False] * 7)
+
+    def testDraw(self):
+        service = BatchGameServices(BoardType.SMALL, 1)
+        for column in [0, 1, 0, 1, 1, 0, 1, 0, 2, 3, 2, 3, 3, 2, 3, 2, 4, 4, 4, 4]:
+            service.make_moves([column])
+        self.assertEqual(service.outcomes[0], BatchGameServices.DRAW)
+
+    def testBatchAIs(self):
+        for board_type in BoardType:
+            service = play_batch(board_type, 50, BatchBasicAI(1), BatchRandomAI(2))
+            self.assertFalse(service.active().any())
+            self.assertEqual(int(service.column_height.sum()), int(service.moves.sum()))
+            self.assertEqual(int(np.count_nonzero(service.cells)), int(service.moves.sum()))
+
+    def testBasicBatchAIWinsAndBlocks(self):
+        service = BatchGameServices(BoardType.NORMAL, 2, [2, 1])
+        for columns in ([1, 1], [1, 5], [2, 2], [2, 5], [3, 3]):
+            service.make_moves(columns)
+        # game 0: the AI to move has 3 in a row at the bottom; game 1: the AI to move must block the other player
+        self.assertEqual(list(service.to_move), [1, 2])
+        moves = BatchBasicAI(0).make_moves(service)
+        self.assertIn(moves[0], [0, 4])
+        self.assertIn(moves[1], [0, 4])
+
+
+class TestTournament(unittest.TestCase):
+    def testSchedule(self):
+        games = schedule(['random', 'basic', 'negamax'], [BoardType.NORMAL, BoardType.SMALL], 4, 10)
+        self.assertEqual(len(games), 3 * 2 * 4)
+        self.assertEqual([game.starting_player for game in games[:4]], [1, 2, 1, 2])
+        self.assertEqual(len({game.seed for game in games}), len(games))
+
+    def testSeededGames(self):
+        game = schedule(['random', 'basic'], [BoardType.SMALL], 1, 3)[0]
+        first = play_game(game)
+        second = play_game(game)
+        self.assertEqual(first['score'], second['score'])
+        self.assertEqual(first['moves'], second['moves'])
+
+    def testResults(self):
+        results = run_tournament(['random', 'negamax'], [BoardType.SMALL], 6, workers=1)
+        self.assertEqual(results.games, 6)
+        self.assertEqual(sum(results.record('random')), 6)
+        ratings = results.elo()
+        self.assertGreater(ratings['negamax'][0], ratings['random'][0])
+        self.assertAlmostEqual(ratings['negamax'][0] + ratings['random'][0], 3000)
+
+
+class TestBenchmark(unittest.TestCase):
+    def testRunBenchmarks(self):
+        results = run_benchmarks([BoardType.SMALL], repetitions=1, warmup=0, name_filter='random_ai', rounds=1)
+        self.assertEqual(list(results), ['random_ai/SMALL'])
+        self.assertGreater(results['random_ai/SMALL']['ops_per_sec'], 0)
+
+    def testCompare(self):
+        baseline = {'a': {'ops_per_sec': 100.0}, 'b': {'ops_per_sec': 100.0}, 'd': {'ops_per_sec': 100.0,
+                                                                                 'spread': 0.1}}
+        results = {'a': {'ops_per_sec': 70.0}, 'b': {'ops_per_sec': 90.0}, 'c': {'ops_per_sec': 1.0},
+                   'd': {'ops_per_sec': 70.0, 'spread': 0.1}}
+        regressions = compare(results, baseline, 0.2)
+        # the slowdown of d is within twice the spread of its two measurements
+        self.assertEqual([regression[0] for regression in regressions], ['a'])
+        self.assertEqual(regressions[0][4], 0.2)
+
+    def testCompareNoisy(self):
+        # the spreads alone would accept any slowdown, the cap keeps a 50% slowdown a regression
+        baseline = {'a': {'ops_per_sec': 100.0, 'spread': 0.35}}
+        results = {'a': {'ops_per_sec': 50.0, 'spread': 0.35}}
+        regressions = compare(results, baseline, 0.2)
+        self.assertEqual([regression[0] for regression in regressions], ['a'])
+        self.assertAlmostEqual(regressions[0][4], 0.4)
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.book')
+        self.layout = BitBoardLayout.for_size(6, 7)
+        self.empty_key = Position(self.layout).key()
+        OpeningBook.write(self.path, 6, 7, {self.empty_key: (0, -2), 12345: (4, 1), 7: (2, 0)})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testLookup(self):
+        with OpeningBook(self.path) as book:
+            self.assertEqual(len(book), 3)
+            self.assertEqual((book.rows, book.columns), (6, 7))
+            self.assertEqual(book.lookup(self.empty_key), (0, -2))
+            self.assertEqual(book.lookup(12345), (4, 1))
+            self.assertEqual(book.lookup(7), (2, 0))
+            self.assertIsNone(book.lookup(8))
+
+    def testInvalidBook(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'not an opening book')
+        with self.assertRaises(OpeningBookException):
+            OpeningBook(self.path)
+
+    def testNegamaxUsesBook(self):
+        with OpeningBook(self.path) as book:
+            ai = NegamaxAI(time_limit=0.1, opening_book=book)
+            self.assertEqual(ai.make_move(GameServices(Board())), 0)
+            self.assertEqual(ai.last_score, -2)
+            # positions missing from the book are searched
+            services = GameServices(Board())
+            services.make_player1_move(3)
+            self.assertIn(ai.make_move(services), range(7))
+            self.assertGreater(ai.nodes, 0)
+            # books of other board sizes are ignored
+            self.assertNotEqual(ai.make_move(GameServices(Board(BoardType.SMALL))), 0)
+
+    def testOpeningPositions(self):
+        self.assertEqual(len(opening_positions(self.layout, 1)), 8)
+        self.assertEqual(len(opening_positions(self.layout, 2)), 57)
+
+
+class TestSolutionTable(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.table')
+        self.layout = BitBoardLayout.for_size(3, 4)
+        SolutionTable.write(self.path, 3, 4, solve_board(self.layout, workers=1, split_depth=1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testIndex(self):
+        position = Position(self.layout)
+        self.assertEqual(SolutionTable.index(position.key(), 3, 4), 0)
+        position.play(1)
+        position.play(1)
+        position.play(3)
+        # column 1 holds a stone of the opponent under a stone of the player to move
+        self.assertEqual(SolutionTable.index(position.key(), 3, 4), 1 * 15 ** 3 + 5 * 15)
+        self.assertEqual(SolutionTable.entry_bits(5), 4)
+        self.assertEqual(SolutionTable.entry_bits(7), 8)
+
+    def testLookupMatchesSearch(self):
+        generator = Random(3)
+        with SolutionTable(self.path) as table:
+            self.assertEqual((table.rows, table.columns), (3, 4))
+            for game in range(20):
+                position = Position(self.layout)
+                for move in range(generator.randrange(8)):
+                    columns = [column for column in range(4)
+                               if position.can_play(column) and not position.is_winning_move(column)]
+                    if len(columns) == 0:
+                        break
+                    position.play(generator.choice(columns))
+                if position.is_full():
+                    continue
+                value, column = table.lookup(position.key())
+                ai = NegamaxAI(time_limit=None)
+                ai.search(position.copy())
+                expected = SolutionTable.DRAW + (ai.last_score > 0) - (ai.last_score < 0)
+                self.assertEqual(value, expected)
+                # the best move of the table keeps the value of the position
+                if position.is_winning_move(column):
+                    self.assertEqual(value, SolutionTable.WIN)
+                else:
+                    position.play(column)
+                    self.assertEqual(SolutionTable.WIN - table.lookup(position.key())[0], value)
+            self.assertIsNone(table.lookup(Position(self.layout).key() + 1 + (1 << 4)))
+
+    def testCompactTable(self):
+        codes = solve_board(self.layout, workers=1, split_depth=1)
+        positions = len(codes) - codes.count(0)
+        with SolutionTable(self.path) as table:
+            self.assertEqual(len(table), positions)
+        # 16 bits of index and 4 bits of code per stored position, besides the header and the bucket offsets
+        self.assertEqual(os.path.getsize(self.path), SolutionTable.HEADER.size +
+                         4 * (SolutionTable.buckets(3, 4) + 1) + 2 * positions + (positions + 1) // 2)
+
+    def testTruncatedTable(self):
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        with open(self.path, 'wb') as file:
+            file.write(data[:-1])
+        with self.assertRaises(SolutionTableException):
+            SolutionTable(self.path)
+
+    def testInvalidTable(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'not a solution table')
+        with self.assertRaises(SolutionTableException):
+            SolutionTable(self.path)
+
+    def testPerfectAI(self):
+        # a SMALL board table which only knows the position after the first player played in the first column
+        layout = BitBoardLayout.for_type(BoardType.SMALL)
+        services = GameServices(Board(BoardType.SMALL))
+        services.make_player1_move(0)
+        position = Position.from_board(services.board)
+        codes = bytearray(SolutionTable.entries(4, 5))
+        codes[SolutionTable.index(position.key(), 4, 5)] = 1 + SolutionTable.WIN * 5 + 4
+        SolutionTable.write(self.path, 4, 5, codes)
+        with SolutionTable(self.path) as table:
+            ai = PerfectAI(table, fallback=RandomAI())
+            self.assertEqual(ai.make_move(services), 4)
+            # positions missing from the table are left to the fallback
+            services.make_player2_move(4)
+            services.make_player1_move(0)
+            self.assertIn(ai.make_move(services), range(layout.columns))
+
+
+class TestAIWorker(unittest.TestCase):
+    def testMoveInBackground(self):
+        services = GameServices(Board())
+        for column in (0, 0, 0):
+            services.make_player2_move(column)
+        worker = AIWorker(NegamaxAI(time_limit=0.2))
+        self.assertIsNone(worker.poll())
+        worker.start(services)
+        self.assertTrue(worker.busy)
+        with self.assertRaises(AIWorkerException):
+            worker.start(services)
+        self.assertEqual(worker.wait(5), 0)
+        self.assertFalse(worker.busy)
+        # the AI played on a snapshot, the game itself is unchanged
+        self.assertEqual(len(services.history), 3)
+
+    def testCancel(self):
+        ai = NegamaxAI(time_limit=None)
+        worker = AIWorker(ai)
+        worker.start(GameServices(Board(BoardType.BIG)))
+        start = perf_counter()
+        while ai.nodes == 0 and perf_counter() - start < 5:
+            pass
+        worker.cancel()
+        self.assertFalse(worker.busy)
+        self.assertIsNone(worker.poll())
+        # the next move waits for the cancelled search, which stops right away
+        services = GameServices(Board(BoardType.SMALL))
+        for column in (4, 4, 4):
+            services.make_player2_move(column)
+        worker.start(services)
+        self.assertEqual(worker.wait(5), 4)
+        self.assertLess(perf_counter() - start, 5)
+
+    def testEarlyCancel(self):
+        # a cancel sent before the search starts is kept until the next move
+        for ai in (NegamaxAI(time_limit=None), MCTSAI(time_limit=60)):
+            worker = AIWorker(ai)
+            start = perf_counter()
+            worker.start(GameServices(Board(BoardType.BIG)))
+            worker.cancel()
+            services = GameServices(Board(BoardType.SMALL))
+            for column in (4, 4, 4):
+                services.make_player2_move(column)
+            worker.start(services)
+            self.assertEqual(worker.wait(5), 4)
+            self.assertLess(perf_counter() - start, 5)
+        ai = NegamaxAI(time_limit=None)
+        ai.stop()
+        self.assertIn(ai.search(Position(BitBoardLayout.for_type(BoardType.BIG))), range(9))
+        # a search started after the stop does not search a single node
+        self.assertEqual(ai.nodes, 0)
+        ai.resume()
+        ai = NegamaxAI(time_limit=None, max_depth=2)
+        self.assertEqual(ai.search(Position(BitBoardLayout.for_type(BoardType.NORMAL))), 3)
+        self.assertEqual(ai.last_depth, 2)
+
+    def testErrors(self):
+        class FailingAI:
+            def make_move(self, service):
+                raise ValueError('no move')
+        worker = AIWorker(FailingAI())
+        worker.start(GameServices(Board()))
+        with self.assertRaises(ValueError):
+            worker.wait(5)
+        self.assertFalse(worker.busy)
+
+
+class TestGameSession(unittest.TestCase):
+    def testTurnsAndOutcome(self):
+        session = GameSession(GameServices(Board()), starting_player=2)
+        self.assertEqual(session.to_move, 2)
+        for column in (0, 1, 0, 1, 0, 1):
+            session.play(column)
+            self.assertIsNone(session.outcome)
+        self.assertEqual(session.to_move, 2)
+        point = session.play(0)
+        self.assertEqual((point.x, point.y), (0, 2))
+        self.assertEqual(session.outcome, GameOutcome.PLAYER2_WIN)
+        self.assertTrue(session.is_over)
+        with self.assertRaises(GameSessionException):
+            session.play(3)
+        session.undo()
+        self.assertIsNone(session.outcome)
+        self.assertEqual(session.to_move, 2)
+        self.assertEqual((session.last_point.x, session.last_point.y), (1, 3))
+        session.reset(starting_player=1)
+        self.assertEqual(session.to_move, 1)
+        self.assertEqual(session.history, [])
+        with self.assertRaises(GameSessionException):
+            GameSession(GameServices(Board()), starting_player=3)
+
+    def testOutcomeEvaluatedOncePerMove(self):
+        class CountingServices(GameServices):
+            calls = 0
+
+            def is_game_over(self, point, player_index):
+                CountingServices.calls += 1
+                return super().is_game_over(point, player_index)
+        session = GameSession(CountingServices(Board()))
+        session.play(3)
+        for read in range(3):
+            self.assertIsNone(session.outcome)
+        self.assertEqual(CountingServices.calls, 1)
+
+    def testStepAI(self):
+        session = GameSession(GameServices(Board(BoardType.SMALL)), BasicAI())
+        with self.assertRaises(GameSessionException):
+            session.step_ai()
+        session.play(2)
+        session.step_ai()
+        self.assertEqual(session.to_move, 1)
+        with self.assertRaises(GameSessionException):
+            GameSession(GameServices(Board()), starting_player=2).step_ai()
+
+    def testPlayOut(self):
+        generator = Random(4)
+
+        def player1(session):
+            return generator.choice([column for column in range(session.board.columns)
+                                     if session.board.column_height[column] != session.board.rows])
+        session = GameSession(GameServices(Board()), BasicAI())
+        for game in range(5):
+            session.reset()
+            outcome = session.play_out(player1)
+            self.assertIsNotNone(outcome)
+            self.assertEqual(outcome, session.outcome)
+
+
+class TestGameServer(unittest.TestCase):
+    @staticmethod
+    async def connect(server):
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+
+        async def send(message):
+            writer.write(encode(message))
+            await writer.drain()
+
+        async def receive():
+            return decode(await asyncio.wait_for(reader.readline(), 5))
+        return send, receive, writer
+
+    def testProtocol(self):
+        message = {'type': 'move', 'column': 3}
+        self.assertEqual(decode(encode(message)), message)
+        self.assertTrue(encode(message).endswith(b'\n'))
+        for line in (b'{"type": ', b'[1, 2]', b'{"column": 3}', b'\xff'):
+            with self.assertRaises(ProtocolException):
+                decode(line)
+
+    def testGameAgainstAI(self):
+        async def scenario():
+            server = GameServer(ai_factory=RandomAI)
+            await server.start()
+            send, receive, writer = await self.connect(server)
+            await send({'type': 'move', 'column': 0})
+            self.assertEqual((await receive())['type'], 'error')
+            await send({'type': 'new_game', 'mode': 'ai', 'board': 'SMALL'})
+            start = await receive()
+            self.assertEqual((start['type'], start['player'], start['rows'], start['columns']), ('start', 1, 4, 5))
+            await send({'type': 'move', 'column': 7})
+            self.assertEqual((await receive())['type'], 'error')
+            await send({'type': 'move', 'column': 2})
+            self.assertEqual(await receive(), {'type': 'move', 'player': 1, 'row': 3, 'column': 2})
+            self.assertEqual((await receive())['player'], 2)
+            self.assertEqual(server.active_games, 1)
+            writer.close()
+            await server.close()
+            return server.stats
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats, {'games_started': 1, 'games_finished': 1, 'moves': 2})
+
+    def testHumanMatchmaking(self):
+        async def scenario():
+            server = GameServer()
+            await server.start()
+            send1, receive1, writer1 = await self.connect(server)
+            send2, receive2, writer2 = await self.connect(server)
+            await send1({'type': 'new_game', 'mode': 'human'})
+            self.assertEqual(await receive1(), {'type': 'waiting'})
+            await send2({'type': 'new_game', 'mode': 'human'})
+            self.assertEqual((await receive1())['player'], 1)
+            self.assertEqual((await receive2())['player'], 2)
+            await send2({'type': 'move', 'column': 3})
+            self.assertEqual((await receive2())['type'], 'error')
+            await send1({'type': 'move', 'column': 3})
+            self.assertEqual(await receive1(), await receive2())
+            writer1.close()
+            self.assertEqual(await receive2(), {'type': 'game_over', 'outcome': 'ABANDONED'})
+            writer2.close()
+            await server.close()
+        asyncio.run(scenario())
+
+    def testFailingAI(self):
+        class FailingAI:
+            def make_move(self, service):
+                raise RuntimeError('no move')
+
+        async def scenario():
+            server = GameServer(ai_factory=FailingAI)
+            await server.start()
+            send, receive, writer = await self.connect(server)
+            await send({'type': 'new_game', 'mode': 'ai'})
+            await receive()
+            with self.assertLogs('server.game_server', 'ERROR'):
+                await send({'type': 'move', 'column': 3})
+                self.assertEqual((await receive())['type'], 'move')
+                self.assertEqual(await receive(), {'type': 'error', 'message': 'Internal error: no move'})
+            self.assertEqual(await receive(), {'type': 'game_over', 'outcome': 'ABANDONED'})
+            writer.close()
+            await server.close()
+            return server.active_games
+        self.assertEqual(asyncio.run(scenario()), 0)
+
+    def testSearchingAI(self):
+        async def scenario():
+            # the searching AIs run in the server's process pool
+            server = GameServer(ai_factory=AI_FACTORIES['negamax'])
+            await server.start()
+            send, receive, writer = await self.connect(server)
+            await send({'type': 'new_game', 'mode': 'ai', 'board': 'SMALL'})
+            await receive()
+            await send({'type': 'move', 'column': 2})
+            self.assertEqual((await receive())['player'], 1)
+            reply = await receive()
+            self.assertEqual(reply['player'], 2)
+            self.assertIn(reply['column'], range(5))
+            self.assertEqual(server.stats['moves'], 2)
+            writer.close()
+            await server.close()
+        asyncio.run(scenario())
+
+    def testLoopLag(self):
+        results = asyncio.run(run_load_test(4, 1, BoardType.SMALL, ai='negamax'))
+        self.assertEqual(results['games'], 4)
+        # the searches of the AI run in processes, leaving the event loop free
+        self.assertLess(results['loop_lag_p99_ms'], 100)
+
+    def testSharedTranspositionTable(self):
+        first, second = AI_FACTORIES['negamax'](), AI_FACTORIES['negamax']()
+        self.assertIs(first.transposition_table, second.transposition_table)
+
+    def testLoadTest(self):
+        results = asyncio.run(run_load_test(10, 2, BoardType.SMALL, ai='random'))
+        self.assertEqual(results['games'], 20)
+        self.assertGreaterEqual(results['moves'], 20 * 7)
+        self.assertLessEqual(results['p50_ms'], results['p99_ms'])
+
+
+class TestGameRecords(unittest.TestCase):
+    @staticmethod
+    def play_records(count):
+        generator = Random(7)
+        records = []
+        for game in range(count):
+            board_type = list(BoardType)[game % 3]
+            session = GameSession(GameServices(CompactBoard(board_type)), starting_player=1 + game % 2)
+            session.play_out(lambda session: generator.choice(
+                [column for column in range(session.board.columns)
+                 if session.board.column_height[column] != session.board.rows]))
+            records.append((GameRecord.from_service(session.service, board_type, session.outcome), session))
+        return records
+
+    def testPacking(self):
+        record = GameRecord(BoardType.BIG, 2, [8, 0, 4, 4], GameOutcome.PLAYER2_WIN)
+        self.assertEqual(record.moves, (8, 0, 4, 4))
+        self.assertEqual(len(record.packed), 2)
+        self.assertEqual(len(GameRecord(BoardType.NORMAL, 1, [6] * 6 * 7).to_bytes()), 2 + 16)
+        with self.assertRaises(GameRecordException):
+            GameRecord(BoardType.SMALL, 1, [5])
+        with self.assertRaises(GameRecordException):
+            GameRecord(BoardType.SMALL, 3, [0])
+        with self.assertRaises(GameRecordException):
+            GameRecord(BoardType.SMALL, 1, [0] * 21)
+
+    def testReplay(self):
+        for record, session in self.play_records(6):
+            self.assertEqual(record.starting_player, session.starting_player)
+            self.assertEqual(record.outcome, session.outcome)
+            service = record.replay()
+            self.assertEqual(service.history, session.history)
+            self.assertEqual(service.zobrist_hash, session.service.zobrist_hash)
+            self.assertEqual(record.replay(3, Board).history, session.history[:3])
+        with self.assertRaises(GameRecordException):
+            record.replay(len(record) + 1)
+
+    def testWriteAndRead(self):
+        records = [record for record, session in self.play_records(30)]
+        path = os.path.join(tempfile.mkdtemp(), 'games.records')
+        with GameRecordWriter(path) as writer:
+            for record in records:
+                writer.write(record)
+            self.assertEqual(writer.count, 30)
+        self.assertEqual(list(read_records(path)), records)
+        with open(path, 'rb') as file:
+            data = file.read()
+        self.assertEqual(list(iter_records(data)), records)
+        with GameRecordFile(path) as file:
+            kept = [record.copy() for record in file]
+            self.assertIsInstance(next(iter(file)).packed, memoryview)
+        self.assertEqual(kept, records)
+        file = GameRecordFile(path)
+        held = list(file)
+        with self.assertRaises(GameRecordException):
+            file.close()
+        del held
+        file.close()
+        with self.assertRaises(GameRecordException):
+            list(iter_records(data[:-1]))
+        with self.assertRaises(GameRecordException):
+            list(iter_records(b'C4BK' + data[4:]))
+
+    def testCloseWhileInUse(self):
+        path = os.path.join(tempfile.mkdtemp(), 'games.records')
+        with GameRecordWriter(path) as writer:
+            for record, session in self.play_records(3):
+                writer.write(record)
+        file = GameRecordFile(path)
+        held = list(file)
+        with self.assertRaises(GameRecordException):
+            file.close()
+        # the failed close still closed the file, so that a second close does nothing and no handle is leaked
+        file.close()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            del file
+            gc.collect()
+        self.assertEqual([warning for warning in caught if warning.category is ResourceWarning], [])
+        # the records stay readable until they are released
+        self.assertEqual([record.copy() for record in held], list(read_records(path)))
+
+
+class TestPositionStore(unittest.TestCase):
+    @staticmethod
+    def position(*columns):
+        position = Position(BitBoardLayout.for_size(6, 7))
+        for column in columns:
+            position.play(column)
+        return position
+
+    def testCanonicalKey(self):
+        left, mirrored_left = self.position(0, 1, 1).canonical_key()
+        right, mirrored_right = self.position(6, 5, 5).canonical_key()
+        self.assertEqual(left, right)
+        self.assertNotEqual(mirrored_left, mirrored_right)
+        self.assertEqual(self.position(3, 3).canonical_key(), (self.position(3, 3).key(), False))
+        layout = BitBoardLayout.for_size(6, 7)
+        self.assertEqual(layout.mirror(layout.mirror(self.position(0, 2, 5).key())), self.position(0, 2, 5).key())
+
+    def testStoreAndLookup(self):
+        path = os.path.join(tempfile.mkdtemp(), 'positions.db')
+        with PositionStore(path, batch_size=2) as store:
+            self.assertIsNone(store.lookup(self.position(0)))
+            store.store(self.position(0), 5, 0, 1)
+            self.assertEqual(store.lookup(self.position(6)), (5, 0, 5))
+            store.store(self.position(6), 3, 7, 2)
+            self.assertEqual(store.lookup(self.position(0)), (5, 0, 1))
+            store.store_many([(self.position(1), 2, 0, 3), (self.position(2), 4, -5, 0)])
+            self.assertEqual(len(store), 3)
+        with PositionStore(path) as store:
+            self.assertEqual(store.lookup(self.position(5)), (2, 0, 3))
+            self.assertEqual(store.lookup(self.position(5)), (2, 0, 3))
+            self.assertEqual((store.hits, store.misses), (1, 1))
+            store.store(self.position(5), 6, 1, 4)
+            self.assertEqual(store.lookup(self.position(1)), (6, 1, 2))
+
+    def testMerge(self):
+        directory = tempfile.mkdtemp()
+        paths = [os.path.join(directory, name) for name in ('first.db', 'second.db', 'merged.db')]
+        with PositionStore(paths[0]) as store:
+            store.store_many([(self.position(0), 2, 0, 1), (self.position(3), 8, 0, 3)])
+        with PositionStore(paths[1]) as store:
+            store.store_many([(self.position(6), 4, 0, 6), (self.position(3), 1, 0, 2)])
+        self.assertEqual(merge_stores(paths[2], paths[:2]), 2)
+        with PositionStore(paths[2]) as store:
+            self.assertEqual(store.lookup(self.position(0)), (4, 0, 0))
+            self.assertEqual(store.lookup(self.position(3)), (8, 0, 3))
+        with open(paths[0], 'wb') as file:
+            file.write(b'not a store')
+        with self.assertRaises(PositionStoreException):
+            PositionStore(paths[0])
+
+    def testNegamaxUsesStore(self):
+        path = os.path.join(tempfile.mkdtemp(), 'positions.db')
+        board = Board()
+        service = GameServices(board)
+        service.make_player1_move(3)
+        with PositionStore(path) as store:
+            first = NegamaxAI(time_limit=None, max_depth=5, position_store=store)
+            move = first.make_move(service)
+            self.assertGreater(first.nodes, 0)
+        with PositionStore(path) as store:
+            second = NegamaxAI(time_limit=None, max_depth=5, position_store=store)
+            self.assertEqual(second.make_move(service), move)
+            self.assertEqual(second.nodes, 0)
+            self.assertEqual(second.last_depth, first.last_depth)
+
+
+class TestSymmetry(unittest.TestCase):
+    @staticmethod
+    def position(*columns):
+        position = Position(BitBoardLayout.for_size(6, 7))
+        for column in columns:
+            position.play(column)
+        return position
+
+    def testCanonicalForms(self):
+        left, right = self.position(0, 1, 1), self.position(6, 5, 5)
+        symmetry = Symmetry.for_position(left)
+        self.assertIs(symmetry, Symmetry.for_position(right))
+        self.assertEqual(left.mirror_hash, right.hash)
+        left_hash, left_mirrored = symmetry.canonical_hash(left)
+        right_hash, right_mirrored = symmetry.canonical_hash(right)
+        self.assertEqual(left_hash, right_hash)
+        self.assertNotEqual(left_mirrored, right_mirrored)
+        self.assertEqual(symmetry.canonical_key(left)[0], symmetry.canonical_key(right)[0])
+        self.assertEqual(symmetry.to_canonical(2, True), 4)
+        self.assertEqual(symmetry.from_canonical(symmetry.to_canonical(2, True), True), 2)
+        self.assertEqual(symmetry.to_canonical(-1, True), -1)
+        left.undo(1)
+        self.assertEqual(left.mirror_hash, self.position(6, 5).hash)
+        service = GameServices(Board())
+        service.make_player1_move(0)
+        self.assertEqual(Position.from_board(service.board).mirror_hash, self.position(6).hash)
+        self.assertEqual(Position.from_board(service.board).copy().mirror_hash, self.position(6).hash)
+
+    def testUniqueMoves(self):
+        symmetry = Symmetry(7)
+        self.assertEqual(symmetry.unique_moves(self.position(), [3, 2, 4, 1, 5, 0, 6]), [3, 2, 1, 0])
+        self.assertEqual(symmetry.unique_moves(self.position(3, 3), [3, 4, 2]), [3, 2])
+        self.assertEqual(symmetry.unique_moves(self.position(0), [3, 2, 4]), [3, 2, 4])
+
+    def testSearchWithSymmetry(self):
+        for columns in ((), (3,), (0, 2, 1)):
+            service = GameServices(BitBoard())
+            for index, column in enumerate(columns + (3,)):
+                if index % 2 == 0:
+                    service.make_player1_move(column)
+                else:
+                    service.make_player2_move(column)
+            plain = NegamaxAI(time_limit=None, max_depth=6, symmetry=False)
+            merged = NegamaxAI(time_limit=None, max_depth=6)
+            plain.make_move(service)
+            merged.make_move(service)
+            self.assertEqual(plain.last_score, merged.last_score)
+            self.assertLessEqual(len(merged.transposition_table), len(plain.transposition_table))
+            if len(columns) == 0:
+                self.assertLess(merged.nodes, plain.nodes * 0.7)
+
+
+class TestMCTSAI(unittest.TestCase):
+    @staticmethod
+    def service(*columns, board_type=BoardType.NORMAL):
+        service = GameServices(BitBoard(board_type))
+        for index, column in enumerate(columns):
+            if index % 2 == 0:
+                service.make_player1_move(column)
+            else:
+                service.make_player2_move(column)
+        return service
+
+    def testWinsAndBlocks(self):
+        ai = MCTSAI(time_limit=None, max_playouts=2000, seed=1)
+        self.assertEqual(ai.make_move(self.service(0, 4, 1, 4, 6, 4, 6)), 4)
+        self.assertEqual(ai.make_move(self.service(0, 6, 1, 6, 2)), 3)
+
+    def testReproducibleAndReused(self):
+        moves = [MCTSAI(time_limit=None, max_playouts=300, seed=5).make_move(self.service(3)) for repeat in range(2)]
+        self.assertEqual(moves[0], moves[1])
+        ai = MCTSAI(time_limit=None, max_playouts=500, seed=5)
+        service = self.service(3, board_type=BoardType.BIG)
+        move = ai.make_move(service)
+        self.assertEqual(ai.reused_playouts, 0)
+        self.assertEqual(ai.playouts, 500)
+        self.assertEqual(ai.tree_size, 501)
+        service.make_player2_move(move)
+        service.make_player1_move(0)
+        ai.make_move(service)
+        self.assertGreater(ai.reused_playouts, 0)
+        self.assertGreater(ai.stats['playouts_per_second'], 0)
+        full = self.service(*[column for column in range(7) for row in range(6)])
+        self.assertEqual(ai.make_move(full), -1)
+
+    def testRollout(self):
+        position = Position.from_board(self.service(3, 3, 2).board)
+        key = position.key()
+        generator = Random(3)
+        for playout in range(50):
+            self.assertIn(rollout(position, generator), (-1, 0, 1))
+        self.assertEqual(position.key(), key)
+        # on a 4x5 board only a whole row of one player wins a connect 5 game, most games are drawn
+        position = Position(BitBoardLayout.for_size(4, 5), 5)
+        self.assertGreater([rollout(position, generator) for playout in range(50)].count(0), 40)
+
+    def testLongerLines(self):
+        service = GameServices(BitBoard(rows=6, columns=8, connect=5))
+        for column in (1, 2, 3, 4):
+            service.make_player2_move(column)
+            service.make_player1_move(7 if column < 4 else 6)
+        ai = MCTSAI(time_limit=None, max_playouts=500, seed=1)
+        self.assertIn(ai.make_move(service), [0, 5])
+
+    def testRootParallel(self):
+        ai = MCTSAI(time_limit=None, max_playouts=200, workers=2, seed=2)
+        try:
+            move = ai.make_move(self.service(3, 3))
+            self.assertIn(move, range(7))
+            self.assertEqual(ai.playouts, 400)
+        finally:
+            ai.close()
+        with self.assertRaises(ValueError):
+            MCTSAI(time_limit=None)
+
+    def testStopWorkers(self):
+        ai = MCTSAI(time_limit=60, workers=2, seed=2)
+        moves = []
+        thread = threading.Thread(target=lambda: moves.append(ai.make_move(self.service(3))))
+        try:
+            start = perf_counter()
+            thread.start()
+            thread.join(0.5)
+            ai.stop()
+            # the worker trees see the stop too, instead of running to the time limit
+            thread.join(10)
+            self.assertIn(moves[0], range(7))
+            self.assertLess(perf_counter() - start, 10)
+        finally:
+            ai.close()
+
+
+class TestWindowEvaluator(unittest.TestCase):
+    @staticmethod
+    def loop_score(board, player_index):
+        score = 0
+        own_status, other_status = CellStatus.OCCUPIED_BY_PLAYER1, CellStatus.OCCUPIED_BY_PLAYER2
+        if player_index == 2:
+            own_status, other_status = other_status, own_status
+        for line in WinLineTable.for_geometry(board.rows, board.columns, 4).lines:
+            statuses = [board[row][column].status for row, column in line]
+            own, other = statuses.count(own_status), statuses.count(other_status)
+            if other == 0:
+                score += WindowEvaluator.WEIGHTS[own]
+            elif own == 0:
+                score -= WindowEvaluator.WEIGHTS[other]
+        return score
+
+    def testMatchesWindowLoop(self):
+        generator = Random(4)
+        for board_type in BoardType:
+            evaluator = WindowEvaluator.for_type(board_type)
+            self.assertIs(evaluator, WindowEvaluator.for_type(board_type))
+            service = GameServices(BitBoard(board_type))
+            board = service.board
+            positions = []
+            scores = []
+            for move in range(board.rows * board.columns // 2):
+                column = generator.choice([column for column in range(board.columns)
+                                           if board.column_height[column] < board.rows])
+                if move % 2 == 0:
+                    service.make_player1_move(column)
+                else:
+                    service.make_player2_move(column)
+                position = Position.from_board(board, 2 - move % 2)
+                self.assertEqual(evaluator.evaluate(position), self.loop_score(board, position.player))
+                positions.append(position)
+                scores.append(evaluator.evaluate(position))
+            self.assertEqual(evaluator.evaluate_many(positions).tolist(), scores)
+
+    def testChildrenAndSymmetry(self):
+        position = Position(BitBoardLayout.for_size(6, 7))
+        evaluator = WindowEvaluator.for_size(6, 7)
+        self.assertEqual(evaluator.evaluate(position), 0)
+        for column in (3, 3, 2, 4, 0, 0, 0, 0, 0, 0):
+            position.play(column)
+        columns, scores = evaluator.evaluate_children(position)
+        self.assertEqual(columns, [1, 2, 3, 4, 5, 6])
+        for column, score in zip(columns, scores):
+            position.play(column)
+            self.assertEqual(score, -evaluator.evaluate(position))
+            position.undo(column)
+        mirrored = Position(BitBoardLayout.for_size(6, 7))
+        for column in (3, 3, 4, 2, 6, 6, 6, 6, 6, 6):
+            mirrored.play(column)
+        self.assertEqual(evaluator.evaluate(mirrored), evaluator.evaluate(position))
+        # dropping in column 1 completes the bottom row of the first player
+        self.assertEqual(columns[scores.argmax()], 1)
+
+    def testNegamaxLeafEvaluation(self):
+        position = Position(BitBoardLayout.for_size(6, 7))
+        for column in (2, 4):
+            position.play(column)
+        evaluator = WindowEvaluator.for_size(6, 7)
+        # without an evaluator every move is unknown at depth 1 and the center is played first
+        plain = NegamaxAI(time_limit=None, max_depth=1)
+        self.assertEqual(plain.search(position), 3)
+        evaluated = NegamaxAI(time_limit=None, max_depth=1, evaluator=evaluator)
+        columns, scores = evaluator.evaluate_children(position)
+        self.assertEqual(evaluated.search(position), columns[scores.argmax()])
+        self.assertEqual(evaluated.search(position), 2)
+        self.assertEqual(evaluated.last_score, 0)
+        # proven outcomes still outrank any evaluation: an open three on the bottom row wins
+        position = Position(BitBoardLayout.for_size(6, 7))
+        for column in (1, 6, 2, 6):
+            position.play(column)
+        plain = NegamaxAI(time_limit=None, max_depth=4)
+        evaluated = NegamaxAI(time_limit=None, max_depth=4, evaluator=evaluator)
+        self.assertEqual(evaluated.search(position), plain.search(position))
+        self.assertGreater(plain.last_score, 0)
+        self.assertEqual(evaluated.last_score, plain.last_score)
+
+
+class TestLazySMP(unittest.TestCase):
+    def setUp(self):
+        self.table = SharedTranspositionTable(4)
+
+    def tearDown(self):
+        self.table.close()
+
+    def testSharedTable(self):
+        key = (1 << 64) - 3
+        self.assertIsNone(self.table.probe(key))
+        self.table.store(key, 12, -9, SharedTranspositionTable.UPPER_BOUND, -1)
+        self.assertEqual(self.table.probe(key), (12, -9, SharedTranspositionTable.UPPER_BOUND, -1))
+        self.assertIs(pickle.loads(pickle.dumps(self.table)), self.table)
+        # entries stored by another process holding the block are seen, and a torn entry is a miss
+        memory = shared_memory.SharedMemory(name=self.table.name)
+        try:
+            self.assertIsNone(self.table.probe(2))
+            view = memory.buf.cast('Q')
+            slot = 2 * SharedTranspositionTable.WORDS
+            data = SharedTranspositionTable.VALID | 3 << 42 | (5 + SharedTranspositionTable.SCORE_OFFSET) << 8 | 4
+            view[slot] = 2 ^ data
+            view[slot + 1] = data
+            self.assertEqual(self.table.probe(2), (4, 5, SharedTranspositionTable.EXACT, 2))
+            view[slot + 1] = data + 1
+            self.assertIsNone(self.table.probe(2))
+            view.release()
+        finally:
+            memory.close()
+        self.assertEqual(len(self.table), 2)
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+
+    def testSharedTableExtremeScores(self):
+        # scores of evaluated BIG board positions fit, and scores out of the field are clamped instead of spilling
+        # into the bound flag and the move
+        for key, score in ((1, 40000), (2, -40000), (3, 1 << 40), (4, -(1 << 40))):
+            self.table.store(key, 9, score, SharedTranspositionTable.LOWER_BOUND, 8)
+            expected = min(max(score, SharedTranspositionTable.MIN_SCORE), SharedTranspositionTable.MAX_SCORE)
+            self.assertEqual(self.table.probe(key), (9, expected, SharedTranspositionTable.LOWER_BOUND, 8))
+
+    def testSharedTableReplacement(self):
+        for key, depth in ((1, 5), (5, 2), (9, 3)):
+            self.table.store(key, depth, 0, SharedTranspositionTable.EXACT, 0)
+        self.assertIsNotNone(self.table.probe(1))
+        self.assertIsNone(self.table.probe(5))
+        self.assertIsNotNone(self.table.probe(9))
+        self.table.store(13, 7, 0, SharedTranspositionTable.EXACT, 3)
+        self.assertEqual(self.table.probe(13)[3], 3)
+        self.assertIsNotNone(self.table.probe(1))
+        self.assertIsNone(self.table.probe(9))
+
+    def testParallelSearch(self):
+        position = Position(BitBoardLayout.for_size(6, 7))
+        for column in (0, 6, 1, 6, 2):
+            position.play(column)
+        with LazySMPAI(time_limit=None, max_depth=6, workers=2) as ai:
+            self.assertEqual(ai.search(position), 3)
+            self.assertEqual(ai.last_depth, 6)
+            self.assertEqual(len(ai.stats['worker_depths']), 2)
+            self.assertGreater(len(ai.transposition_table), 0)
+            position.undo(2)
+            position.undo(6)
+            self.assertIn(ai.search(position), range(7))
+            self.assertEqual(ai.stats['worker_depths'][0], 6)
+        helper = NegamaxAI(time_limit=None, max_depth=4, start_depth=3, root_rotation=2)
+        self.assertIn(helper.search(position), range(7))
+        self.assertEqual(helper.last_depth, 4)
+        with self.assertRaises(ValueError):
+            LazySMPAI(workers=0)
+
+    def testSharedMemoryFreed(self):
+        ai = LazySMPAI(time_limit=None, max_depth=2, workers=1)
+        name = ai.transposition_table.name
+        del ai
+        gc.collect()
+        # the block was unlinked without close being called
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        Instrumentation.disable()
+        Instrumentation.reset()
+
+    def testHistogram(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(0.5), 0)
+        for nanoseconds in (1000, 1500, 3000, 100000):
+            histogram.record(nanoseconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['buckets'], {'1024': 1, '2048': 1, '4096': 1, '131072': 1})
+        self.assertEqual(histogram.percentile(0.5), 2048)
+        self.assertEqual(histogram.percentile(1.0), 100000)
+        self.assertEqual(snapshot['min_us'], 1.0)
+
+    def testInstrumentedGame(self):
+        original = GameServices.make_player1_move
+        session = GameSession(GameServices(Board()), NegamaxAI(time_limit=None, max_depth=3))
+        session.play(3)
+        self.assertEqual(Instrumentation.snapshot()['timers'], {})
+        Instrumentation.enable()
+        self.assertTrue(Instrumentation.is_enabled())
+        self.assertIsNot(GameServices.make_player1_move, original)
+        session.step_ai()
+        session.play(3)
+        BoardRenderer.for_board(session.board).render(session.service)
+        snapshot = Instrumentation.snapshot()
+        self.assertEqual(snapshot['timers']['game.make_move']['count'], 2)
+        self.assertEqual(snapshot['timers']['game.is_game_over']['count'], 2)
+        self.assertEqual(snapshot['timers']['render.console']['count'], 1)
+        self.assertEqual(snapshot['timers']['ai.NegamaxAI.make_move']['count'], 1)
+        self.assertGreater(snapshot['counters']['ai.NegamaxAI.nodes'], 0)
+        self.assertIn('ai.NegamaxAI', snapshot['cache_hit_rates'])
+        Instrumentation.disable()
+        self.assertIs(GameServices.make_player1_move, original)
+        session.step_ai()
+        self.assertEqual(Instrumentation.snapshot()['timers']['game.make_move']['count'], 2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            Instrumentation.export(path)
+            with open(path) as file:
+                self.assertEqual(json.load(file)['counters'], snapshot['counters'])
+        Instrumentation.reset()
+        self.assertEqual(Instrumentation.snapshot()['counters'], {})
+
+    def testProfilers(self):
+        def work():
+            started = perf_counter()
+            while perf_counter() - started < 0.1:
+                sum(range(1000))
+            return 7
+
+        with tempfile.TemporaryDirectory() as directory:
+            profile_path = os.path.join(directory, 'game.prof')
+            flamegraph_path = os.path.join(directory, 'game.folded')
+            with contextlib.redirect_stdout(io.StringIO()) as report:
+                self.assertEqual(profile(work, profile_path, flamegraph_path), 7)
+            self.assertIn('cumulative', report.getvalue())
+            self.assertGreater(pstats.Stats(profile_path).total_calls, 0)
+            with open(flamegraph_path) as file:
+                lines = file.read().splitlines()
+            self.assertGreater(len(lines), 0)
+            stack, count = lines[0].rsplit(' ', 1)
+            self.assertIn('work (', stack)
+            self.assertGreater(int(count), 0)
+        sampler = StackSampler()
+        sampler.stop()
+        self.assertEqual(sampler.samples, 0)
@@ -0,0 +1,595 @@
+"""
+    Command line tool which benchmarks the hot paths of the game core and the AIs
+    Usage: python -m tools.benchmark --output results.json --baseline tools/baselines/benchmark.json
+    Every benchmark is run on every board type with fixed seeds, a few warmup runs and several timed repetitions in
+    each of several rounds; the median repetition is kept along with the spread of the repetitions. A run compared
+    against a baseline fails if any benchmark got slower than both the threshold and the noise of the two
+    measurements allow, the noise never accepting more than twice the threshold
+"""
+import copy
+import gc
+import json
+import math
+import pickle
+import platform
+import random
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from statistics import median, quantiles
+from time import perf_counter
+from repos.board import Board, BoardType
+from repos.bitboard import BitBoard, BitBoardLayout
+from repos.compact_board import CompactBoard
+from services.game_service import GameServices
+from AI.random import RandomAI
+from AI.basic import BasicAI
+from AI.negamax import NegamaxAI
+from AI.mcts import MCTSAI, playable_columns
+from AI.evaluation import WindowEvaluator
+from AI.position import Position
+from UI.renderer import BoardRenderer
+from services.game_session import GameSession
+
+DEFAULT_BASELINE = 'tools/baselines/benchmark.json'
+# the shortest time of a repetition, the runs which are faster being timed in batches
+MIN_SECONDS = 0.02
+# the number of spreads of the two measurements a benchmark must slow down by to count as a regression
+NOISE_FACTOR = 2.0
+# the number of thresholds the accepted slowdown of a noisy benchmark is capped at
+NOISE_CAP = 2.0
+BOARD_CLASSES = {
+    'board': Board,
+    'bitboard': BitBoard,
+    'compact': CompactBoard
+}
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """
+    Decorator registering a benchmark
+    The decorated function receives the board type and the seed and returns a tuple (setup, run, operations):
+    setup creates a fresh state before every repetition, run performs the measured work on that state and
+    operations is the number of operations run performs
+    :param name: The name of the benchmark
+    :return: The decorator
+    """
+    def register(function):
+        BENCHMARKS.append((name, function))
+        return function
+    return register
+
+
+def random_game(board_type: BoardType, seed: int):
+    """
+    Creates a sequence of random moves which fills the whole board
+    :param board_type: The type of the board
+    :param seed: The seed of the moves
+    :return: The list of columns
+    """
+    generator = random.Random(seed)
+    board = BitBoard(board_type)
+    heights = [0] * board.columns
+    columns = []
+    for move in range(board.rows * board.columns):
+        column = generator.choice([index for index in range(board.columns) if heights[index] < board.rows])
+        heights[column] += 1
+        columns.append(column)
+    return columns
+
+
+def play(service: GameServices, columns):
+    """
+    Plays the given moves, the players taking turns starting with the first player
+    :param service: The game service
+    :param columns: The columns of the moves
+    :return: The list of (point, player index) of every move
+    """
+    points = []
+    for index, column in enumerate(columns):
+        if index % 2 == 0:
+            points.append((service.make_player1_move(column), 1))
+        else:
+            points.append((service.make_player2_move(column), 2))
+    return points
+
+
+def board_benchmarks(board_name, board_class):
+    """
+    Registers the benchmarks of the game service for one board class
+    :param board_name: The name of the board class used in the benchmark names
+    :param board_class: The board class
+    :return: -
+    """
+    @benchmark('make_move/' + board_name)
+    def make_move(board_type, seed):
+        columns = random_game(board_type, seed)
+        games = 100
+
+        def setup():
+            return [GameServices(board_class(board_type)) for game in range(games)]
+
+        def run(services):
+            for service in services:
+                play(service, columns)
+        return setup, run, len(columns) * games
+
+    @benchmark('is_game_over/' + board_name)
+    def is_game_over(board_type, seed):
+        columns = random_game(board_type, seed)
+        columns = columns[:len(columns) // 2]
+        repeats = 200
+
+        def setup():
+            service = GameServices(board_class(board_type))
+            return service, play(service, columns)
+
+        def run(state):
+            service, points = state
+            for repeat in range(repeats):
+                for point, player in points:
+                    service.is_game_over(point, player)
+        return setup, run, len(columns) * repeats
+
+    @benchmark('board_str/' + board_name)
+    def board_str(board_type, seed):
+        columns = random_game(board_type, seed)
+        columns = columns[:len(columns) // 2]
+        repeats = 200
+
+        def setup():
+            service = GameServices(board_class(board_type))
+            play(service, columns)
+            return service.board
+
+        def run(board):
+            for repeat in range(repeats):
+                str(board)
+        return setup, run, repeats
+
+    @benchmark('deepcopy/' + board_name)
+    def deepcopy(board_type, seed):
+        columns = random_game(board_type, seed)
+        columns = columns[:len(columns) // 2]
+        repeats = 200
+
+        def setup():
+            service = GameServices(board_class(board_type))
+            play(service, columns)
+            return service.board
+
+        def run(board):
+            for repeat in range(repeats):
+                copy.deepcopy(board)
+        return setup, run, repeats
+
+    @benchmark('pickle/' + board_name)
+    def pickle_board(board_type, seed):
+        columns = random_game(board_type, seed)
+        columns = columns[:len(columns) // 2]
+        repeats = 200
+
+        def setup():
+            service = GameServices(board_class(board_type))
+            play(service, columns)
+            return service.board
+
+        def run(board):
+            for repeat in range(repeats):
+                pickle.loads(pickle.dumps(board))
+        return setup, run, repeats
+
+
+for board_name, board_class in BOARD_CLASSES.items():
+    board_benchmarks(board_name, board_class)
+
+
+def renderer_benchmark(name, ansi):
+    """
+    Registers the benchmark of the console renderer drawing the board after every move of a game
+    :param name: The name of the benchmark
+    :param ansi: True for the compact ANSI mode, False for the text table mode
+    :return: -
+    """
+    @benchmark(name)
+    def render(board_type, seed):
+        columns = random_game(board_type, seed)
+
+        def setup():
+            service = GameServices(Board(board_type))
+            return BoardRenderer.for_board(service.board, ansi), service
+
+        def run(state):
+            renderer, service = state
+            for index, column in enumerate(columns):
+                if index % 2 == 0:
+                    service.make_player1_move(column)
+                else:
+                    service.make_player2_move(column)
+                renderer.render(service)
+        return setup, run, len(columns)
+
+
+renderer_benchmark('render/text', False)
+renderer_benchmark('render/ansi', True)
+
+
+def ai_benchmark(name, ai_class, repeats):
+    """
+    Registers the benchmark of an AI choosing a move in the middle of a game
+    :param name: The name of the benchmark
+    :param ai_class: The class of the AI
+    :param repeats: The number of moves chosen by one run
+    :return: -
+    """
+    @benchmark(name)
+    def ai_move(board_type, seed):
+        columns = random_game(board_type, seed)
+        columns = columns[:len(columns) // 3]
+
+        def setup():
+            random.seed(seed)
+            service = GameServices(Board(board_type))
+            play(service, columns)
+            return ai_class(), service
+
+        def run(state):
+            ai, service = state
+            for repeat in range(repeats):
+                ai.make_move(service)
+        return setup, run, repeats
+
+
+@benchmark('session_game')
+def session_game(board_type, seed):
+    games = 50
+
+    def setup():
+        generator = random.Random(seed)
+        random.seed(seed)
+
+        def player1(session):
+            board = session.board
+            return generator.choice([column for column in range(board.columns)
+                                     if board.column_height[column] != board.rows])
+        return GameSession(GameServices(Board(board_type)), BasicAI()), player1
+
+    def run(state):
+        session, player1 = state
+        for game in range(games):
+            session.reset()
+            session.play_out(player1)
+    return setup, run, games
+
+
+@benchmark('mcts_playouts')
+def mcts_playouts(board_type, seed):
+    playouts = 500
+
+    def setup():
+        # after the opening move, so that no move wins at once and every playout is run
+        service = GameServices(BitBoard(board_type))
+        service.make_player1_move(service.board.columns // 2)
+        return MCTSAI(time_limit=None, max_playouts=playouts, seed=seed), service
+
+    def run(state):
+        ai, service = state
+        ai.make_move(service)
+    return setup, run, playouts
+
+
+def loop_evaluation(position: Position, windows):
+    """
+    Scores a position like WindowEvaluator does, one window after the other in pure Python, as a reference for the
+    vectorized evaluation
+    :param position: The position
+    :param windows: The bit indexes of the cells of every window
+    :return: The score for the player to move
+    """
+    weights = WindowEvaluator.WEIGHTS
+    own = position.current
+    other = position.mask ^ own
+    score = 0
+    for window in windows:
+        own_count = other_count = 0
+        for bit in window:
+            if own >> bit & 1:
+                own_count += 1
+            elif other >> bit & 1:
+                other_count += 1
+        if other_count == 0:
+            score += weights[own_count]
+        elif own_count == 0:
+            score -= weights[other_count]
+    return score
+
+
+def evaluation_benchmark(name, vectorized):
+    """
+    Registers the benchmark of the static evaluation scoring the children of every position of a game
+    :param name: The name of the benchmark
+    :param vectorized: True to score all the children of a position in one WindowEvaluator pass, False to score
+                       them one at a time with the pure Python loop
+    :return: -
+    """
+    @benchmark(name)
+    def evaluate(board_type, seed):
+        columns = random_game(board_type, seed)
+        evaluator = WindowEvaluator.for_type(board_type)
+        windows = [tuple(window) for window in evaluator.windows.tolist()]
+        positions = []
+        position = Position(BitBoardLayout.for_type(board_type))
+        for column in columns[:len(columns) // 2]:
+            positions.append(position.copy())
+            position.play(column)
+        children = sum(len(playable_columns(position)) for position in positions)
+
+        def setup():
+            return positions
+
+        def run(state):
+            for position in state:
+                if vectorized:
+                    evaluator.evaluate_children(position)
+                else:
+                    for column in playable_columns(position):
+                        position.play(column)
+                        loop_evaluation(position, windows)
+                        position.undo(column)
+        return setup, run, children
+
+
+evaluation_benchmark('evaluation/loop', False)
+evaluation_benchmark('evaluation/numpy', True)
+ai_benchmark('basic_ai', BasicAI, 500)
+ai_benchmark('random_ai', RandomAI, 20000)
+
+
+def board_memory(board_class, board_type: BoardType, boards: int = 100):
+    """
+    Measures the memory taken by a board
+    :param board_class: The class of the board
+    :param board_type: The type of the board
+    :param boards: The number of boards created, the result being their average
+    :return: The number of bytes allocated per board
+    """
+    board_class(board_type)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        created = [board_class(board_type) for board in range(boards)]
+        allocated = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return allocated // len(created)
+
+
+def search_size(board_type: BoardType, symmetry: bool, opening_moves: int, seed: int, depth: int = 10):
+    """
+    Measures the work of a fixed depth negamax search, which does not depend on the speed of the machine
+    :param board_type: The type of the board
+    :param symmetry: True to merge mirrored positions in the search
+    :param opening_moves: The number of random moves made before the search, 0 for the empty board
+    :param seed: The seed of the moves
+    :param depth: The depth of the search
+    :return: A dictionary holding the number of nodes searched and of transposition table entries
+    """
+    service = GameServices(BitBoard(board_type))
+    play(service, random_game(board_type, seed)[:opening_moves])
+    ai = NegamaxAI(time_limit=None, max_depth=depth, symmetry=symmetry)
+    # the AI searches for the second player, the first player moves once more on odd openings
+    if opening_moves % 2 == 0:
+        service.make_player1_move(service.board.columns // 2)
+    ai.make_move(service)
+    return {'nodes': ai.nodes, 'table_entries': len(ai.transposition_table)}
+
+
+def time_runs(run, states):
+    """
+    Times run on every given state, one after the other
+    :param run: Function performing the measured work on a state
+    :param states: The states, created beforehand
+    :return: The time in seconds
+    """
+    # as in timeit, the garbage collector is kept from running in the middle of a measurement
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = perf_counter()
+        for state in states:
+            run(state)
+        return perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(setup, run, repetitions: int, warmup: int, min_seconds: float = MIN_SECONDS):
+    """
+    Times a benchmark
+    Like timeit.autorange, a repetition times as many runs as it takes to last at least min_seconds, on states all
+    created before the timer starts, so that the runs shorter than the resolution of the timer are not noise only
+    :param setup: Function creating the state of one run
+    :param run: Function performing the measured work on a state
+    :param repetitions: The number of timed repetitions
+    :param warmup: The number of untimed runs made first
+    :param min_seconds: The shortest time of a repetition
+    :return: The list of the average time of a run in every repetition
+    """
+    for repetition in range(warmup):
+        run(setup())
+    runs = max(1, math.ceil(min_seconds / max(time_runs(run, [setup()]), 1e-9)))
+    return [time_runs(run, [setup() for index in range(runs)]) / runs for repetition in range(repetitions)]
+
+
+def summarize(times, operations):
+    """
+    Summarizes the repetitions of a benchmark
+    :param times: The time of a run in every repetition
+    :param operations: The number of operations performed by a run
+    :return: A dictionary holding the median and best operations per second, the spread of the repetitions, which is
+             their interquartile range relative to their median, the median time of a run and the number of
+             repetitions
+    """
+    middle = median(times)
+    spread = 0.0
+    if len(times) > 1:
+        quartiles = quantiles(times, n=4)
+        spread = (quartiles[2] - quartiles[0]) / middle
+    return {
+        'ops_per_sec': operations / middle,
+        'best_ops_per_sec': operations / min(times),
+        'spread': spread,
+        'median_seconds': middle,
+        'repetitions': len(times),
+        'operations': operations
+    }
+
+
+def run_benchmarks(board_types, repetitions: int = 5, warmup: int = 2, seed: int = 0, name_filter: str = '',
+                   rounds: int = 3):
+    """
+    Runs every registered benchmark on every given board type
+    The benchmarks are run one after the other in several rounds and the repetitions of all the rounds are
+    summarized together, so that a slow or fast period of the machine weighs on every benchmark alike instead of
+    shifting the few benchmarks which happened to run during it
+    :param board_types: The board types
+    :param repetitions: The number of timed repetitions of every benchmark in every round
+    :param warmup: The number of warmup runs of every benchmark in every round
+    :param seed: The seed of the games and AIs
+    :param name_filter: Only the benchmarks whose name contains this string are run
+    :param rounds: The number of rounds
+    :return: A dictionary mapping 'benchmark/BOARD_TYPE' to the measurements
+    """
+    cases = {}
+    for name, function in BENCHMARKS:
+        if name_filter not in name:
+            continue
+        for board_type in board_types:
+            cases[name + '/' + board_type.name] = function(board_type, seed)
+    times = {name: [] for name in cases}
+    for round_index in range(rounds):
+        for name, (setup, run, operations) in cases.items():
+            times[name].extend(measure(setup, run, repetitions, warmup))
+    return {name: summarize(times[name], cases[name][2]) for name in cases}
+
+
+def compare(results, baseline, threshold: float, noise: float = NOISE_FACTOR, cap: float = NOISE_CAP):
+    """
+    Compares the median results against a baseline
+    A benchmark regresses if it got slower than the threshold and than noise times the sum of the spreads of the two
+    measurements, so that a benchmark whose repetitions vary widely needs a larger slowdown to fail; the accepted
+    slowdown is capped at cap times the threshold, so that no benchmark is too noisy to ever fail
+    :param results: The results of run_benchmarks
+    :param baseline: The results of a previous run
+    :param threshold: The smallest relative slowdown counted as a regression, 0.2 meaning 20%
+    :param noise: The number of spreads a benchmark must slow down by
+    :param cap: The largest accepted slowdown, in thresholds
+    :return: A list of (benchmark, baseline ops/sec, current ops/sec, relative change, accepted slowdown) of the
+             benchmarks which got slower than allowed
+    """
+    regressions = []
+    for name, measurement in results.items():
+        if name not in baseline or 'ops_per_sec' not in baseline[name]:
+            continue
+        before = baseline[name]['ops_per_sec']
+        after = measurement['ops_per_sec']
+        change = after / before - 1
+        spreads = baseline[name].get('spread', 0.0) + measurement.get('spread', 0.0)
+        accepted = min(max(threshold, noise * spreads), cap * threshold)
+        if change < -accepted:
+            regressions.append((name, before, after, change, accepted))
+    return regressions
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Benchmarks the hot paths of the game core and the AIs')
+    parser.add_argument('--board', choices=[board_type.name for board_type in BoardType], nargs='+',
+                        default=[board_type.name for board_type in BoardType])
+    parser.add_argument('--filter', default='',
+                        help='only run the benchmarks, memory and search measures whose name contains this string')
+    parser.add_argument('--repetitions', type=int, default=5, help='number of timed repetitions of every round')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=3, help='number of passes over all the benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file the results are written to as JSON')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file instead of comparing against it')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='smallest slowdown against the baseline counted as a regression, 0.2 meaning 20%%')
+    parser.add_argument('--noise', type=float, default=NOISE_FACTOR,
+                        help='number of spreads of the measurements a benchmark must slow down by to regress')
+    parser.add_argument('--noise-cap', type=float, default=NOISE_CAP,
+                        help='largest accepted slowdown of a noisy benchmark, in thresholds')
+    arguments = parser.parse_args(arguments)
+
+    results = run_benchmarks([BoardType[board] for board in arguments.board], arguments.repetitions,
+                             arguments.warmup, arguments.seed, arguments.filter, arguments.rounds)
+    for name, measurement in results.items():
+        print('{:<40}{:>16.1f} ops/sec {:>6.1%} spread'.format(name, measurement['ops_per_sec'],
+                                                                measurement['spread']))
+    memory = {}
+    for board_name, board_class in BOARD_CLASSES.items():
+        for board in arguments.board:
+            if arguments.filter not in 'memory/' + board_name + '/' + board:
+                continue
+            memory[board_name + '/' + board] = board_memory(board_class, BoardType[board])
+            print('{:<40}{:>16d} bytes/board'.format('memory/' + board_name + '/' + board,
+                                                       memory[board_name + '/' + board]))
+
+    search = {}
+    for board in arguments.board:
+        for opening_moves in (0, 4):
+            for symmetry in (False, True):
+                name = '{}/{}/{}'.format('symmetry' if symmetry else 'plain',
+                                         'opening' if opening_moves == 0 else 'middle', board)
+                if arguments.filter not in 'search/' + name:
+                    continue
+                search[name] = search_size(BoardType[board], symmetry, opening_moves, arguments.seed)
+                print('{:<40}{:>10d} nodes{:>10d} entries'.format('search/' + name, search[name]['nodes'],
+                                                                   search[name]['table_entries']))
+
+    document = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repetitions': arguments.repetitions,
+            'warmup': arguments.warmup,
+            'rounds': arguments.rounds,
+            'min_seconds': MIN_SECONDS,
+            'seed': arguments.seed
+        },
+        'results': results,
+        'memory': memory,
+        'search': search
+    }
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(document, file, indent=2)
+
+    baseline_path = arguments.baseline or DEFAULT_BASELINE
+    if arguments.save_baseline:
+        with open(baseline_path, 'w') as file:
+            json.dump(document, file, indent=2)
+        print('Baseline saved to ' + baseline_path)
+        return 0
+    if arguments.baseline:
+        with open(baseline_path) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, arguments.threshold, arguments.noise, arguments.noise_cap)
+        for name, before, after, change, accepted in regressions:
+            print('REGRESSION {}: {:.1f} -> {:.1f} ops/sec ({:+.1%}, {:.1%} accepted)'.format(name, before, after,
+                                                                                           change, accepted))
+        if regressions:
+            return 1
+        print('No regression above {:.0%} against {}'.format(arguments.threshold, baseline_path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
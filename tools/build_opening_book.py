@@ -0,0 +1,106 @@
+"""
+    Command line tool which builds the opening book of the NORMAL board
+    Usage: python -m tools.build_opening_book --depth 4 --nodes 20000 --output resources/books/normal.book
+    Every position reachable in at most the given number of moves is searched by the negamax AI and its best move
+    stored in the book; positions where the game is already over are left out
+"""
+from argparse import ArgumentParser
+from multiprocessing import Pool, cpu_count
+from time import perf_counter
+from repos.board import BoardType
+from repos.bitboard import BitBoardLayout
+from AI.position import Position
+from AI.negamax import NegamaxAI
+from AI.opening_book import OpeningBook
+
+DEFAULT_BOOK = 'resources/books/normal.book'
+
+
+def opening_positions(layout: BitBoardLayout, depth: int):
+    """
+    Enumerates the positions reachable in at most the given number of moves, each position only once
+    :param layout: The layout of the board
+    :param depth: The maximum number of moves
+    :return: A dictionary mapping the key of every position to a move sequence reaching it
+    """
+    positions = {}
+    frontier = {Position(layout).key(): ()}
+    positions.update(frontier)
+    for move in range(depth):
+        next_frontier = {}
+        for moves in frontier.values():
+            position = replay(layout, moves)
+            for column in range(layout.columns):
+                if position.can_play(column) and not position.is_winning_move(column):
+                    position.play(column)
+                    key = position.key()
+                    if key not in positions and not position.is_full():
+                        next_frontier[key] = moves + (column,)
+                    position.undo(column)
+        positions.update(next_frontier)
+        frontier = next_frontier
+    return positions
+
+
+def replay(layout: BitBoardLayout, moves):
+    """
+    Plays a move sequence from the empty board
+    :param layout: The layout of the board
+    :param moves: The columns of the moves
+    :return: The position reached
+    """
+    position = Position(layout)
+    for column in moves:
+        position.play(column)
+    return position
+
+
+def solve_opening(arguments):
+    """
+    Searches the best move of one position, run in the worker processes
+    :param arguments: A tuple (rows, columns, move sequence, node budget)
+    :return: A tuple (key, column, score)
+    """
+    rows, columns, moves, nodes = arguments
+    position = replay(BitBoardLayout.for_size(rows, columns), moves)
+    ai = NegamaxAI(time_limit=None, max_nodes=nodes)
+    column = ai.search(position)
+    return position.key(), column, ai.last_score
+
+
+def build_book(path: str, depth: int, nodes: int, workers: int = None, board_type: BoardType = BoardType.NORMAL):
+    """
+    Builds an opening book file
+    :param path: The path of the book file
+    :param depth: The maximum number of moves of the positions of the book
+    :param nodes: The node budget of the search of every position
+    :param workers: The number of processes, one per core if None
+    :param board_type: The type of the board of the book
+    :return: The number of positions in the book
+    """
+    layout = BitBoardLayout.for_type(board_type)
+    positions = opening_positions(layout, depth)
+    tasks = [(layout.rows, layout.columns, moves, nodes) for moves in positions.values()]
+    entries = {}
+    with Pool(cpu_count() if workers is None else workers) as pool:
+        for key, column, score in pool.imap_unordered(solve_opening, tasks, 16):
+            entries[key] = (column, score)
+    OpeningBook.write(path, layout.rows, layout.columns, entries)
+    return len(entries)
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Builds the opening book of the NORMAL board')
+    parser.add_argument('--depth', type=int, default=4, help='maximum number of moves of the book positions')
+    parser.add_argument('--nodes', type=int, default=20000, help='node budget of the search of every position')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=DEFAULT_BOOK)
+    arguments = parser.parse_args(arguments)
+
+    start = perf_counter()
+    count = build_book(arguments.output, arguments.depth, arguments.nodes, arguments.workers)
+    print('{} positions written to {} in {:.1f}s'.format(count, arguments.output, perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
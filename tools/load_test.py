@@ -0,0 +1,172 @@
+"""
+    Command line tool which plays many concurrent games against the game server and reports its throughput and latency
+    Usage: python -m tools.load_test --clients 1000 --games 5 --ai basic
+    Without --port an in-process server is started on a free port; with it, the clients connect to a running server.
+    Every client plays its games against the AI with random legal moves; the latency of a move is the time between
+    sending it and receiving the reply of the server, the move of the AI or the end of the game. The loop lag is how
+    late the event loop, which the clients share with the in-process server, wakes up a task sleeping for
+    LAG_INTERVAL seconds: an AI holding the GIL in the server delays every connection by that much
+"""
+import asyncio
+import random
+from argparse import ArgumentParser
+from time import perf_counter
+from repos.board import BoardType
+from repos.compact_board import CompactBoard
+from services.game_service import GameServices
+from server.game_server import GameServer, AI_FACTORIES
+from server.protocol import encode, decode, MAX_LINE_LENGTH
+
+LAG_INTERVAL = 0.01
+
+
+async def receive(reader: asyncio.StreamReader):
+    """
+    Reads the next message of the server
+    :param reader: The stream reader of the connection
+    :return: The message
+    :raises: ConnectionError if the server closed the connection
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('The server closed the connection!')
+    return decode(line)
+
+
+async def play_client(host: str, port: int, games: int, board_type: BoardType, generator: random.Random,
+                      latencies: list):
+    """
+    Plays games against the AI of the server over a single connection
+    :param host: The address of the server
+    :param port: The port of the server
+    :param games: The number of games to play
+    :param board_type: The type of the board
+    :param generator: The random generator choosing the moves
+    :param latencies: List receiving the latency of every move, in seconds
+    :return: The number of moves played, both players included
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_LENGTH)
+    moves = 0
+    try:
+        for game in range(games):
+            writer.write(encode({'type': 'new_game', 'mode': 'ai', 'board': board_type.name}))
+            start = await receive(reader)
+            if start['type'] != 'start':
+                raise ConnectionError('Unexpected message: {}'.format(start))
+            # the client follows the game on a board of its own to choose legal moves and to know when it ends
+            service = GameServices(CompactBoard(board_type))
+            moves_of = {1: service.make_player1_move, 2: service.make_player2_move}
+            over = False
+            while not over:
+                column = generator.choice([column for column in range(service.board.columns)
+                                           if service.board.column_height[column] < service.board.rows])
+                sent = perf_counter()
+                writer.write(encode({'type': 'move', 'column': column}))
+                # the reply is the move of the AI, or the end of the game after the last move
+                while True:
+                    message = await receive(reader)
+                    if message['type'] == 'game_over':
+                        over = True
+                        break
+                    if message['type'] != 'move':
+                        raise ConnectionError('Unexpected message: {}'.format(message))
+                    moves += 1
+                    point = moves_of[message['player']](message['column'])
+                    if message['player'] == 2 and service.is_game_over(point, 2) is None:
+                        break
+                latencies.append(perf_counter() - sent)
+    finally:
+        writer.close()
+    return moves
+
+
+async def sample_loop_lag(lags: list):
+    """
+    Measures the lag of the event loop every LAG_INTERVAL seconds until the task is cancelled
+    :param lags: List receiving every lag, in seconds
+    :return: -
+    """
+    while True:
+        start = perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(perf_counter() - start - LAG_INTERVAL)
+
+
+def percentile(values, fraction: float):
+    """
+    Returns a percentile of a list of values
+    :param values: The values, sorted
+    :param fraction: The fraction of the values below the percentile, between 0 and 1
+    :return: The percentile, 0 for an empty list
+    """
+    if len(values) == 0:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_load_test(clients: int, games: int, board_type: BoardType, host: str = '127.0.0.1', port: int = None,
+                        ai: str = 'basic', seed: int = 0):
+    """
+    Runs the load test, starting an in-process server if no port is given
+    :param clients: The number of concurrent clients
+    :param games: The number of games played by every client
+    :param board_type: The type of the board
+    :param host: The address of the server
+    :param port: The port of a running server, None to start one
+    :param ai: The name of the AI of the in-process server
+    :param seed: The seed of the random generators of the clients
+    :return: Dictionary holding the number of games and moves, the elapsed time, the moves/sec, the p50 and p99
+             latencies and the p99 and largest loop lags in milliseconds
+    """
+    server = None
+    if port is None:
+        server = GameServer(host, 0, AI_FACTORIES[ai])
+        await server.start()
+        port = server.port
+    latencies = []
+    lags = []
+    sampler = asyncio.get_running_loop().create_task(sample_loop_lag(lags))
+    try:
+        started = perf_counter()
+        moves = await asyncio.gather(*(play_client(host, port, games, board_type, random.Random(seed + client),
+                                                   latencies) for client in range(clients)))
+        elapsed = perf_counter() - started
+    finally:
+        sampler.cancel()
+        if server is not None:
+            await server.close()
+    latencies.sort()
+    lags.sort()
+    return {
+        'games': clients * games,
+        'moves': sum(moves),
+        'seconds': elapsed,
+        'moves_per_second': sum(moves) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'loop_lag_p99_ms': percentile(lags, 0.99) * 1000,
+        'loop_lag_max_ms': lags[-1] * 1000 if len(lags) > 0 else 0.0
+    }
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Load tests the game server with concurrent clients playing against its AI')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--games', type=int, default=5, help='games played by every client')
+    parser.add_argument('--board', choices=[board_type.name for board_type in BoardType], default='NORMAL')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='port of a running server, an in-process one if none')
+    parser.add_argument('--ai', choices=sorted(AI_FACTORIES), default='basic', help='AI of the in-process server')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args(arguments)
+
+    results = asyncio.run(run_load_test(arguments.clients, arguments.games, BoardType[arguments.board],
+                                        arguments.host, arguments.port, arguments.ai, arguments.seed))
+    print('{} games, {} moves in {:.2f}s'.format(results['games'], results['moves'], results['seconds']))
+    print('{:.0f} moves/sec, latency p50 {:.2f}ms, p99 {:.2f}ms'.format(results['moves_per_second'],
+                                                                        results['p50_ms'], results['p99_ms']))
+    print('loop lag p99 {:.2f}ms, max {:.2f}ms'.format(results['loop_lag_p99_ms'], results['loop_lag_max_ms']))
+
+
+if __name__ == '__main__':
+    main()
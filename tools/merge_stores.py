@@ -0,0 +1,38 @@
+"""
+    Command line tool which merges position stores built by different processes or machines into one
+    Usage: python -m tools.merge_stores analysis.db worker1.db worker2.db worker3.db
+    When several stores hold a position, the entry of the deepest search is kept
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from AI.position_store import PositionStore
+
+
+def merge_stores(output: str, inputs):
+    """
+    Merges stores into one
+    :param output: The path of the merged store, created if it does not exist and kept otherwise
+    :param inputs: The paths of the stores to add to it
+    :return: The number of positions of the merged store
+    :raises: PositionStoreException if a file is not a position store
+    """
+    with PositionStore(output) as store:
+        for path in inputs:
+            store.merge(path)
+        return len(store)
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Merges position stores, keeping the deepest entry of every position')
+    parser.add_argument('output', help='the merged store, created if it does not exist')
+    parser.add_argument('inputs', nargs='+', help='the stores to merge into it')
+    arguments = parser.parse_args(arguments)
+
+    started = perf_counter()
+    count = merge_stores(arguments.output, arguments.inputs)
+    print('Merged {} stores into {} positions in {:.2f}s'.format(len(arguments.inputs), count,
+                                                                 perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
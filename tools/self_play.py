@@ -0,0 +1,82 @@
+"""
+    Command line tool which plays batches of AI games with the batch game service and reports the throughput
+    Usage: python -m tools.self_play --board NORMAL --games 10000 --player1 basic --player2 random
+"""
+import numpy as np
+from argparse import ArgumentParser
+from time import perf_counter
+from repos.board import BoardType
+from services.batch_service import BatchGameServices
+from AI.batch import BatchRandomAI, BatchBasicAI
+
+BATCH_AIS = {
+    'random': BatchRandomAI,
+    'basic': BatchBasicAI
+}
+
+
+def play_batch(board_type: BoardType, games: int, player1, player2, alternate: bool = True):
+    """
+    Plays a batch of games until every game is over
+    :param board_type: The type of the boards
+    :param games: The number of games
+    :param player1: The batch AI playing as the first player
+    :param player2: The batch AI playing as the second player
+    :param alternate: True to let the second player start every odd game, False to let the first player start all
+    :return: The batch game service holding the finished games
+    """
+    starting_players = np.ones(games, dtype=np.int8)
+    if alternate:
+        starting_players[1::2] = 2
+    service = BatchGameServices(board_type, games, starting_players)
+    while service.active().any():
+        player1_moves = player1.make_moves(service)
+        player2_moves = player2.make_moves(service)
+        service.make_moves(np.where(service.to_move == 1, player1_moves, player2_moves))
+    return service
+
+
+def run_self_play(board_type: BoardType, games: int, player1: str, player2: str, seed: int = 0):
+    """
+    Plays a batch of games between two batch AIs and measures the throughput
+    :param board_type: The type of the boards
+    :param games: The number of games
+    :param player1: The name of the AI playing as the first player
+    :param player2: The name of the AI playing as the second player
+    :param seed: The seed of the AIs' random generators
+    :return: A dictionary holding the number of wins of each player, the draws, the elapsed time and games/sec
+    """
+    start = perf_counter()
+    service = play_batch(board_type, games, BATCH_AIS[player1](seed), BATCH_AIS[player2](seed + 1))
+    elapsed = perf_counter() - start
+    outcomes = service.outcomes
+    return {
+        'board': board_type.name,
+        'games': games,
+        'player1_wins': int(np.count_nonzero(outcomes == BatchGameServices.PLAYER1_WIN)),
+        'player2_wins': int(np.count_nonzero(outcomes == BatchGameServices.PLAYER2_WIN)),
+        'draws': int(np.count_nonzero(outcomes == BatchGameServices.DRAW)),
+        'seconds': elapsed,
+        'games_per_second': games / elapsed
+    }
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Plays batches of AI games and reports the throughput')
+    parser.add_argument('--board', choices=[board_type.name for board_type in BoardType], nargs='+',
+                        default=[board_type.name for board_type in BoardType])
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--player1', choices=sorted(BATCH_AIS), default='basic')
+    parser.add_argument('--player2', choices=sorted(BATCH_AIS), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args(arguments)
+
+    for board in arguments.board:
+        result = run_self_play(BoardType[board], arguments.games, arguments.player1, arguments.player2,
+                               arguments.seed)
+        print('{board}: {games} games in {seconds:.2f}s ({games_per_second:.0f} games/sec) - '
+              'player 1 wins {player1_wins}, player 2 wins {player2_wins}, draws {draws}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
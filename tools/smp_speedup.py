@@ -0,0 +1,90 @@
+"""
+    Command line tool which measures the speedup of the parallel negamax search against the number of workers
+    Usage: python -m tools.smp_speedup --workers 1 2 4 8 16 32 --depth 12 --positions 8
+    Every position is searched to a fixed depth with an empty table by every number of workers; the speedup is the
+    time the single worker search takes to reach the depth divided by the time of the parallel one
+"""
+import os
+import random
+from argparse import ArgumentParser
+from time import perf_counter
+from AI.lazy_smp import LazySMPAI
+from AI.position import Position
+from repos.bitboard import BitBoardLayout
+from repos.board import BoardType
+
+
+def opening_positions(board_type: BoardType, count: int, moves: int, seed: int):
+    """
+    Creates positions reached by random moves, none of which is over or has a winning move for the player to move
+    :param board_type: The type of the board
+    :param count: The number of positions
+    :param moves: The number of moves played in every position
+    :param seed: The seed of the moves
+    :return: The list of positions
+    """
+    generator = random.Random(seed)
+    layout = BitBoardLayout.for_type(board_type)
+    positions = []
+    while len(positions) < count:
+        position = Position(layout)
+        for move in range(moves):
+            columns = [column for column in range(layout.columns)
+                       if position.can_play(column) and not position.is_winning_move(column)]
+            if len(columns) == 0:
+                break
+            position.play(generator.choice(columns))
+        else:
+            if not any(position.can_play(column) and position.is_winning_move(column)
+                       for column in range(layout.columns)):
+                positions.append(position)
+    return positions
+
+
+def measure_speedup(positions, worker_counts, depth: int):
+    """
+    Searches every position to a fixed depth with every number of workers
+    :param positions: The positions
+    :param worker_counts: The numbers of workers
+    :param depth: The depth of the searches
+    :return: A list holding a (workers, seconds, nodes) tuple for every number of workers
+    """
+    results = []
+    for workers in worker_counts:
+        with LazySMPAI(time_limit=None, max_depth=depth, workers=workers) as ai:
+            # starts the helper processes outside of the measure
+            ai.search(positions[0])
+            seconds = 0.0
+            nodes = 0
+            for position in positions:
+                ai.transposition_table.clear()
+                started = perf_counter()
+                ai.search(position)
+                seconds += perf_counter() - started
+                nodes += ai.nodes
+        results.append((workers, seconds, nodes))
+    return results
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Measures the speedup of the parallel search against the number of workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--positions', type=int, default=8)
+    parser.add_argument('--moves', type=int, default=6, help='number of random moves of every position')
+    parser.add_argument('--board', choices=[board_type.name for board_type in BoardType], default='NORMAL')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args(arguments)
+
+    positions = opening_positions(BoardType[arguments.board], arguments.positions, arguments.moves, arguments.seed)
+    print('{} cores, {} positions searched to depth {}'.format(os.cpu_count(), len(positions), arguments.depth))
+    print('{:>8} {:>10} {:>8} {:>12} {:>12}'.format('workers', 'seconds', 'speedup', 'nodes', 'nodes/sec'))
+    results = measure_speedup(positions, arguments.workers, arguments.depth)
+    reference = results[0][1]
+    for workers, seconds, nodes in results:
+        print('{:>8} {:>10.2f} {:>8.2f} {:>12} {:>12.0f}'.format(workers, seconds, reference / seconds, nodes,
+                                                                 nodes / seconds))
+
+
+if __name__ == '__main__':
+    main()
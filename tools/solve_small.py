@@ -0,0 +1,169 @@
+"""
+    Command line tool which solves the SMALL (5x4) board and writes its solution table
+    Usage: python -m tools.solve_small --workers 8 --output resources/solutions/small.table
+    Every position reachable from the empty board is solved with a memoized negamax; the memo holds one byte per
+    table index and lives in shared memory, so the worker processes reuse each other's results without locking
+    (every index is only ever written with the same code, so racing writes are harmless)
+    The table file keeps the solved positions only, the memo being compacted when it is written
+"""
+from argparse import ArgumentParser
+from multiprocessing import Pool, cpu_count
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+from repos.board import BoardType
+from repos.bitboard import BitBoardLayout
+from AI.position import Position
+from AI.negamax import NegamaxAI
+from AI.perfect import SolutionTable
+
+DEFAULT_TABLE = 'resources/solutions/small.table'
+
+
+class Solver:
+    """
+        Class which computes the code of every position of a board size into a memo of one byte per table index
+    """
+    def __init__(self, layout: BitBoardLayout, memo):
+        """
+        :param layout: The layout of the board
+        :param memo: A writable bytes-like object with one byte per table index, 0 meaning not solved yet
+        """
+        self.__layout = layout
+        self.__memo = memo
+        self.__order = NegamaxAI.column_order(layout.columns)
+
+    def solve(self, position: Position):
+        """
+        Solves a position and every position reachable from it, every move being explored so that the table also
+        holds the positions reached after mistakes
+        :param position: The position, restored before returning
+        :return: The code of the position, 1 + value * columns + best column
+        """
+        layout = self.__layout
+        index = SolutionTable.index(position.key(), layout.rows, layout.columns)
+        code = self.__memo[index]
+        if code:
+            return code
+
+        playable = [column for column in self.__order if position.can_play(column)]
+        best_value = SolutionTable.DRAW if len(playable) == 0 else -1
+        best_move = 0
+        for column in playable:
+            if position.is_winning_move(column):
+                # the game ends with this move, there is no position after it to solve
+                if best_value < SolutionTable.WIN:
+                    best_value = SolutionTable.WIN
+                    best_move = column
+            else:
+                position.play(column)
+                child = (self.solve(position) - 1) // layout.columns
+                position.undo(column)
+                value = SolutionTable.WIN - child
+                if value > best_value:
+                    best_value = value
+                    best_move = column
+
+        code = 1 + best_value * layout.columns + best_move
+        self.__memo[index] = code
+        return code
+
+
+def split_positions(layout: BitBoardLayout, depth: int):
+    """
+    Creates the move sequences of the distinct unfinished positions reached after the given number of moves
+    :param layout: The layout of the board
+    :param depth: The number of moves
+    :return: A list of move sequences
+    """
+    frontier = {Position(layout).key(): ()}
+    for move in range(depth):
+        next_frontier = {}
+        for moves in frontier.values():
+            position = Position(layout)
+            for column in moves:
+                position.play(column)
+            for column in range(layout.columns):
+                if position.can_play(column) and not position.is_winning_move(column):
+                    position.play(column)
+                    next_frontier.setdefault(position.key(), moves + (column,))
+                    position.undo(column)
+        frontier = next_frontier
+    return list(frontier.values())
+
+
+worker_memory = None
+worker_layout = None
+worker_solver = None
+
+
+def attach_worker(name: str, rows: int, columns: int):
+    """
+    Initializer of the worker processes: attaches the shared memo
+    :param name: The name of the shared memory block
+    :param rows: The number of rows of the board
+    :param columns: The number of columns of the board
+    :return: -
+    """
+    global worker_memory, worker_layout, worker_solver
+    worker_memory = SharedMemory(name)
+    worker_layout = BitBoardLayout.for_size(rows, columns)
+    worker_solver = Solver(worker_layout, worker_memory.buf)
+
+
+def solve_subtree(moves):
+    """
+    Solves the positions reachable from a move sequence, run in the worker processes
+    :param moves: The move sequence
+    :return: The code of the position reached by the sequence
+    """
+    position = Position(worker_layout)
+    for column in moves:
+        position.play(column)
+    return worker_solver.solve(position)
+
+
+def solve_board(layout: BitBoardLayout, workers: int = None, split_depth: int = 3):
+    """
+    Solves every position of a board size
+    :param layout: The layout of the board
+    :param workers: The number of processes, one per core if None
+    :param split_depth: The number of moves after which the game tree is split into tasks for the workers
+    :return: A bytes object holding the code of every table index
+    """
+    size = SolutionTable.entries(layout.rows, layout.columns)
+    memory = SharedMemory(create=True, size=size)
+    try:
+        memory.buf[:size] = bytes(size)
+        tasks = split_positions(layout, split_depth)
+        with Pool(cpu_count() if workers is None else workers, attach_worker,
+                  (memory.name, layout.rows, layout.columns)) as pool:
+            for code in pool.imap_unordered(solve_subtree, tasks):
+                pass
+        # the positions above the split are solved here, from the results of the workers
+        Solver(layout, memory.buf).solve(Position(layout))
+        return bytes(memory.buf[:size])
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Solves the SMALL board and writes its solution table')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--split-depth', type=int, default=3,
+                        help='number of moves after which the game tree is split into tasks')
+    parser.add_argument('--output', default=DEFAULT_TABLE)
+    arguments = parser.parse_args(arguments)
+
+    layout = BitBoardLayout.for_type(BoardType.SMALL)
+    start = perf_counter()
+    codes = solve_board(layout, arguments.workers, arguments.split_depth)
+    solved = perf_counter() - start
+    SolutionTable.write(arguments.output, layout.rows, layout.columns, codes)
+    positions = len(codes) - codes.count(0)
+    print('{} positions solved in {:.1f}s, table written to {} in {:.1f}s'.format(
+        positions, solved, arguments.output, perf_counter() - start - solved))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+    Command line tool which plays AIs against each other over many seeded games and ranks them by Elo rating
+    Usage: python -m tools.tournament --ais random basic negamax --games 200 --workers 8
+"""
+import random
+from argparse import ArgumentParser
+from itertools import combinations
+from math import log, sqrt
+from multiprocessing import Pool, cpu_count
+from os import getpid
+from time import perf_counter
+from repos.board import BoardType
+from repos.bitboard import BitBoard
+from services.game_service import GameServices, GameOutcome, MoveOutsideBoundsException
+from AI.random import RandomAI
+from AI.basic import BasicAI
+from AI.negamax import NegamaxAI
+from AI.mcts import MCTSAI
+
+AI_FACTORIES = {
+    'random': RandomAI,
+    'basic': BasicAI,
+    # a node budget instead of a time budget keeps the games reproducible from their seed
+    'negamax': lambda: NegamaxAI(time_limit=None, max_nodes=2000),
+    'mcts': lambda: MCTSAI(time_limit=None, max_playouts=1000)
+}
+
+
+class TournamentGame:
+    """
+        Class which describes one game of a tournament
+    """
+    def __init__(self, game_id: int, first_ai: str, second_ai: str, board_type: BoardType, starting_player: int,
+                 seed: int):
+        """
+        :param game_id: The index of the game in the tournament
+        :param first_ai: The name of the first AI
+        :param second_ai: The name of the second AI
+        :param board_type: The type of the board
+        :param starting_player: 1 if the first AI moves first, 2 if the second AI does
+        :param seed: The seed of the random generator while the game is played
+        """
+        self.game_id = game_id
+        self.first_ai = first_ai
+        self.second_ai = second_ai
+        self.board_type = board_type
+        self.starting_player = starting_player
+        self.seed = seed
+
+
+def schedule(ai_names, board_types, games: int, seed: int):
+    """
+    Creates the games of a tournament: every pair of AIs plays the given number of games on every board type,
+    the AI moving first alternating from one game to the next
+    :param ai_names: The names of the AIs
+    :param board_types: The board types
+    :param games: The number of games of every pair of AIs on every board type
+    :param seed: The seed of the tournament, the game seeds being derived from it
+    :return: The list of TournamentGame
+    """
+    tournament = []
+    for first_ai, second_ai in combinations(ai_names, 2):
+        for board_type in board_types:
+            for index in range(games):
+                tournament.append(TournamentGame(len(tournament), first_ai, second_ai, board_type,
+                                                 1 + index % 2, seed + len(tournament)))
+    return tournament
+
+
+def play_game(game: TournamentGame):
+    """
+    Plays one game of a tournament
+    Every AI plays the second player on its own copy of the board, so AIs written for the second player can play
+    either side; an AI which makes an invalid move loses the game
+    :param game: The game
+    :return: A dictionary holding the game, the score of the first AI (1, 0.5 or 0), the number of moves,
+             the time the game took and the id of the process which played it
+    """
+    start = perf_counter()
+    random.seed(game.seed)
+    ais = {1: AI_FACTORIES[game.first_ai](), 2: AI_FACTORIES[game.second_ai]()}
+    views = {1: GameServices(BitBoard(game.board_type)), 2: GameServices(BitBoard(game.board_type))}
+    player = game.starting_player
+    moves = 0
+    while True:
+        other = 3 - player
+        try:
+            column = ais[player].make_move(views[player])
+            if column < 0:
+                raise MoveOutsideBoundsException('Move is outside of the board!')
+            point = views[player].make_player2_move(column)
+        except (MoveOutsideBoundsException, IndexError):
+            winner = other
+            break
+        views[other].make_player1_move(column)
+        moves += 1
+        outcome = views[player].is_game_over(point, 2)
+        if outcome == GameOutcome.PLAYER2_WIN:
+            winner = player
+            break
+        if outcome == GameOutcome.DRAW:
+            winner = 0
+            break
+        player = other
+
+    return {
+        'game': game,
+        'score': {0: 0.5, 1: 1.0, 2: 0.0}[winner],
+        'moves': moves,
+        'seconds': perf_counter() - start,
+        'worker': getpid()
+    }
+
+
+class TournamentResults:
+    """
+        Class which aggregates the results of a tournament as they arrive
+    """
+    ELO_SCALE = 400 / log(10)
+
+    def __init__(self, ai_names):
+        self.__names = list(ai_names)
+        self.__records = {name: [0, 0, 0] for name in self.__names}
+        self.__pairs = {}
+        self.__workers = {}
+        self.__games = 0
+
+    @property
+    def games(self):
+        return self.__games
+
+    def add(self, result):
+        """
+        Adds the result of a game
+        :param result: The dictionary returned by play_game
+        :return: -
+        """
+        game = result['game']
+        score = result['score']
+        self.__games += 1
+        for name, points in ((game.first_ai, score), (game.second_ai, 1 - score)):
+            self.__records[name][{1.0: 0, 0.5: 1, 0.0: 2}[points]] += 1
+        pair = self.__pairs.setdefault((game.first_ai, game.second_ai), [0, 0.0])
+        pair[0] += 1
+        pair[1] += score
+        worker = self.__workers.setdefault(result['worker'], [0, 0.0])
+        worker[0] += 1
+        worker[1] += result['seconds']
+
+    def record(self, name):
+        """
+        Returns the wins, draws and losses of an AI
+        :param name: The name of the AI
+        :return: A tuple (wins, draws, losses)
+        """
+        return tuple(self.__records[name])
+
+    def worker_throughput(self):
+        """
+        Returns how many games every worker process played per second of playing
+        :return: A dictionary mapping the process id of every worker to its games/sec
+        """
+        return {worker: games / seconds if seconds > 0 else 0.0
+                for worker, (games, seconds) in self.__workers.items()}
+
+    def elo(self, iterations: int = 200):
+        """
+        Computes the Elo rating of every AI with its 95% confidence interval
+        The ratings are the maximum likelihood fit of the logistic Elo model to every game, draws counting as half
+        a win; every AI also gets one virtual draw against an opponent rated at the starting rating, so that
+        unbeaten AIs get a finite rating
+        :param iterations: The number of Newton iterations of the fit
+        :return: A dictionary mapping every AI name to a tuple (rating, half width of the confidence interval)
+        """
+        ratings = {name: 0.0 for name in self.__names}
+        for iteration in range(iterations):
+            for name in self.__names:
+                score, expected, information = self.__fit_terms(name, ratings)
+                ratings[name] += self.ELO_SCALE * (score - expected) / information
+        mean = sum(ratings.values()) / len(ratings)
+        result = {}
+        for name in self.__names:
+            score, expected, information = self.__fit_terms(name, ratings)
+            result[name] = (1500 + ratings[name] - mean, 1.96 * self.ELO_SCALE / sqrt(information))
+        return result
+
+    def __fit_terms(self, name, ratings):
+        """
+        Computes the actual score, expected score and Fisher information of an AI given the current ratings
+        :param name: The name of the AI
+        :param ratings: The current ratings, centered on 0
+        :return: A tuple (score, expected score, information)
+        """
+        opponents = [(0.0, 1, 0.5)]
+        for (first_ai, second_ai), (games, score) in self.__pairs.items():
+            if first_ai == name:
+                opponents.append((ratings[second_ai], games, score))
+            elif second_ai == name:
+                opponents.append((ratings[first_ai], games, games - score))
+        total_score = total_expected = information = 0.0
+        for rating, games, score in opponents:
+            probability = 1 / (1 + 10 ** ((rating - ratings[name]) / 400))
+            total_score += score
+            total_expected += games * probability
+            information += games * probability * (1 - probability)
+        return total_score, total_expected, information
+
+    def report(self):
+        """
+        Builds the standings table of the tournament
+        :return: The standings as a string
+        """
+        ratings = self.elo()
+        lines = ['{:<12}{:>8}{:>8}{:>8}{:>10}{:>10}'.format('AI', 'Wins', 'Draws', 'Losses', 'Elo', '95% CI')]
+        for name in sorted(self.__names, key=lambda ai: -ratings[ai][0]):
+            wins, draws, losses = self.record(name)
+            rating, interval = ratings[name]
+            lines.append('{:<12}{:>8}{:>8}{:>8}{:>10.0f}{:>10}'.format(name, wins, draws, losses, rating,
+                                                                       '+/-{:.0f}'.format(interval)))
+        return '\n'.join(lines)
+
+
+def run_tournament(ai_names, board_types, games: int, seed: int = 0, workers: int = None, progress=None):
+    """
+    Plays a tournament, spreading the games over a pool of processes
+    :param ai_names: The names of the AIs
+    :param board_types: The board types
+    :param games: The number of games of every pair of AIs on every board type
+    :param seed: The seed of the tournament
+    :param workers: The number of processes, one per core if None
+    :param progress: Function called with the results after every finished game, if given
+    :return: The TournamentResults
+    """
+    tournament = schedule(ai_names, board_types, games, seed)
+    results = TournamentResults(ai_names)
+    workers = cpu_count() if workers is None else workers
+    with Pool(workers) as pool:
+        chunk_size = max(1, len(tournament) // (workers * 16))
+        for result in pool.imap_unordered(play_game, tournament, chunk_size):
+            results.add(result)
+            if progress is not None:
+                progress(results)
+    return results
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description='Plays AIs against each other and ranks them by Elo rating')
+    parser.add_argument('--ais', choices=sorted(AI_FACTORIES), nargs='+', default=['random', 'basic'])
+    parser.add_argument('--board', choices=[board_type.name for board_type in BoardType], nargs='+',
+                        default=[board_type.name for board_type in BoardType])
+    parser.add_argument('--games', type=int, default=100,
+                        help='number of games of every pair of AIs on every board type')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args(arguments)
+    if len(arguments.ais) < 2:
+        parser.error('at least two AIs are needed')
+
+    total = len(list(combinations(arguments.ais, 2))) * len(arguments.board) * arguments.games
+
+    def progress(results):
+        if results.games % max(1, total // 10) == 0:
+            print('{}/{} games played'.format(results.games, total))
+
+    start = perf_counter()
+    results = run_tournament(arguments.ais, [BoardType[board] for board in arguments.board], arguments.games,
+                             arguments.seed, arguments.workers, progress)
+    elapsed = perf_counter() - start
+    print()
+    print(results.report())
+    print()
+    print('{} games in {:.2f}s ({:.1f} games/sec)'.format(results.games, elapsed, results.games / elapsed))
+    for worker, throughput in sorted(results.worker_throughput().items()):
+        print('worker {}: {:.1f} games/sec'.format(worker, throughput))
+
+
+if __name__ == '__main__':
+    main()